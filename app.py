@@ -1,20 +1,30 @@
-from flask import Flask, request, jsonify, send_file, render_template, after_this_request, make_response
+from flask import Flask, request, jsonify, render_template, after_this_request, make_response, Response
 from werkzeug.utils import secure_filename
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
 import os
 import gc
+import time
 import secrets
+import mimetypes
+from datetime import datetime, timezone
 from functools import wraps
 from src import (
     setup_folders,
-    get_clips_info,
+    iter_clips_info,
+    transcribe_stream,
     get_ai_script,
     parse_ai_response,
     create_final_video,
     remove_duplicate_content
 )
+from src.jobs import JobQueue, QueueFull, JOB_RETENTION_SECONDS
+from src.workspace import Workspace, cleanup_stale_workspaces
+from src.uploads import ChunkedUpload, UploadError, UPLOAD_CHUNK_SIZE, upload_lock
+from src.artifact_cache import file_hash
+from src.instrumentation import recording, render_prometheus
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'clips')
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_SIZE', 16 * 1024 * 1024))  # 16MB max file size
 
 # Configurações de segurança
@@ -29,12 +39,99 @@ app.config['SECURE_HEADERS'] = {
     'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline' cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' cdn.jsdelivr.net; img-src 'self' data:;"
 }
 
+# Entrega de mídia: bloco de leitura dos ranges fechados e cache do navegador
+MEDIA_BLOCK_SIZE = 256 * 1024
+MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', 3600))
+
+# Intervalo (s) entre leituras da prévia enquanto ela ainda está sendo renderizada
+PREVIEW_POLL_INTERVAL = 0.5
+
 def add_secure_headers(response):
-    """Adiciona headers de segurança em todas as respostas"""
+    """Adiciona headers de segurança nas respostas HTML (mídia e JSON mantêm seus headers de cache)"""
+    if response.mimetype != 'text/html':
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
     for header, value in app.config['SECURE_HEADERS'].items():
         response.headers[header] = value
     return response
 
+def _iter_file_range(file, length):
+    """Lê um range fechado do arquivo em blocos, fechando o arquivo ao final"""
+    try:
+        remaining = length
+        while remaining > 0:
+            block = file.read(min(MEDIA_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file.close()
+
+def send_media(path, download_name=None):
+    """Envia um arquivo de mídia com suporte a Range, ETag e Last-Modified"""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_hash(path)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    
+    response = Response(
+        mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+        direct_passthrough=True
+    )
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.accept_ranges = 'bytes'
+    response.cache_control.private = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    if download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response.status_code = 304
+        return add_secure_headers(response)
+    
+    # O Range só vale se o If-Range (quando enviado) ainda corresponder ao arquivo
+    start, stop = 0, size
+    byte_range = request.range
+    if_range = request.if_range
+    range_valid = not (if_range.etag or if_range.date) or (
+        if_range.etag == etag if if_range.etag else if_range.date >= last_modified
+    )
+    if byte_range is not None and range_valid and len(byte_range.ranges) == 1:
+        requested = byte_range.range_for_length(size)
+        if requested is None:
+            response.status_code = 416
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return add_secure_headers(response)
+        start, stop = requested
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    
+    file = open(path, 'rb')
+    file.seek(start)
+    if stop == size:
+        # Até o fim do arquivo: o file_wrapper do servidor pode usar sendfile (zero-copy)
+        response.response = wrap_file(request.environ, file, MEDIA_BLOCK_SIZE)
+    else:
+        response.response = _iter_file_range(file, stop - start)
+    response.content_length = stop - start
+    return add_secure_headers(response)
+
+def _iter_growing_file(path, job):
+    """Lê um arquivo ainda em gravação até o job terminar (a prévia é um MP4 fragmentado)"""
+    with open(path, 'rb') as file:
+        while True:
+            # O estado é lido antes do bloco: se o job já tinha terminado, o EOF é definitivo
+            finished = job.finished
+            block = file.read(MEDIA_BLOCK_SIZE)
+            if block:
+                yield block
+            elif finished:
+                break
+            else:
+                time.sleep(PREVIEW_POLL_INTERVAL)
+
 def secure_api_key():
     """Decorator para proteger e limpar a API key"""
     def decorator(f):
@@ -58,8 +155,11 @@ def secure_api_key():
         return wrapped
     return decorator
 
-# Ensure the upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Fila de processamento: /upload apenas enfileira e responde com o ID do job
+job_queue = JobQueue()
+
+# Segundos sugeridos ao cliente quando a fila está cheia
+QUEUE_RETRY_AFTER = int(os.getenv('QUEUE_RETRY_AFTER', 30))
 
 @app.route('/')
 def index():
@@ -67,6 +167,113 @@ def index():
     response = make_response(render_template('index.html'))
     return add_secure_headers(response)
 
+def process_upload(job, workspace, api_key, preview=False):
+    """Executa o pipeline completo de um upload dentro de um job, na área de trabalho do job"""
+    # Os spans de cada etapa ficam em profile.json, na área de trabalho do job
+    with recording() as recorder:
+        try:
+            # Configuração inicial
+            job.update('Preparando pastas', 5)
+            setup_folders(workspace.clips_dir, workspace.temp_dir)
+        
+            # Processar e transcrever os clips (cada clip é transcrito assim que fica pronto)
+            job.update('Processando e transcrevendo clips', 10)
+            clips_info = transcribe_stream(
+                iter_clips_info(clips_dir=workspace.clips_dir, temp_dir=workspace.temp_dir),
+                api_key=api_key, temp_dir=workspace.temp_dir
+            )
+        
+            if not clips_info:
+                raise RuntimeError('Erro ao processar o vídeo')
+        
+            # Remover conteúdo duplicado
+            job.update('Removendo conteúdo duplicado', 40)
+            clips_info = remove_duplicate_content(clips_info, api_key=api_key)
+        
+            # Gerar script com IA
+            job.update('Gerando roteiro com IA', 55)
+            ai_response = get_ai_script(clips_info, api_key=api_key, temp_dir=workspace.temp_dir)
+        
+            # Extrair narrativa e ordem dos clips
+            narrative, clips_order, clips_timing = parse_ai_response(ai_response, clips_info, api_key)
+        
+            # Criar vídeo final (ou a prévia, que pode ser assistida durante a renderização)
+            output_path = workspace.preview_path if preview else workspace.output_path
+            job.update('Renderizando prévia' if preview else 'Renderizando vídeo final', 80)
+            create_final_video(
+                clips_order, clips_info, clips_timing,
+                output_file=output_path,
+                temp_dir=workspace.temp_dir,
+                preview=preview
+            )
+        
+            result = {
+                'message': 'Vídeo processado com sucesso',
+                'narrative': narrative,
+                'output_path': output_path,
+                'download_url': f'/jobs/{job.id}/download',
+                'profile_url': f'/jobs/{job.id}/profile'
+            }
+            if preview:
+                result['preview_url'] = f'/jobs/{job.id}/preview'
+            return result
+        finally:
+            # Limpa os arquivos de entrada e temporários após o processamento
+            workspace.clear_intermediates()
+            recorder.export_json(workspace.profile_path)
+
+def enqueue_workspace(workspace, api_key, preview=False):
+    """Enfileira o processamento de uma área de trabalho (a API key segue só como argumento do job)"""
+    job = job_queue.submit(process_upload, workspace, api_key, preview)
+    job.metadata['workspace'] = workspace.root
+    job.metadata['preview'] = preview
+    return job
+
+def workspaces_in_use():
+    """Áreas de trabalho que a limpeza não pode apagar: jobs não expirados e uploads em andamento"""
+    in_use = {
+        os.path.basename(job.metadata['workspace'])
+        for job in job_queue.jobs() if 'workspace' in job.metadata
+    }
+    # Uploads sem nenhuma parte recebida dentro da retenção são considerados abandonados
+    limit = time.time() - JOB_RETENTION_SECONDS
+    in_use.update(upload.id for upload in ChunkedUpload.open_uploads() if upload.updated_at >= limit)
+    return in_use
+
+def preview_requested(value):
+    """Interpreta a opção de prévia vinda de formulário ou JSON"""
+    return value in (True, 1) or str(value).lower() in ('1', 'true', 'on', 'yes')
+
+def queue_full():
+    """Resposta de backpressure quando a fila de jobs está cheia"""
+    response = jsonify({'error': 'Fila de processamento cheia, tente novamente em instantes'})
+    response.headers['Retry-After'] = str(QUEUE_RETRY_AFTER)
+    return response, 429
+
+def job_not_found():
+    return add_secure_headers(make_response(jsonify({'error': 'Job não encontrado'}), 404))
+
+def upload_not_found():
+    return jsonify({'error': 'Upload não encontrado'}), 404
+
+def api_key_error(api_key):
+    """Valida a API key recebida no header, retornando a mensagem de erro se houver"""
+    if not api_key:
+        return 'OpenAI API Key não fornecida'
+    if not api_key.startswith('sk-') or len(api_key) < 20:
+        return 'OpenAI API Key inválida'
+    return None
+
+def job_accepted(job):
+    """Resposta 202 com o ID e a URL de status do job enfileirado"""
+    response = jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/jobs/{job.id}'
+    })
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response, 202
+
 @app.route('/upload', methods=['POST'])
 @secure_api_key()
 def upload_file():
@@ -75,78 +282,247 @@ def upload_file():
     
     # Obtém a API key do header em vez do form data
     api_key = request.headers.get('X-Api-Key')
-    if not api_key:
-        return jsonify({'error': 'OpenAI API Key não fornecida'}), 400
+    error = api_key_error(api_key)
+    if error:
+        return jsonify({'error': error}), 400
     
-    # Valida o formato da API key
-    if not api_key.startswith('sk-') or len(api_key) < 20:
-        return jsonify({'error': 'OpenAI API Key inválida'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+    
+    # Recusa antes de gravar o arquivo se a fila já estiver cheia
+    if job_queue.full():
+        return queue_full()
+    
+    # Remove as áreas de trabalho de jobs que já expiraram
+    cleanup_stale_workspaces(JOB_RETENTION_SECONDS, in_use=workspaces_in_use())
+    
+    workspace = Workspace.create()
+    try:
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(workspace.clips_dir, filename)
+        file.save(filepath)
+        
+        job = enqueue_workspace(workspace, api_key, preview_requested(request.form.get('preview')))
+    except QueueFull:
+        workspace.remove()
+        return queue_full()
+    except Exception as e:
+        workspace.remove()
+        return jsonify({'error': str(e)}), 500
+    
+    return job_accepted(job)
+
+@app.route('/uploads', methods=['POST'])
+@secure_api_key()
+def start_upload():
+    """Abre um upload em partes para arquivos maiores que o limite do /upload"""
+    error = api_key_error(request.headers.get('X-Api-Key'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    data = request.get_json(silent=True) or {}
+    
+    # Partes maiores que o limite de requisição seriam recusadas pelo servidor
+    chunk_size = min(int(data.get('chunk_size') or UPLOAD_CHUNK_SIZE), app.config['MAX_CONTENT_LENGTH'])
     
+    cleanup_stale_workspaces(JOB_RETENTION_SECONDS, in_use=workspaces_in_use())
     try:
-        # Define a API key no ambiente de forma segura
-        os.environ['OPENAI_API_KEY'] = api_key
+        upload = ChunkedUpload.start(
+            secure_filename(data.get('filename', '')),
+            int(data.get('size') or 0),
+            chunk_size=chunk_size,
+            sha256=data.get('sha256')
+        )
+    except (UploadError, ValueError) as e:
+        return jsonify({'error': str(e)}), getattr(e, 'status_code', 400)
+    
+    response = jsonify(upload.to_dict())
+    response.headers['Location'] = f'/uploads/{upload.id}'
+    return response, 201
+
+@app.route('/uploads/<upload_id>')
+def upload_status(upload_id):
+    """Estado de um upload em partes, com as partes que faltam (para retomar o envio)"""
+    upload = ChunkedUpload.load(upload_id)
+    if upload is None:
+        return upload_not_found()
+    return jsonify(upload.to_dict())
+
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@secure_api_key()
+def upload_chunk(upload_id, index):
+    """Recebe uma parte e grava direto no arquivo parcial, sem bufferizar o corpo"""
+    error = api_key_error(request.headers.get('X-Api-Key'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # Partes gravam em paralelo entre si, mas nunca enquanto o upload é finalizado ou cancelado;
+    # o estado é relido dentro do lock (finalizado: 409, cancelado: 404)
+    with upload_lock(upload_id).shared():
+        upload = ChunkedUpload.load(upload_id)
+        if upload is None:
+            return upload_not_found()
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+        try:
+            upload.write_chunk(
+                index, request.stream,
+                request.headers.get('X-Chunk-Sha256'),
+                request.content_length
+            )
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status_code
+    
+    return jsonify({
+        'upload_id': upload.id,
+        'chunk': index,
+        'missing_chunks': len(upload.missing_chunks())
+    })
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+@secure_api_key()
+def complete_upload(upload_id):
+    """Finaliza o upload e enfileira o processamento imediatamente"""
+    api_key = request.headers.get('X-Api-Key')
+    error = api_key_error(api_key)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    data = request.get_json(silent=True) or {}
+    
+    # Com o lock, duas chamadas simultâneas não finalizam nem enfileiram o mesmo upload
+    with upload_lock(upload_id):
+        upload = ChunkedUpload.load(upload_id)
+        if upload is None:
+            return upload_not_found()
         
-        if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            try:
-                # Configuração inicial
-                setup_folders()
-                
-                # Processar clips
-                clips_info = get_clips_info()
-                
-                if not clips_info:
-                    return jsonify({'error': 'Erro ao processar o vídeo'}), 500
-                
-                # Remover conteúdo duplicado
-                clips_info = remove_duplicate_content(clips_info)
-                
-                # Gerar script com IA
-                ai_response = get_ai_script(clips_info)
-                
-                # Extrair narrativa e ordem dos clips
-                narrative, clips_order, clips_timing = parse_ai_response(ai_response)
-                
-                # Criar vídeo final
-                output_path = 'video_final.mp4'
-                create_final_video(clips_order, clips_info, clips_timing)
-                
-                return jsonify({
-                    'message': 'Vídeo processado com sucesso',
-                    'narrative': narrative,
-                    'output_path': output_path
-                })
-                
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
-            finally:
-                # Limpa o arquivo temporário após o processamento
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass
+        # Completar de novo (ex.: resposta perdida) devolve o job já criado
+        if upload.job_id:
+            job = job_queue.get(upload.job_id)
+            if job is None:
+                return jsonify({'error': 'Upload já processado e expirado'}), 410
+            return job_accepted(job)
+        
+        if job_queue.full():
+            return queue_full()
         
-        return jsonify({'error': 'Erro ao processar o arquivo'}), 500
+        try:
+            upload.complete()
+            job = enqueue_workspace(upload.workspace, api_key, preview_requested(data.get('preview')))
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        except QueueFull:
+            # O arquivo continua na área de trabalho; o cliente pode tentar completar de novo
+            return queue_full()
+        
+        upload.set_job(job.id)
+    return job_accepted(job)
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+@secure_api_key()
+def abort_upload(upload_id):
+    """Cancela um upload em andamento e remove os dados recebidos"""
+    error = api_key_error(request.headers.get('X-Api-Key'))
+    if error:
+        return jsonify({'error': error}), 400
     
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    with upload_lock(upload_id):
+        upload = ChunkedUpload.load(upload_id)
+        if upload is None:
+            return upload_not_found()
+        if upload.job_id:
+            return jsonify({'error': 'Upload já enviado para processamento'}), 409
+        upload.workspace.remove()
+    return '', 204
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Estado completo de um job, incluindo o resultado quando concluído"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found()
+    return add_secure_headers(make_response(jsonify(job.to_dict())))
+
+@app.route('/jobs/<job_id>/progress')
+def job_progress(job_id):
+    """Resumo leve do progresso para polling"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found()
+    return add_secure_headers(make_response(jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'stage': job.stage,
+        'progress': job.progress
+    })))
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    """Download do vídeo final de um job concluído"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found()
+    if job.status != 'completed' or not os.path.exists(job.result['output_path']):
+        return add_secure_headers(make_response(jsonify({'error': 'Vídeo não disponível'}), 404))
+    download_name = 'video_preview.mp4' if job.metadata.get('preview') else 'video_final.mp4'
+    return send_media(job.result['output_path'], download_name=download_name)
+
+@app.route('/jobs/<job_id>/preview')
+def job_preview(job_id):
+    """Prévia de um job: enviada enquanto é renderizada e, depois de pronta, com suporte a Range"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found()
+    preview_path = Workspace(job.metadata['workspace']).preview_path
+    if not job.metadata.get('preview') or not os.path.exists(preview_path):
+        response = make_response(jsonify({'error': 'Prévia ainda não disponível'}), 404)
+        return add_secure_headers(response)
+    if job.finished:
+        return send_media(preview_path)
+    
+    # Ainda em renderização: transmite os fragmentos à medida que o ffmpeg os grava
+    response = Response(_iter_growing_file(preview_path, job), mimetype='video/mp4', direct_passthrough=True)
+    response.cache_control.no_store = True
+    return add_secure_headers(response)
+
+@app.route('/jobs/<job_id>/profile')
+def job_profile(job_id):
+    """Spans de tempo, CPU, memória e disco de cada etapa do job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found()
+    profile_path = Workspace(job.metadata['workspace']).profile_path
+    if not job.finished or not os.path.exists(profile_path):
+        return jsonify({'error': 'Perfil ainda não disponível'}), 404
+    with open(profile_path, 'r', encoding='utf-8') as f:
+        return app.response_class(f.read(), mimetype='application/json')
+
+@app.route('/metrics')
+def metrics():
+    """Métricas do processo no formato de exposição do Prometheus"""
+    body = render_prometheus({
+        'jobs_queued': ('Jobs aguardando na fila', job_queue.pending()),
+        'jobs_running': ('Jobs em execução', job_queue.running())
+    })
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela um job na fila ou em execução (no próximo checkpoint)"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return job_not_found()
+    return add_secure_headers(make_response(jsonify(job.to_dict()), 202))
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Rota de download com headers de segurança"""
-    try:
-        response = send_file(filename, as_attachment=True)
-        return add_secure_headers(response)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 404
+    """Rota de download do vídeo gerado pela linha de comando"""
+    path = secure_filename(filename)
+    mime = mimetypes.guess_type(path)[0] or ''
+    if not path or not mime.startswith('video/') or not os.path.isfile(path):
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    return send_media(path, download_name=path)
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
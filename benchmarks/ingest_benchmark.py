@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compara a ingestão antiga (um processo ffmpeg por artefato) com o passe único do src/ingest.py"""
+import os
+import sys
+import json
+import time
+import argparse
+import ffmpeg
+
+try:
+    import resource
+except ImportError:  # Windows: sem CPU de subprocessos
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipeline_benchmark import generate_clip  # noqa: E402
+from src.ingest import MEZZANINE_FORMAT, SPEECH_AUDIO_FORMAT, build_ingest_pass  # noqa: E402
+from src.audio_analysis import AudioAnalysis  # noqa: E402
+
+# Formato do áudio dos clips sintéticos (o generate_clip usa 44,1 kHz estéreo)
+AUDIO_FORMAT = (44100, 2)
+
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def legacy_ingest(source, out_dir):
+    """Fluxo anterior: converte para MP4, decodifica o PCM do MP4 e codifica o MP3 da transcrição"""
+    mezzanine = os.path.join(out_dir, 'legacy.mp4')
+    ffmpeg.input(source).output(mezzanine, **MEZZANINE_FORMAT).run(overwrite_output=True, quiet=True)
+    (
+        ffmpeg.input(mezzanine)
+        .output(os.path.join(out_dir, 'legacy.pcm'), map='0:a:0', **AudioAnalysis.pcm_output_args(*AUDIO_FORMAT))
+        .run(overwrite_output=True, quiet=True)
+    )
+    (
+        ffmpeg.input(mezzanine)
+        .output(os.path.join(out_dir, 'legacy.mp3'), acodec='libmp3lame')
+        .run(overwrite_output=True, quiet=True)
+    )
+    return 3
+
+
+def single_pass_ingest(source, out_dir, mode):
+    """Passe único: MP4 (re-encode, remux ou proxy), PCM e áudio de fala saem da mesma decodificação"""
+    build_ingest_pass(
+        source,
+        os.path.join(out_dir, f'{mode}.mp4'),
+        os.path.join(out_dir, f'{mode}.pcm'),
+        os.path.join(out_dir, f'{mode}.ogg'),
+        AUDIO_FORMAT,
+        mode
+    ).run(overwrite_output=True, quiet=True)
+    return 1
+
+
+def measure(function, *args, repeat=3):
+    """Menor tempo e menor CPU de subprocessos entre as repetições"""
+    best_wall, best_cpu = float('inf'), float('inf')
+    processes = 0
+    for _ in range(repeat):
+        start_cpu = _children_cpu()
+        start = time.perf_counter()
+        processes = function(*args)
+        best_wall = min(best_wall, time.perf_counter() - start)
+        best_cpu = min(best_cpu, _children_cpu() - start_cpu)
+    return {'wall_seconds': best_wall, 'cpu_seconds': best_cpu, 'ffmpeg_processes': processes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da ingestão em passe único')
+    parser.add_argument('--seconds', type=float, default=20, help='Duração do clip sintético (padrão: 20)')
+    parser.add_argument('--resolution', type=str, default='1280x720', help='Resolução do clip (padrão: 1280x720)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições de cada variante (padrão: 3)')
+    parser.add_argument('--work-dir', type=str, default=os.path.join('benchmarks', 'work', 'ingest'),
+                        help='Diretório de trabalho (padrão: benchmarks/work/ingest)')
+    parser.add_argument('--output', type=str, help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    # .mov em H.264/AAC, como os vídeos de celular: precisa de mezzanine e permite remux
+    source = os.path.join(args.work_dir, f'clip_{args.seconds:g}s_{args.resolution}.mov')
+    if not os.path.exists(source):
+        generate_clip(source, args.seconds, args.resolution)
+
+    results = {
+        'legacy': measure(legacy_ingest, source, args.work_dir, repeat=args.repeat),
+        'single_pass': measure(single_pass_ingest, source, args.work_dir, 'transcode', repeat=args.repeat),
+        'single_pass_remux': measure(single_pass_ingest, source, args.work_dir, 'remux', repeat=args.repeat),
+        'single_pass_proxy': measure(single_pass_ingest, source, args.work_dir, 'proxy', repeat=args.repeat),
+    }
+
+    print(f"\n{'Variante':<20} {'Processos':>9} {'Tempo (s)':>10} {'CPU (s)':>10}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['ffmpeg_processes']:>9} {result['wall_seconds']:>10.2f} "
+              f"{result['cpu_seconds']:>10.2f}")
+    legacy_cpu = results['legacy']['cpu_seconds']
+    for name in ('single_pass', 'single_pass_remux', 'single_pass_proxy'):
+        if results[name]['cpu_seconds'] > 0:
+            print(f"CPU {name}: {legacy_cpu / results[name]['cpu_seconds']:.1f}x menor que o fluxo anterior")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'seconds': args.seconds, 'resolution': args.resolution, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Benchmark do pipeline completo, offline, com mídia sintética e OpenAI simulada"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import argparse
+import subprocess
+from types import SimpleNamespace
+import ffmpeg
+import openai
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from src import (  # noqa: E402
+    setup_folders, iter_clips_info, transcribe_stream, get_ai_script, parse_ai_response,
+    create_final_video, remove_duplicate_content
+)
+from src import artifact_cache, transcription  # noqa: E402
+from src.segments import segment_count  # noqa: E402
+from src.instrumentation import recording, span  # noqa: E402
+
+# Durações (s) dos cenários curtos e longos
+DURATIONS = {'short': 5, 'long': 60}
+
+# Padrão de "fala" do áudio sintético: tons de SPEECH_SECONDS separados por GAP_SECONDS de silêncio
+LEADING_SILENCE = 0.8
+SPEECH_SECONDS = 2.5
+GAP_SECONDS = 0.9
+
+# Variação relativa de tempo acima da qual o --compare acusa regressão
+DEFAULT_THRESHOLD = 0.2
+
+
+def generate_clip(path, seconds, resolution='640x360', fps=30, frequency=440):
+    """Gera um clip com barras de cor e tons separados por pausas de silêncio"""
+    period = SPEECH_SECONDS + GAP_SECONDS
+    expression = (
+        f"if(gt(t,{LEADING_SILENCE})*lt(mod(t-{LEADING_SILENCE},{period}),{SPEECH_SECONDS}),"
+        f"0.5*sin(2*PI*{frequency}*t),0)"
+    )
+    video = ffmpeg.input(f'smptebars=size={resolution}:rate={fps}', f='lavfi', t=seconds)
+    audio = ffmpeg.input(f"aevalsrc='{expression}':s=44100:c=stereo", f='lavfi', t=seconds)
+    (
+        ffmpeg
+        .output(video, audio, path, vcodec='libx264', preset='ultrafast', pix_fmt='yuv420p',
+                acodec='aac', g=fps)
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def audio_duration(path):
+    """Duração de um arquivo de áudio, decodificado em PCM (sem ffprobe); não entra nos spans"""
+    out, _ = (
+        ffmpeg
+        .input(path)
+        .output('pipe:', format='s16le', ac=1, ar=8000)
+        .run(capture_stdout=True, quiet=True)
+    )
+    return len(out) / (2 * 8000)
+
+
+def prepare_media(media_dir, clips, seconds, resolution, container):
+    """Gera (ou reaproveita) os clips sintéticos de um cenário; não entra na medição"""
+    os.makedirs(media_dir, exist_ok=True)
+    paths = []
+    for index in range(clips):
+        path = os.path.join(media_dir, f"clip_{seconds}s_{resolution}_{index:03d}.{container}")
+        if not os.path.exists(path):
+            generate_clip(path, seconds, resolution, frequency=220 + 20 * (index % 20))
+        paths.append(path)
+    return paths
+
+
+class StubOpenAI:
+    """Respostas locais e determinísticas no lugar do Whisper e do GPT-4"""
+
+    def __init__(self, whisper_latency=0.0, chat_latency=0.0):
+        self.whisper_latency = whisper_latency
+        self.chat_latency = chat_latency
+        self.clips_info = []
+        self.calls = {'whisper': 0, 'chat': 0}
+
+    def transcribe_file(self, audio_path, **kwargs):
+        """Resposta no formato verbose_json, com um segmento a cada SPEECH_SECONDS do áudio enviado"""
+        self.calls['whisper'] += 1
+        time.sleep(self.whisper_latency)
+        digest = hashlib.sha256(os.path.basename(audio_path).encode('utf-8')).hexdigest()
+        duration = audio_duration(audio_path)
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + SPEECH_SECONDS, duration)
+            segments.append({
+                'id': len(segments), 'start': round(start, 3), 'end': round(end, 3),
+                'text': f" Frase {len(segments)} do trecho {digest[:8]} sobre o tema {int(digest[8:10], 16) % 7}."
+            })
+            start = end
+        return {
+            'text': ''.join(segment['text'] for segment in segments).strip(),
+            'duration': duration,
+            'segments': segments
+        }
+
+    def audio_transcribe(self, model, file, **kwargs):
+        return self.transcribe_file(getattr(file, 'name', 'audio'))
+
+    def chat_completion(self, **kwargs):
+        self.calls['chat'] += 1
+        time.sleep(self.chat_latency)
+        prompt = "\n".join(message['content'] for message in kwargs.get('messages', []))
+
+        if 'CLIPS_TO_REMOVE' in prompt:
+            content = "CLIPS_TO_REMOVE: []\nREASON: Nenhum conteúdo repetido"
+        elif 'CLIPS_ORDER' in prompt:
+            content = self._edit_script()
+        else:
+            ids = [int(clip_id) for clip_id in re.findall(r'Clip (\d+)', prompt)]
+            content = "ESTRUTURA:\n" + "\n".join(f"{clip_id}: Desenvolvimento" for clip_id in ids)
+        return SimpleNamespace(choices=[SimpleNamespace(message={'content': content})])
+
+    def _edit_script(self):
+        """Roteiro com todos os clips em ordem inversa, cortando o primeiro segmento de quem tiver mais de dois"""
+        clips = list(reversed(self.clips_info))
+        order = ",".join(str(clip['id']) for clip in clips)
+        ranges = []
+        for clip in clips:
+            count = segment_count(clip.get('segments'))
+            if count:
+                ranges.append(f"{clip['id']}:{1 if count > 2 else 0}-{count - 1}")
+        return (f"NARRATIVE:\nRoteiro sintético do benchmark.\n\nCLIPS_ORDER:\n{order}\n\n"
+                f"CLIPS_SEGMENTS:\n{';'.join(ranges)}")
+
+    def install(self):
+        """Substitui as chamadas à API da OpenAI pelas respostas locais"""
+        transcription.transcribe_file = self.transcribe_file
+        openai.Audio.transcribe = self.audio_transcribe
+        openai.ChatCompletion.create = self.chat_completion
+        os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark-offline-000000')
+
+
+def run_pipeline(stub, clips_dir, temp_dir, output_file, jobs, backend):
+    """Executa as etapas do main.py e retorna os spans medidos"""
+    with recording() as recorder:
+        with span('total'):
+            setup_folders(clips_dir, temp_dir)
+            # Como no main.py, a transcrição de cada clip começa assim que sua ingestão termina
+            with span('ingest'):
+                clips_info = transcribe_stream(
+                    iter_clips_info(jobs=jobs, clips_dir=clips_dir, temp_dir=temp_dir), temp_dir=temp_dir
+                )
+            if not clips_info:
+                raise RuntimeError("Nenhum clip processado")
+            stub.clips_info = clips_info
+
+            with span('dedup'):
+                clips_info = remove_duplicate_content(clips_info)
+            with span('ai_script'):
+                ai_response = get_ai_script(clips_info, temp_dir=temp_dir)
+            _, clips_order, clips_timing = parse_ai_response(ai_response, clips_info)
+            with span('render'):
+                create_final_video(
+                    clips_order, clips_info, clips_timing,
+                    output_file=output_file, backend=backend, temp_dir=temp_dir
+                )
+    return recorder
+
+
+def run_scenario(stub, work_dir, media_dir, clips, duration, resolution, container, jobs, backend, warm):
+    """Mede um cenário com cache vazio (e, opcionalmente, de novo com o cache já populado)"""
+    seconds = DURATIONS.get(duration, None) or float(duration)
+    name = f"{clips}x{duration}-{resolution}"
+    sources = prepare_media(media_dir, clips, seconds, resolution, container)
+
+    scenario_dir = os.path.join(work_dir, name)
+    shutil.rmtree(scenario_dir, ignore_errors=True)
+    clips_dir = os.path.join(scenario_dir, 'clips')
+    os.makedirs(clips_dir)
+    for source in sources:
+        os.link(source, os.path.join(clips_dir, os.path.basename(source)))
+
+    # Cache de artefatos isolado por cenário: a primeira passada é sempre a frio
+    artifact_cache._default_cache = artifact_cache.ArtifactCache(os.path.join(scenario_dir, 'cache'))
+
+    runs = {}
+    for run_name in (['cold', 'warm'] if warm else ['cold']):
+        temp_dir = os.path.join(scenario_dir, f'temp_{run_name}')
+        output_file = os.path.join(scenario_dir, f'output_{run_name}.mp4')
+        stub.calls = {'whisper': 0, 'chat': 0}
+        recorder = run_pipeline(stub, clips_dir, temp_dir, output_file, jobs, backend)
+        stages = {
+            stage_name: {
+                'calls': stage['calls'],
+                'wall_seconds': round(stage['wall_seconds'], 4),
+                'cpu_seconds': round(stage['cpu_seconds'], 4),
+                'peak_rss_bytes': stage['peak_rss_bytes']
+            }
+            for stage_name, stage in sorted(recorder.summary().items())
+        }
+        runs[run_name] = {'stages': stages, 'api_calls': dict(stub.calls)}
+        print(f"{name:<28} {run_name:<5} total {stages['total']['wall_seconds']:8.2f}s "
+              f"(cpu {stages['total']['cpu_seconds']:.2f}s)")
+
+    return {
+        'name': name,
+        'clips': clips,
+        'duration': duration,
+        'clip_seconds': seconds,
+        'resolution': resolution,
+        'container': container,
+        'jobs': jobs,
+        'backend': backend,
+        'runs': runs
+    }
+
+
+def environment_info():
+    """Identifica o commit e o ambiente da medição"""
+    def command_output(command):
+        try:
+            return subprocess.run(
+                command, capture_output=True, text=True, check=True, cwd=REPO_DIR
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    ffmpeg_version = command_output(['ffmpeg', '-version'])
+    return {
+        'commit': command_output(['git', 'rev-parse', '--short', 'HEAD']),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version.splitlines()[0] if ffmpeg_version else None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare_reports(base, current, threshold=DEFAULT_THRESHOLD):
+    """Compara o tempo de cada etapa entre dois relatórios e lista as regressões"""
+    regressions = []
+    base_scenarios = {scenario['name']: scenario for scenario in base['scenarios']}
+    print(f"{'Cenário':<28} {'Passada':<6} {'Etapa':<28} {'Antes (s)':>10} {'Depois (s)':>10} {'Variação':>9}")
+    for scenario in current['scenarios']:
+        base_scenario = base_scenarios.get(scenario['name'])
+        if base_scenario is None:
+            continue
+        for run_name, run in scenario['runs'].items():
+            base_run = base_scenario['runs'].get(run_name)
+            if base_run is None:
+                continue
+            for stage_name, stage in run['stages'].items():
+                base_stage = base_run['stages'].get(stage_name)
+                if base_stage is None or base_stage['wall_seconds'] <= 0:
+                    continue
+                change = stage['wall_seconds'] / base_stage['wall_seconds'] - 1
+                marker = ' ✗' if change > threshold else ''
+                print(f"{scenario['name']:<28} {run_name:<6} {stage_name:<28} {base_stage['wall_seconds']:>10.3f} "
+                      f"{stage['wall_seconds']:>10.3f} {change:>+8.0%}{marker}")
+                if change > threshold:
+                    regressions.append((scenario['name'], run_name, stage_name, change))
+    return regressions
+
+
+def load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do pipeline (mídia sintética, OpenAI simulada)')
+    parser.add_argument('--clips', type=int, nargs='+', default=[1, 10, 50],
+                        help='Quantidades de clips dos cenários (padrão: 1 10 50)')
+    parser.add_argument('--durations', nargs='+', default=['short', 'long'],
+                        help='Durações dos clips: short (5s), long (60s) ou segundos (padrão: short long)')
+    parser.add_argument('--resolution', type=str, default='640x360', help='Resolução dos clips (padrão: 640x360)')
+    parser.add_argument('--container', type=str, default='mp4', choices=['mp4', 'mov', 'mkv'],
+                        help='Formato dos clips gerados; mov/mkv exercitam a conversão (padrão: mp4)')
+    parser.add_argument('--jobs', type=int, default=1, help='Processos na ingestão (padrão: 1)')
+    parser.add_argument('--render-backend', type=str, default='ffmpeg', choices=['ffmpeg', 'moviepy'])
+    parser.add_argument('--warm', action='store_true', help='Repete cada cenário com o cache de artefatos populado')
+    parser.add_argument('--whisper-latency', type=float, default=0.0,
+                        help='Latência simulada de cada transcrição em segundos (padrão: 0)')
+    parser.add_argument('--chat-latency', type=float, default=0.0,
+                        help='Latência simulada de cada chamada ao GPT em segundos (padrão: 0)')
+    parser.add_argument('--work-dir', type=str, default=os.path.join('benchmarks', 'work'),
+                        help='Diretório de trabalho e da mídia gerada (padrão: benchmarks/work)')
+    parser.add_argument('--output', type=str, default='benchmark_report.json',
+                        help='Relatório em JSON (padrão: benchmark_report.json)')
+    parser.add_argument('--compare', type=str, nargs='+', metavar='RELATORIO',
+                        help='Compara com um relatório base (ou compara dois relatórios sem executar)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Aumento relativo de tempo considerado regressão (padrão: 0.2)')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        regressions = compare_reports(load_report(args.compare[0]), load_report(args.compare[1]), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    stub = StubOpenAI(args.whisper_latency, args.chat_latency)
+    stub.install()
+
+    work_dir = os.path.abspath(args.work_dir)
+    media_dir = os.path.join(work_dir, 'media')
+    scenarios = []
+    for duration in args.durations:
+        for clips in args.clips:
+            scenarios.append(run_scenario(
+                stub, os.path.join(work_dir, 'runs'), media_dir, clips, duration,
+                args.resolution, args.container, args.jobs, args.render_backend, args.warm
+            ))
+
+    report = {'environment': environment_info(), 'scenarios': scenarios}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\nRelatório salvo em {args.output}")
+
+    if args.compare:
+        regressions = compare_reports(load_report(args.compare[0]), report, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Mede o ganho da renderização em partes paralelas em função do número de núcleos"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipeline_benchmark import prepare_media  # noqa: E402
+from src import artifact_cache  # noqa: E402
+from src.renderer import render_with_ffmpeg  # noqa: E402
+
+
+def default_job_counts():
+    """1, 2, 4, ... até o número de núcleos da máquina"""
+    cores = os.cpu_count() or 1
+    counts = []
+    jobs = 1
+    while jobs < cores:
+        counts.append(jobs)
+        jobs *= 2
+    counts.append(cores)
+    return counts
+
+
+def run_render(paths, jobs, work_dir, stream_copy):
+    """Renderiza a timeline com todos os clips (cortando 0,5s de cada ponta) e mede o tempo"""
+    clips_info = [{'path': path} for path in paths]
+    clips_timing = {index: (0.5, float('inf')) for index in range(len(paths))}
+    temp_dir = os.path.join(work_dir, f'temp_{jobs}')
+    output_file = os.path.join(work_dir, f'render_{jobs}.mp4')
+    # Cache de artefatos isolado por execução: as partes nunca vêm de uma medição anterior
+    # (nem do cache de produção) e toda execução encoda a timeline inteira
+    cache_dir = os.path.join(work_dir, f'cache_{jobs}')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    artifact_cache._default_cache = artifact_cache.ArtifactCache(cache_dir)
+
+    start = time.perf_counter()
+    render_with_ffmpeg(
+        list(range(len(paths))), clips_info, clips_timing, output_file, temp_dir,
+        jobs=jobs, stream_copy=stream_copy
+    )
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da renderização em partes paralelas')
+    parser.add_argument('--clips', type=int, default=4, help='Clips na timeline (padrão: 4)')
+    parser.add_argument('--seconds', type=float, default=60, help='Duração de cada clip (padrão: 60)')
+    parser.add_argument('--resolution', type=str, default='1280x720', help='Resolução (padrão: 1280x720)')
+    parser.add_argument('--jobs', type=int, nargs='+', help='Encodes simultâneos (padrão: 1, 2, 4... núcleos)')
+    parser.add_argument('--stream-copy', action='store_true',
+                        help='Permite stream copy (por padrão toda a timeline é re-encodada)')
+    parser.add_argument('--work-dir', type=str, default=os.path.join('benchmarks', 'work', 'render'),
+                        help='Diretório de trabalho (padrão: benchmarks/work/render)')
+    parser.add_argument('--output', type=str, help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    paths = prepare_media(os.path.join(work_dir, 'media'), args.clips, args.seconds, args.resolution, 'mp4')
+
+    results = []
+    baseline = None
+    for jobs in args.jobs or default_job_counts():
+        elapsed = run_render(paths, jobs, work_dir, args.stream_copy)
+        baseline = baseline or elapsed
+        results.append({'jobs': jobs, 'wall_seconds': elapsed, 'speedup': baseline / elapsed})
+
+    print(f"\nNúcleos: {os.cpu_count()}  Timeline: {args.clips} x {args.seconds:g}s {args.resolution}")
+    print(f"{'Encodes':>8} {'Tempo (s)':>10} {'Ganho':>8}")
+    for result in results:
+        print(f"{result['jobs']:>8} {result['wall_seconds']:>10.2f} {result['speedup']:>7.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'cpu_count': os.cpu_count(),
+                'clips': args.clips,
+                'seconds': args.seconds,
+                'resolution': args.resolution,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Compara a análise de áudio vetorizada com o pydub (paridade e tempo)"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_processor import (  # noqa: E402
+    detect_nonsilent_numpy, analyze_audio_levels, find_optimal_cut_points,
+    MIN_SILENCE_LEN, SILENCE_THRESH, SEEK_STEP
+)
+
+
+def reference_audio_levels(audio_segment, window_ms=100):
+    """Implementação original (fatiando o AudioSegment) usada como referência de paridade"""
+    chunks = [audio_segment[i:i+window_ms] for i in range(0, len(audio_segment), window_ms)]
+    levels = [chunk.dBFS for chunk in chunks]
+
+    window_size = 5
+    moving_avg = []
+    for i in range(len(levels)):
+        start = max(0, i - window_size)
+        end = min(len(levels), i + window_size)
+        moving_avg.append(sum(levels[start:end]) / (end - start))
+    return moving_avg
+
+
+def reference_cut_points(audio_segment, ranges):
+    """Implementação original da busca de pontos de corte usada como referência de paridade"""
+    levels = reference_audio_levels(audio_segment)
+    optimal_ranges = []
+    for start, end in ranges:
+        start_ms = int(start * 1000)
+        end_ms = int(end * 1000)
+        window_size = 500
+
+        start_idx = start_ms // 100
+        if start_idx > 0:
+            best_start = start_ms
+            min_level = float('inf')
+            for i in range(max(0, start_idx - window_size//100), start_idx + window_size//100):
+                if i < len(levels) and abs(levels[i]) < min_level:
+                    min_level = abs(levels[i])
+                    best_start = i * 100
+            start_ms = best_start
+
+        end_idx = end_ms // 100
+        if end_idx < len(levels):
+            best_end = end_ms
+            min_level = float('inf')
+            for i in range(end_idx - window_size//100, min(len(levels), end_idx + window_size//100)):
+                if abs(levels[i]) < min_level:
+                    min_level = abs(levels[i])
+                    best_end = i * 100
+            end_ms = best_end
+
+        optimal_ranges.append((start_ms/1000, end_ms/1000))
+    return optimal_ranges
+
+
+def synthetic_speech(seconds, frame_rate=44100, channels=1, sample_width=2, seed=0):
+    """Gera um áudio sintético com rajadas de 'fala' separadas por pausas"""
+    rng = np.random.default_rng(seed)
+    total_frames = int(seconds * frame_rate)
+    max_amp = 2 ** (sample_width * 8 - 1) - 1
+
+    # Ruído de fundo baixo (abaixo do threshold de silêncio)
+    signal = rng.normal(0, max_amp * 0.002, size=(total_frames, channels))
+
+    position = 0
+    while position < total_frames:
+        burst = int(rng.uniform(0.4, 4.0) * frame_rate)
+        gap = int(rng.uniform(0.05, 1.5) * frame_rate)
+        end = min(position + burst, total_frames)
+        t = np.arange(end - position) / frame_rate
+        envelope = 0.3 + 0.7 * np.abs(np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        tone = np.sin(2 * np.pi * rng.uniform(120, 300) * t) * envelope
+        signal[position:end] += (max_amp * rng.uniform(0.05, 0.5) * tone)[:, None]
+        position = end + gap
+
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+    samples = np.clip(signal, -max_amp, max_amp).astype(dtype)
+    return AudioSegment(
+        data=samples.tobytes(),
+        sample_width=sample_width,
+        frame_rate=frame_rate,
+        channels=channels
+    )
+
+
+def parity_cases():
+    """Casos de borda usados na verificação de paridade"""
+    silent = AudioSegment.silent(duration=2000, frame_rate=16000)
+    return [
+        ('mono 44.1k', synthetic_speech(20), {}),
+        ('estéreo 48k', synthetic_speech(20, frame_rate=48000, channels=2, seed=1), {}),
+        ('8k', synthetic_speech(15, frame_rate=8000, seed=2), {}),
+        ('22.05k seek_step=7', synthetic_speech(15, frame_rate=22050, seed=3), {'seek_step': 7}),
+        ('8 bits', synthetic_speech(10, sample_width=1, seed=4), {}),
+        ('todo silencioso', silent, {}),
+        ('mais curto que a janela', synthetic_speech(0.2, seed=5), {}),
+        ('sem silêncio', synthetic_speech(5, seed=6, frame_rate=16000) + 6, {'silence_thresh': -80}),
+    ]
+
+
+def check_parity():
+    """Verifica se os dois motores produzem exatamente os mesmos ranges"""
+    failures = 0
+    for name, audio, overrides in parity_cases():
+        params = {
+            'min_silence_len': MIN_SILENCE_LEN,
+            'silence_thresh': SILENCE_THRESH,
+            'seek_step': SEEK_STEP
+        }
+        params.update(overrides)
+
+        expected = detect_nonsilent(audio, **params)
+        actual = detect_nonsilent_numpy(audio, **params)
+        ok = expected == actual
+
+        # Níveis suavizados e pontos de corte contra as implementações originais
+        ranges = [(start / 1000, end / 1000) for start, end in expected]
+        ok = ok and reference_audio_levels(audio) == analyze_audio_levels(audio)
+        ok = ok and reference_cut_points(audio, ranges) == find_optimal_cut_points(audio, ranges)
+
+        print(f"{'✓' if ok else '✗'} paridade: {name}")
+        if not ok:
+            failures += 1
+            print(f"  pydub: {expected}")
+            print(f"  numpy: {actual}")
+    return failures
+
+
+def run_benchmark(minutes_list, frame_rate, channels, pydub_max_minutes):
+    """Mede o tempo de cada motor para áudios de diferentes durações"""
+    results = []
+    for minutes in minutes_list:
+        audio = synthetic_speech(minutes * 60, frame_rate=frame_rate, channels=channels, seed=minutes)
+        params = {
+            'min_silence_len': MIN_SILENCE_LEN,
+            'silence_thresh': SILENCE_THRESH,
+            'seek_step': SEEK_STEP
+        }
+
+        start = time.perf_counter()
+        numpy_ranges = detect_nonsilent_numpy(audio, **params)
+        numpy_seconds = time.perf_counter() - start
+
+        pydub_seconds = None
+        parity = None
+        if minutes <= pydub_max_minutes:
+            start = time.perf_counter()
+            pydub_ranges = detect_nonsilent(audio, **params)
+            pydub_seconds = time.perf_counter() - start
+            parity = pydub_ranges == numpy_ranges
+
+        result = {
+            'minutes': minutes,
+            'ranges': len(numpy_ranges),
+            'numpy_seconds': round(numpy_seconds, 4),
+            'pydub_seconds': round(pydub_seconds, 4) if pydub_seconds is not None else None,
+            'speedup': round(pydub_seconds / numpy_seconds, 1) if pydub_seconds else None,
+            'parity': parity
+        }
+        results.append(result)
+        pydub_text = f"{pydub_seconds:8.3f}s" if pydub_seconds is not None else f"{'-':>9}"
+        print(
+            f"{minutes:>4} min | numpy {numpy_seconds:8.3f}s | pydub {pydub_text} | "
+            f"{result['speedup'] or '-'}x | paridade: {parity}"
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da detecção de silêncio (NumPy x pydub)')
+    parser.add_argument('--minutes', type=int, nargs='+', default=[1, 10, 60],
+                        help='Durações dos áudios sintéticos em minutos (padrão: 1 10 60)')
+    parser.add_argument('--frame-rate', type=int, default=44100, help='Taxa de amostragem (padrão: 44100)')
+    parser.add_argument('--channels', type=int, default=1, help='Número de canais (padrão: 1)')
+    parser.add_argument('--pydub-max-minutes', type=int, default=60,
+                        help='Maior duração em que o pydub também é executado (padrão: 60)')
+    parser.add_argument('--parity-only', action='store_true', help='Executa apenas a verificação de paridade')
+    parser.add_argument('--output', type=str, help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    print("=== Paridade NumPy x pydub ===")
+    failures = check_parity()
+
+    results = []
+    if not args.parity_only:
+        print("\n=== Benchmark ===")
+        results = run_benchmark(args.minutes, args.frame_rate, args.channels, args.pydub_max_minutes)
+        failures += sum(1 for result in results if result['parity'] is False)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'parity_failures': failures, 'results': results}, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Compara o áudio enviado ao Whisper: clip inteiro contra só os trechos com fala"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipeline_benchmark import (  # noqa: E402
+    generate_clip, LEADING_SILENCE, SPEECH_SECONDS, GAP_SECONDS
+)
+from src import artifact_cache  # noqa: E402
+from src.speech_audio import extract_speech_parts  # noqa: E402
+
+
+def synthetic_ranges(seconds):
+    """Trechos com fala do clip sintético (os tons do generate_clip)"""
+    ranges = []
+    start = LEADING_SILENCE
+    while start < seconds:
+        ranges.append((start, min(seconds, start + SPEECH_SECONDS)))
+        start += SPEECH_SECONDS + GAP_SECONDS
+    return ranges
+
+
+def measure(clip, temp_dir, mode, max_bytes):
+    """Extrai o áudio (com cache vazio, sem reaproveitar execuções anteriores) e mede bytes e tempo"""
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    artifact_cache._default_cache = artifact_cache.ArtifactCache(os.path.join(temp_dir, 'cache'))
+    start = time.perf_counter()
+    parts = extract_speech_parts(dict(clip), temp_dir, mode=mode, max_bytes=max_bytes)
+    elapsed = time.perf_counter() - start
+    speech_seconds = sum(end - start for _, ranges in parts for start, end in (ranges or []))
+    return {
+        'parts': len(parts),
+        'upload_bytes': sum(os.path.getsize(path) for path, _ in parts),
+        'speech_seconds': speech_seconds or None,
+        'wall_seconds': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do áudio de fala enviado ao Whisper')
+    parser.add_argument('--seconds', type=float, default=120, help='Duração do clip sintético (padrão: 120)')
+    parser.add_argument('--max-bytes', type=int, default=None,
+                        help='Limite de upload por arquivo (padrão: WHISPER_MAX_UPLOAD_BYTES)')
+    parser.add_argument('--work-dir', type=str, default=os.path.join('benchmarks', 'work', 'speech'),
+                        help='Diretório de trabalho (padrão: benchmarks/work/speech)')
+    parser.add_argument('--output', type=str, help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    path = os.path.join(args.work_dir, f'clip_{args.seconds:g}s.mp4')
+    if not os.path.exists(path):
+        generate_clip(path, args.seconds)
+    clip = {'id': 0, 'path': path, 'ranges': synthetic_ranges(args.seconds)}
+
+    results = {
+        mode: measure(clip, os.path.join(args.work_dir, f'temp_{mode}'), mode, args.max_bytes)
+        for mode in ('full', 'nonsilent')
+    }
+
+    print(f"\n{'Modo':<10} {'Partes':>6} {'Bytes':>10} {'Tempo (s)':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<10} {result['parts']:>6} {result['upload_bytes']:>10} {result['wall_seconds']:>10.2f}")
+    full_bytes = results['full']['upload_bytes']
+    print(f"Upload {full_bytes / results['nonsilent']['upload_bytes']:.2f}x menor; "
+          f"{results['nonsilent']['speech_seconds']:.1f}s de fala de {args.seconds:g}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'seconds': args.seconds, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
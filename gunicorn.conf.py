@@ -2,9 +2,11 @@ import multiprocessing
 
 # Configuração do Gunicorn para o Render
 bind = "0.0.0.0:10000"  # Porta que o Render usa
-workers = multiprocessing.cpu_count() * 2 + 1
-threads = 2
-timeout = 300  # Aumentado para processar vídeos maiores
-worker_class = 'sync'
+# Os jobs e seu estado ficam na memória do processo: um único worker com threads
+# atende as requisições, e o processamento pesado roda na fila de jobs (src/jobs.py)
+workers = 1
+threads = max(4, multiprocessing.cpu_count() * 2)
+timeout = 120  # As requisições só enfileiram ou consultam jobs
+worker_class = 'gthread'
 accesslog = '-'
 errorlog = '-'
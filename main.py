@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 import os
 import argparse
+from contextlib import nullcontext
 from dotenv import load_dotenv
 from src import (
     setup_folders,
-    get_clips_info,
+    iter_clips_info,
+    transcribe_stream,
     get_ai_script,
     parse_ai_response,
     create_final_video,
     remove_duplicate_content
 )
+from src.instrumentation import recording
 
 def parse_arguments():
     """Configura e processa argumentos da linha de comando"""
@@ -38,6 +41,63 @@ def parse_arguments():
         help='Diretório para arquivos temporários (padrão: temp)'
     )
     
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Processos usados na ingestão dos clips (padrão: 1, ou INGEST_JOBS; 0 = todos os núcleos)'
+    )
+    
+    parser.add_argument(
+        '--render-backend',
+        type=str,
+        choices=['ffmpeg', 'moviepy'],
+        default=None,
+        help='Backend de renderização do vídeo final (padrão: ffmpeg, ou RENDER_BACKEND)'
+    )
+    
+    parser.add_argument(
+        '--render-jobs',
+        type=int,
+        default=None,
+        help='Encodes simultâneos na renderização (padrão: todos os núcleos, ou RENDER_JOBS)'
+    )
+    
+    parser.add_argument(
+        '--proxy',
+        action='store_true',
+        default=None,
+        help='Analisa proxies leves e usa os originais só na renderização final (padrão: PROXY_MODE)'
+    )
+    
+    parser.add_argument(
+        '--transcriber',
+        choices=['openai', 'local'],
+        default=None,
+        help='Backend de transcrição: API da OpenAI ou Whisper local (padrão: TRANSCRIBER, ou openai)'
+    )
+    
+    parser.add_argument(
+        '--preview',
+        action='store_true',
+        help='Renderiza só uma prévia rápida em resolução reduzida (MP4 fragmentado)'
+    )
+    
+    parser.add_argument(
+        '--no-gpt-cache',
+        action='store_true',
+        help='Ignora as respostas do GPT em cache e faz novas chamadas (as respostas novas são salvas)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        type=str,
+        nargs='?',
+        const='profile.json',
+        default=None,
+        help='Mede tempo, CPU, memória e disco de cada etapa e salva em JSON (padrão: profile.json)'
+    )
+    
     return parser.parse_args()
 
 def main():
@@ -45,7 +105,8 @@ def main():
     # Carrega variáveis de ambiente
     load_dotenv()
     
-    # Verifica a chave da API
+    # Verifica a chave da API: mesmo com --transcriber local e DEDUP_MODE=local, a narrativa e
+    # os cortes continuam vindo do GPT-4, então a chave é sempre necessária
     if not os.getenv('OPENAI_API_KEY'):
         print("Erro: OPENAI_API_KEY não encontrada!")
         print("Por favor, crie um arquivo .env com sua chave da API OpenAI")
@@ -54,61 +115,89 @@ def main():
     # Processa argumentos da linha de comando
     args = parse_arguments()
     
-    try:
-        # Configuração inicial
-        print("\n=== Editor de Vídeo com IA ===")
-        setup_folders()
-        
-        # Passo 1: Processar arquivos
-        print("\n1. Processando clips de entrada...")
-        clips_info = get_clips_info()
-        
-        if not clips_info:
-            print(f"\nNenhum clip encontrado no diretório '{args.clips_dir}'")
-            print("Coloque seus vídeos no diretório 'clips' e tente novamente")
-            return
+    # Com --profile, cada etapa é medida e o resultado é salvo ao final
+    with (recording() if args.profile else nullcontext()) as recorder:
+        try:
+            # Configuração inicial
+            print("\n=== Editor de Vídeo com IA ===")
+            setup_folders(args.clips_dir, args.temp_dir)
+            
+            # Passo 1: Processar e transcrever os arquivos (cada clip é transcrito assim que fica pronto)
+            print("\n1. Processando e transcrevendo clips de entrada...")
+            ingest_errors = []
+            clips_info = transcribe_stream(
+                iter_clips_info(
+                    jobs=args.jobs, errors=ingest_errors,
+                    clips_dir=args.clips_dir, temp_dir=args.temp_dir,
+                    proxy=args.proxy
+                ),
+                temp_dir=args.temp_dir,
+                transcriber=args.transcriber
+            )
+            
+            if not clips_info:
+                print(f"\nNenhum clip encontrado no diretório '{args.clips_dir}'")
+                print(f"Coloque seus vídeos no diretório '{args.clips_dir}' e tente novamente")
+                return
+                
+            print(f"✓ {len(clips_info)} clips processados com sucesso")
+            if ingest_errors:
+                print(f"✗ {len(ingest_errors)} arquivos não puderam ser processados:")
+                for error in ingest_errors:
+                    print(f"  - {error['file']}: {error['error']}")
+            
+            # Passo 1.5: Remover conteúdo duplicado (com as transcrições já prontas)
+            print("\n1.5. Analisando e removendo conteúdo repetido...")
+            original_count = len(clips_info)
+            use_gpt_cache = False if args.no_gpt_cache else None
+            clips_info = remove_duplicate_content(clips_info, use_cache=use_gpt_cache)
+            removed_count = original_count - len(clips_info)
+            if removed_count > 0:
+                print(f"✓ {removed_count} clips com conteúdo repetido removidos")
+            else:
+                print("✓ Nenhum conteúdo repetido encontrado")
+            
+            # Passo 2: Gerar script com IA
+            print("\n2. Analisando conteúdo e gerando narrativa...")
+            ai_response = get_ai_script(clips_info, temp_dir=args.temp_dir, use_cache=use_gpt_cache)
+            
+            # Passo 3: Extrair narrativa e ordem dos clips
+            print("\n3. Interpretando resposta da IA...")
+            narrative, clips_order, clips_timing = parse_ai_response(ai_response, clips_info)
+            
+            print("\nNarrativa gerada:")
+            print("-" * 50)
+            print(narrative)
+            print("-" * 50)
+            
+            print("\nSequência de edição:")
+            print(f"Ordem dos clips: {clips_order}")
+            print(f"Tempos dos clips: {clips_timing}")
+            
+            # Passo 4: Criar vídeo final (ou só a prévia)
+            print("\n4. Criando prévia..." if args.preview else "\n4. Criando vídeo final...")
+            create_final_video(
+                clips_order, clips_info, clips_timing,
+                output_file=args.output,
+                backend=args.render_backend,
+                temp_dir=args.temp_dir,
+                preview=args.preview,
+                render_jobs=args.render_jobs
+            )
+            
+            print("\n✨ Processo concluído com sucesso! ✨")
+            print(f"O vídeo final foi salvo como: {args.output}")
             
-        print(f"✓ {len(clips_info)} clips processados com sucesso")
-        
-        # Passo 1.5: Remover conteúdo duplicado usando GPT
-        print("\n1.5. Analisando e removendo conteúdo repetido...")
-        original_count = len(clips_info)
-        clips_info = remove_duplicate_content(clips_info)
-        removed_count = original_count - len(clips_info)
-        if removed_count > 0:
-            print(f"✓ {removed_count} clips com conteúdo repetido removidos")
-        else:
-            print("✓ Nenhum conteúdo repetido encontrado")
-        
-        # Passo 2: Gerar script com IA
-        print("\n2. Analisando conteúdo e gerando narrativa...")
-        ai_response = get_ai_script(clips_info)
-        
-        # Passo 3: Extrair narrativa e ordem dos clips
-        print("\n3. Interpretando resposta da IA...")
-        narrative, clips_order, clips_timing = parse_ai_response(ai_response)
-        
-        print("\nNarrativa gerada:")
-        print("-" * 50)
-        print(narrative)
-        print("-" * 50)
-        
-        print("\nSequência de edição:")
-        print(f"Ordem dos clips: {clips_order}")
-        print(f"Tempos dos clips: {clips_timing}")
-        
-        # Passo 4: Criar vídeo final
-        print("\n4. Criando vídeo final...")
-        create_final_video(clips_order, clips_info, clips_timing)
-        
-        print("\n✨ Processo concluído com sucesso! ✨")
-        print(f"O vídeo final foi salvo como: {args.output}")
-        
-    except KeyboardInterrupt:
-        print("\n\nProcesso interrompido pelo usuário.")
-    except Exception as e:
-        print(f"\nErro durante o processamento: {str(e)}")
-        raise
+        except KeyboardInterrupt:
+            print("\n\nProcesso interrompido pelo usuário.")
+        except Exception as e:
+            print(f"\nErro durante o processamento: {str(e)}")
+            raise
+        finally:
+            if recorder is not None:
+                recorder.print_summary()
+                recorder.export_json(args.profile)
+                print(f"\nPerfil de execução salvo em: {args.profile}")
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,21 @@
 from .audio_processor import detect_silence, analyze_audio_levels, find_optimal_cut_points
+from .audio_analysis import AudioAnalysis
 from .video_processor import (
     convert_to_mp4, create_video_from_audio, convert_to_audio,
     create_final_video
 )
 from .ai_director import get_ai_script, parse_ai_response
-from .transcription import extract_transcripts, remove_duplicate_content
+from .transcription import extract_transcripts, transcribe_stream, remove_duplicate_content
 from .utils import (
     setup_folders, is_video_file, is_audio_file,
-    get_clips_info, process_file
+    get_clips_info, iter_clips_info, process_file
 )
 
 __all__ = [
     'detect_silence',
     'analyze_audio_levels',
     'find_optimal_cut_points',
+    'AudioAnalysis',
     'convert_to_mp4',
     'create_video_from_audio',
     'convert_to_audio',
@@ -21,10 +23,12 @@ __all__ = [
     'get_ai_script',
     'parse_ai_response',
     'extract_transcripts',
+    'transcribe_stream',
     'remove_duplicate_content',
     'setup_folders',
     'is_video_file',
     'is_audio_file',
     'get_clips_info',
+    'iter_clips_info',
     'process_file'
 ]
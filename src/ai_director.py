@@ -1,12 +1,186 @@
 import os
-import openai
-from .transcription import extract_transcripts
+import re
+import hashlib
+from .transcription import extract_transcripts, transcript_entries, segment_entries
+from .prompt_budget import (
+    prompt_budget, count_message_tokens, compact_entries, chunk_entries,
+    dedupe_entries, render_entries, truncate_words, truncate_lines
+)
+from .segments import segment_range_times
+from .instrumentation import span
+from .gpt_cache import cached_chat_completion
 
-def get_ai_script(clips_info):
+# Versões dos prompts de análise e de edição: mudar o texto de um prompt exige incrementar
+STRUCTURE_PROMPT_VERSION = 1
+EDIT_PROMPT_VERSION = 2
+
+# Tokens reservados para as respostas de cada chamada
+STRUCTURE_MAX_TOKENS = 1000
+EDIT_MAX_TOKENS = 2000
+SUMMARY_MAX_TOKENS = 1500
+
+# Resumos (etapa map): palavras por clip e níveis de resumo antes de desistir de caber no orçamento
+SUMMARY_PROMPT_VERSION = 1
+SUMMARY_WORDS = 40
+MAX_SUMMARY_LEVELS = 2
+
+STRUCTURE_SYSTEM = "Você é um analista de estrutura narrativa especializado em identificar dependências lógicas e fluxo de informação."
+
+STRUCTURE_TEMPLATE = """Analise as transcrições abaixo e identifique a estrutura lógica do conteúdo.
+Para cada clip, determine:
+1. Seu papel na narrativa (introdução, explicação, demonstração, conclusão)
+2. Conceitos que ele introduz
+3. Conceitos que ele referencia
+4. Dependências de informação (o que precisa ser explicado antes)
+
+TRANSCRIÇÕES:
+{transcripts}
+
+RESPONDA NO FORMATO:
+ESTRUTURA:
+[Clip ID]: [Papel] | Introduz: [conceitos] | Referencia: [conceitos] | Requer: [IDs de clips necessários antes]"""
+
+EDIT_SYSTEM = """Você é um diretor de vídeo especializado em criar narrativas lógicas e coesas.
+Sua tarefa é:
+1. Analisar criticamente cada clip
+2. Remover clips que não contribuem para a narrativa
+3. Reorganizar os clips restantes em uma ordem que faça sentido
+4. Criar uma narrativa coesa e envolvente
+
+NUNCA mantenha clips irrelevantes apenas porque eles existem.
+NUNCA mantenha a ordem original dos clips se uma ordem diferente fizer mais sentido.
+Sempre priorize a qualidade e coerência do vídeo final sobre a quantidade de clips."""
+
+EDIT_TEMPLATE = """ANÁLISE DE ESTRUTURA:
+{structure}
+
+SEGMENTOS DAS TRANSCRIÇÕES (clip.segmento: início da fala de cada segmento):
+{segments}
+
+Com base na análise de estrutura acima, crie um roteiro de edição que:
+1. Respeite todas as dependências de informação
+2. Mantenha uma progressão lógica clara
+3. Agrupe clips relacionados
+4. Crie uma narrativa coesa do início ao fim
+5. REMOVA clips que não contribuem para a narrativa ou são irrelevantes para o contexto
+
+RESPONDA EXATAMENTE NESTE FORMATO:
+NARRATIVE:
+[Explicação detalhada da narrativa, incluindo:
+- Por que esta ordem foi escolhida
+- Quais clips foram removidos e por quê
+- Como os clips restantes se conectam logicamente]
+
+CLIPS_ORDER:
+[Lista APENAS dos números dos clips que devem ser incluídos, na ordem correta. Exemplo: 3,1,4,2
+NÃO inclua clips que foram removidos por serem irrelevantes]
+
+CLIPS_SEGMENTS:
+[Segmentos de cada clip incluído no formato clip:primeiro-último, exemplo: 3:0-4;1:2-5;4:0-1;2:0-6
+O corte começa no início do primeiro segmento e termina no fim do último]
+
+IMPORTANTE:
+- Você tem TOTAL LIBERDADE para remover clips que:
+  * Não contribuem para a narrativa principal
+  * São redundantes ou repetem informações
+  * Quebram o fluxo lógico do vídeo
+  * Estão fora de contexto
+- A ordem dos clips DEVE ser diferente da ordem original se fizer mais sentido logicamente
+- Explique na narrativa POR QUE cada clip foi mantido ou removido
+- Certifique-se que cada conceito é introduzido antes de ser referenciado
+- Agrupe clips relacionados tematicamente
+- Use os segmentos para cortar falas incompletas ou desnecessárias no começo e no fim dos clips"""
+
+SUMMARY_TEMPLATE = """Resuma cada clip abaixo em no máximo {words} palavras, mantendo os conceitos principais,
+o papel do clip na explicação e os termos técnicos citados.
+
+{transcripts}
+
+RESPONDA COM UMA LINHA POR CLIP, NO FORMATO:
+Clip [ID]: [resumo]"""
+
+def _structure_messages(transcripts):
+    return [
+        {"role": "system", "content": STRUCTURE_SYSTEM},
+        {"role": "user", "content": STRUCTURE_TEMPLATE.format(transcripts=transcripts)}
+    ]
+
+def _edit_messages(structure, segments):
+    return [
+        {"role": "system", "content": EDIT_SYSTEM},
+        {"role": "user", "content": EDIT_TEMPLATE.format(structure=structure, segments=segments)}
+    ]
+
+def _summary_messages(transcripts):
+    return [
+        {"role": "system", "content": STRUCTURE_SYSTEM},
+        {"role": "user", "content": SUMMARY_TEMPLATE.format(words=SUMMARY_WORDS, transcripts=transcripts)}
+    ]
+
+def _summarize_entries(entries, api_key=None, use_cache=None):
+    """Etapa map: resume as transcrições em partes que cabem no orçamento de cada chamada"""
+    available = prompt_budget('gpt-4', SUMMARY_MAX_TOKENS) - count_message_tokens(_summary_messages(''))
+    # Cada parte também precisa caber na resposta: ~2 tokens por palavra resumida
+    max_entries = max(1, SUMMARY_MAX_TOKENS // (SUMMARY_WORDS * 2))
+    with_text = [entry for entry in dedupe_entries(entries) if entry[1]]
+    chunks = chunk_entries(with_text, available, max_entries=max_entries)
+    print(f"Resumindo {len(with_text)} transcrições em {len(chunks)} partes...")
+    
+    summaries = {}
+    for chunk in chunks:
+        text = render_entries(chunk)
+        content = cached_chat_completion(
+            'summary', SUMMARY_PROMPT_VERSION, text, use_cache=use_cache,
+            cache_params={'words': SUMMARY_WORDS},
+            api_key=api_key,
+            model="gpt-4",
+            messages=_summary_messages(text),
+            temperature=0.3,
+            max_tokens=SUMMARY_MAX_TOKENS
+        )
+        for line in content.splitlines():
+            match = re.match(r'\s*Clip (\d+):\s*(.+)', line)
+            if match:
+                summaries[int(match.group(1))] = match.group(2).strip()
+    
+    return [
+        (header, summaries.get(int(re.match(r'Clip (\d+)', header).group(1)), body))
+        for header, body in entries
+    ]
+
+def _fit_transcripts(clips_info, api_key=None, use_cache=None):
+    """Transcrições do prompt de estrutura dentro do orçamento: compacta e, se preciso, resume em partes"""
+    available = prompt_budget('gpt-4', STRUCTURE_MAX_TOKENS) - count_message_tokens(_structure_messages(''))
+    entries = transcript_entries(clips_info)
+    
+    # Os resumos de cada nível voltam para a compactação (etapa reduce: uma análise de estrutura)
+    for level in range(MAX_SUMMARY_LEVELS + 1):
+        compacted = compact_entries(entries, available)
+        if compacted is not None:
+            return render_entries(compacted)
+        if level < MAX_SUMMARY_LEVELS:
+            entries = _summarize_entries(entries, api_key, use_cache)
+    
+    print("Aviso: transcrições não couberam no orçamento mesmo resumidas; dividindo o orçamento entre os clips")
+    limit = max(1, available // len(entries) - 10)
+    return render_entries([(header, truncate_words(body, limit) if body else body) for header, body in entries])
+
+def _fit_segments(clips_info, structure):
+    """Segmentos do prompt de edição dentro do orçamento (mantém o começo e o fim de cada clip)"""
+    available = prompt_budget('gpt-4', EDIT_MAX_TOKENS) - count_message_tokens(_edit_messages(structure, ''))
+    entries = segment_entries(clips_info)
+    compacted = compact_entries(entries, available, dedupe=False, by_lines=True)
+    if compacted is None:
+        print("Aviso: segmentos não couberam no orçamento; dividindo o orçamento entre os clips")
+        limit = max(1, available // max(1, len(entries)) - 10)
+        compacted = [(header, truncate_lines(body, limit) if body else body) for header, body in entries]
+    return render_entries(compacted)
+
+def get_ai_script(clips_info, api_key=None, temp_dir="temp", use_cache=None):
     """Gera um script de edição usando IA"""
-    openai.api_key = os.getenv('OPENAI_API_KEY')
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
     
-    transcripts = extract_transcripts(clips_info)
+    extract_transcripts(clips_info, api_key=api_key, temp_dir=temp_dir)
     
     system_message = {
         "role": "system",
@@ -77,97 +251,35 @@ CLIPS_TIMING:
     try:
         print("\nEnviando requisição para GPT-4...")
         
-        # Primeiro, analisa a estrutura lógica dos clips
-        structure_prompt = {
-            "role": "user",
-            "content": f"""Analise as transcrições abaixo e identifique a estrutura lógica do conteúdo.
-Para cada clip, determine:
-1. Seu papel na narrativa (introdução, explicação, demonstração, conclusão)
-2. Conceitos que ele introduz
-3. Conceitos que ele referencia
-4. Dependências de informação (o que precisa ser explicado antes)
-
-TRANSCRIÇÕES:
-{transcripts}
-
-RESPONDA NO FORMATO:
-ESTRUTURA:
-[Clip ID]: [Papel] | Introduz: [conceitos] | Referencia: [conceitos] | Requer: [IDs de clips necessários antes]"""
-        }
+        # Primeiro, analisa a estrutura lógica dos clips (transcrições compactadas para caber no orçamento)
+        transcripts = _fit_transcripts(clips_info, api_key, use_cache)
         
-        structure_response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Você é um analista de estrutura narrativa especializado em identificar dependências lógicas e fluxo de informação."},
-                structure_prompt
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
+        # Transcrições idênticas a uma execução anterior reaproveitam as respostas do GPT
+        with span('gpt_structure_analysis'):
+            structure = cached_chat_completion(
+                'structure', STRUCTURE_PROMPT_VERSION, transcripts, use_cache=use_cache,
+                api_key=api_key,
+                model="gpt-4",
+                messages=_structure_messages(transcripts),
+                temperature=0.3,
+                max_tokens=STRUCTURE_MAX_TOKENS
+            )
         
         # Usa a análise de estrutura para informar a edição final
-        edit_prompt = {
-            "role": "user",
-            "content": f"""ANÁLISE DE ESTRUTURA:
-{structure_response.choices[0].message['content']}
-
-TRANSCRIÇÕES:
-{transcripts}
-
-Com base na análise de estrutura acima, crie um roteiro de edição que:
-1. Respeite todas as dependências de informação
-2. Mantenha uma progressão lógica clara
-3. Agrupe clips relacionados
-4. Crie uma narrativa coesa do início ao fim
-5. REMOVA clips que não contribuem para a narrativa ou são irrelevantes para o contexto
-
-RESPONDA EXATAMENTE NESTE FORMATO:
-NARRATIVE:
-[Explicação detalhada da narrativa, incluindo:
-- Por que esta ordem foi escolhida
-- Quais clips foram removidos e por quê
-- Como os clips restantes se conectam logicamente]
-
-CLIPS_ORDER:
-[Lista APENAS dos números dos clips que devem ser incluídos, na ordem correta. Exemplo: 3,1,4,2
-NÃO inclua clips que foram removidos por serem irrelevantes]
-
-CLIPS_TIMING:
-[Tempos de cada clip incluído no formato clip:inicio-fim, exemplo: 3:0-15;1:5-20;4:0-10;2:0-30]
-
-IMPORTANTE:
-- Você tem TOTAL LIBERDADE para remover clips que:
-  * Não contribuem para a narrativa principal
-  * São redundantes ou repetem informações
-  * Quebram o fluxo lógico do vídeo
-  * Estão fora de contexto
-- A ordem dos clips DEVE ser diferente da ordem original se fizer mais sentido logicamente
-- Explique na narrativa POR QUE cada clip foi mantido ou removido
-- Certifique-se que cada conceito é introduzido antes de ser referenciado
-- Agrupe clips relacionados tematicamente"""
-        }
+        segments = _fit_segments(clips_info, structure)
         
         # Gera o script final com temperatura mais baixa para maior consistência
-        final_response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": """Você é um diretor de vídeo especializado em criar narrativas lógicas e coesas.
-Sua tarefa é:
-1. Analisar criticamente cada clip
-2. Remover clips que não contribuem para a narrativa
-3. Reorganizar os clips restantes em uma ordem que faça sentido
-4. Criar uma narrativa coesa e envolvente
-
-NUNCA mantenha clips irrelevantes apenas porque eles existem.
-NUNCA mantenha a ordem original dos clips se uma ordem diferente fizer mais sentido.
-Sempre priorize a qualidade e coerência do vídeo final sobre a quantidade de clips."""},
-                edit_prompt
-            ],
-            temperature=0.2,  # Reduzido para maior consistência
-            max_tokens=2000
-        )
+        with span('gpt_edit_script'):
+            content = cached_chat_completion(
+                'edit', EDIT_PROMPT_VERSION, segments, use_cache=use_cache,
+                cache_params={'structure': hashlib.sha256(structure.encode('utf-8')).hexdigest()},
+                api_key=api_key,
+                model="gpt-4",
+                messages=_edit_messages(structure, segments),
+                temperature=0.2,  # Reduzido para maior consistência
+                max_tokens=EDIT_MAX_TOKENS
+            )
         
-        content = final_response.choices[0].message['content']
         print("\nResposta recebida do GPT-4:")
         print("-" * 50)
         print(content)
@@ -178,13 +290,36 @@ Sempre priorize a qualidade e coerência do vídeo final sobre a quantidade de c
         print(f"\nErro ao gerar script com GPT-4: {str(e)}")
         raise
 
-def parse_ai_response(response):
+def _segments_timing(segments_str, clips_by_id):
+    """Converte os intervalos de segmentos (clip:primeiro-último) nos tempos exatos de cada clip"""
+    clips_timing = {}
+    for item in re.split(r'[;\n]', segments_str):
+        # Aceita tanto "3:0-4" quanto "3:3.0-3.4"
+        match = re.match(r'\s*(\d+)\s*:\s*(?:\d+\.)?(\d+)\s*(?:-\s*(?:\d+\.)?(\d+))?\s*$', item)
+        if not match:
+            if item.strip():
+                print(f"Aviso: Intervalo de segmentos inválido ignorado: {item}")
+            continue
+        
+        clip_idx, first = int(match.group(1)), int(match.group(2))
+        last = int(match.group(3)) if match.group(3) is not None else first
+        if clip_idx not in clips_by_id:
+            print(f"Aviso: Clip {clip_idx} desconhecido ignorado: {item}")
+            continue
+        try:
+            clips_timing[clip_idx] = segment_range_times(clips_by_id[clip_idx].get('segments'), first, last)
+        except ValueError as e:
+            print(f"Aviso: Segmentos do clip {clip_idx} ignorados: {item} - {str(e)}")
+    return clips_timing
+
+def parse_ai_response(response, clips_info=None, api_key=None, retry=True):
     """Analisa e extrai informações da resposta da IA"""
     print("\nAnalisando resposta da IA...")
     
     narrative = ""
     clips_order = []
     clips_timing = {}
+    clips_by_id = {clip['id']: clip for clip in clips_info or []}
     
     try:
         # Divide a resposta em seções
@@ -209,13 +344,16 @@ def parse_ai_response(response):
                         clips_order = [int(x.strip()) for x in order_str.split(',')]
                         if len(clips_order) == 0:
                             raise ValueError("Lista de clips vazia")
-                        if clips_order == list(range(len(clips_order))):
+                        # Com um único clip a ordem [0] é a única possível, não uma ordem "não alterada"
+                        if len(clips_order) > 1 and clips_order == list(range(len(clips_order))):
                             raise ValueError("Ordem dos clips não foi alterada da sequência original")
                     except Exception as e:
                         print(f"Erro ao processar ordem dos clips: {str(e)}")
-                        print("Tentando gerar nova ordem...")
-                        # Se falhar, tenta novamente com um prompt mais enfático
-                        return get_ai_script(clips_info)
+                        if clips_info is not None and retry:
+                            print("Tentando gerar nova ordem...")
+                            # Se falhar, tenta uma vez mais sem reaproveitar a resposta em cache
+                            response = get_ai_script(clips_info, api_key=api_key, use_cache=False)
+                            return parse_ai_response(response, clips_info, api_key, retry=False)
                 print(f"Ordem dos clips: {clips_order}")
                 
             # Procura pelos tempos dos clips
@@ -233,6 +371,18 @@ def parse_ai_response(response):
                             except ValueError as e:
                                 print(f"Aviso: Tempo inválido ignorado: {timing} - {str(e)}")
                 print(f"Tempos dos clips: {clips_timing}")
+                
+            # Procura pelos segmentos dos clips (tempos exatos do Whisper)
+            elif section.startswith('CLIPS_SEGMENTS:'):
+                segments_str = section.replace('CLIPS_SEGMENTS:', '').strip().strip('[]')
+                clips_timing.update(_segments_timing(segments_str, clips_by_id))
+                print(f"Tempos dos clips (segmentos): {clips_timing}")
+        
+        # Clips sem intervalo definido usam o trecho sem silêncio detectado na ingestão
+        for clip_idx in clips_order:
+            clip = clips_by_id.get(clip_idx)
+            if clip_idx not in clips_timing and clip and 'start' in clip:
+                clips_timing[clip_idx] = (clip['start'], clip['end'])
         
         # Validação final
         if not clips_order or len(clips_order) == 0:
@@ -243,6 +393,9 @@ def parse_ai_response(response):
     except Exception as e:
         print(f"\nErro ao analisar resposta da IA: {str(e)}")
         print(f"Resposta original:\n{response}")
+        if clips_info is None or not retry:
+            raise
         print("Tentando gerar nova ordem...")
-        # Se falhar, tenta novamente
-        return get_ai_script(clips_info)
+        # Se falhar, tenta uma vez mais sem reaproveitar a resposta em cache
+        response = get_ai_script(clips_info, api_key=api_key, use_cache=False)
+        return parse_ai_response(response, clips_info, api_key, retry=False)
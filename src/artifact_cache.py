@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+# Diretório e orçamento de disco do cache de artefatos
+CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR', 'cache')
+CACHE_MAX_BYTES = int(os.getenv('ARTIFACT_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Máximo de entradas no índice persistente de hashes (o log é compactado ao passar do dobro)
+HASH_INDEX_MAX_ENTRIES = 10000
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    """Calcula o SHA-256 do conteúdo de um arquivo (memorizado por caminho, tamanho e mtime)"""
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    # O índice persistente evita reler arquivos inalterados em execuções seguintes
+    cache = get_cache()
+    content_hash = cache.lookup_hash(memo_key)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        cache.store_hash(memo_key, content_hash)
+
+    with _hash_lock:
+        _hash_memo[memo_key] = content_hash
+    return content_hash
+
+
+def make_key(kind, content_hash, **params):
+    """Monta a chave de um artefato a partir do hash da origem e dos parâmetros usados"""
+    payload = json.dumps({'kind': kind, 'hash': content_hash, 'params': params}, sort_keys=True)
+    return f"{kind}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:40]}"
+
+
+def materialize(source_path, output_path):
+    """Disponibiliza um artefato no caminho de trabalho (cópia independente do objeto do cache)"""
+    if os.path.abspath(source_path) == os.path.abspath(output_path):
+        return output_path
+    output_dir = os.path.dirname(output_path) or '.'
+    os.makedirs(output_dir, exist_ok=True)
+    # Sem hard link: o ffmpeg sobrescreve esses caminhos depois e truncaria o objeto do cache.
+    # A cópia vai para um nome temporário e substitui o destino, sem escrever num inode existente
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.tmp-')
+    os.close(fd)
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_path
+
+
+class ArtifactCache:
+    """Armazena artefatos endereçados por conteúdo com manifesto e remoção LRU"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, 'objects')
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.hash_index_path = os.path.join(root, 'hashes.log')
+        self._lock = threading.RLock()
+        # Manifesto e índice de hashes já lidos, recarregados só quando o arquivo muda
+        self._manifest_memo = (None, {})
+        self._hash_index = {}
+        self._hash_index_file = None
+        self._hash_index_offset = 0
+        self._hash_index_lines = 0
+        self._hash_index_lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, shared=False):
+        """Bloqueia o manifesto entre threads e entre processos (shared: só leitura, em paralelo)"""
+        with (nullcontext() if shared else self._lock):
+            with open(os.path.join(self.root, '.lock'), 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load_manifest(self):
+        """Manifesto atual (somente leitura; quem for alterá-lo deve copiar o dicionário)"""
+        signature = self._file_signature(self.manifest_path)
+        if signature is None:
+            return {}
+        memo_signature, manifest = self._manifest_memo
+        if signature == memo_signature:
+            return manifest
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        self._manifest_memo = (signature, manifest)
+        return manifest
+
+    def _save_manifest(self, manifest):
+        self._atomic_write(self.manifest_path, json.dumps(manifest).encode('utf-8'))
+        self._manifest_memo = (self._file_signature(self.manifest_path), manifest)
+
+    def _atomic_write(self, path, data):
+        """Escreve em um arquivo temporário e troca de nome atomicamente"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def lookup_hash(self, signature):
+        """Consulta o hash de conteúdo registrado para uma assinatura (caminho, tamanho, mtime)"""
+        with self._locked(shared=True):
+            with self._hash_index_lock:
+                self._read_hash_index()
+                return self._hash_index.get(signature)
+
+    def store_hash(self, signature, content_hash):
+        """Registra o hash de conteúdo de um arquivo no índice persistente (acrescenta uma linha ao log)"""
+        line = json.dumps([signature, content_hash]) + "\n"
+        with self._locked():
+            with self._hash_index_lock:
+                self._read_hash_index()
+                with open(self.hash_index_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+                self._hash_index[signature] = content_hash
+                self._hash_index_lines += 1
+                self._hash_index_offset += len(line.encode('utf-8'))
+                self._hash_index_file = self._file_signature(self.hash_index_path)[0]
+                # Com entradas repetidas ou antigas demais, reescreve só as mais recentes
+                if self._hash_index_lines > 2 * HASH_INDEX_MAX_ENTRIES:
+                    self._compact_hash_index()
+
+    def _read_hash_index(self):
+        """Lê só as linhas novas do log de hashes (ou o log inteiro, se ele foi compactado)"""
+        signature = self._file_signature(self.hash_index_path)
+        if signature is None:
+            self._hash_index, self._hash_index_file = {}, None
+            self._hash_index_offset = self._hash_index_lines = 0
+            return
+        if signature[0] != self._hash_index_file or signature[1] < self._hash_index_offset:
+            self._hash_index, self._hash_index_file = {}, signature[0]
+            self._hash_index_offset = self._hash_index_lines = 0
+        if signature[1] == self._hash_index_offset:
+            return
+
+        with open(self.hash_index_path, 'rb') as f:
+            f.seek(self._hash_index_offset)
+            data = f.read()
+        # Uma linha sem o \n final ainda está sendo escrita por outro processo
+        complete = data[:data.rfind(b"\n") + 1]
+        for raw_line in complete.splitlines():
+            try:
+                key, value = json.loads(raw_line)
+            except ValueError:
+                continue
+            # Reinsere no fim: a ordem do dicionário é a do registro mais recente
+            self._hash_index.pop(key, None)
+            self._hash_index[key] = value
+            self._hash_index_lines += 1
+        self._hash_index_offset += len(complete)
+
+    def _compact_hash_index(self):
+        while len(self._hash_index) > HASH_INDEX_MAX_ENTRIES:
+            del self._hash_index[next(iter(self._hash_index))]
+        data = "".join(json.dumps([key, value]) + "\n" for key, value in self._hash_index.items())
+        self._atomic_write(self.hash_index_path, data.encode('utf-8'))
+        self._hash_index_file = self._file_signature(self.hash_index_path)[0]
+        self._hash_index_offset = len(data.encode('utf-8'))
+        self._hash_index_lines = len(self._hash_index)
+
+    def _object_path(self, key, suffix=''):
+        return os.path.join(self.objects_dir, key[-2:], key + suffix)
+
+    def _valid_path(self, entry, max_age):
+        """Caminho do objeto da entrada, marcando o acesso; None se expirou ou o arquivo sumiu"""
+        # Artefatos mais antigos que max_age segundos contam como ausentes e são removidos
+        if max_age is not None and time.time() - entry['created'] > max_age:
+            return None
+        path = os.path.join(self.root, entry['file'])
+        return path if self._touch(path) else None
+
+    def get_path(self, key, max_age=None):
+        """Retorna o caminho do artefato (e marca o acesso) ou None se não estiver no cache"""
+        with self._locked(shared=True):
+            entry = self._load_manifest().get(key)
+            if entry is None:
+                return None
+            path = self._valid_path(entry, max_age)
+            if path is not None:
+                return path
+
+        # Só a remoção de uma entrada expirada ou perdida reescreve o manifesto
+        with self._locked():
+            manifest = self._load_manifest()
+            entry = manifest.get(key)
+            if entry is None:
+                return None
+            # Outro processo pode ter gravado o artefato de novo enquanto o lock estava livre
+            path = self._valid_path(entry, max_age)
+            if path is not None:
+                return path
+            manifest = dict(manifest)
+            del manifest[key]
+            try:
+                os.remove(os.path.join(self.root, entry['file']))
+            except FileNotFoundError:
+                pass
+            self._save_manifest(manifest)
+        return None
+
+    @staticmethod
+    def _touch(path):
+        """Marca o acesso no atime do objeto (sem reescrever o manifesto); False se o arquivo sumiu"""
+        try:
+            # O mtime é mantido: ele entra na assinatura do file_hash do objeto
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _last_access(self, entry):
+        """Último acesso de uma entrada: o atime do objeto ou o registro no manifesto"""
+        try:
+            return max(entry['last_access'], os.stat(os.path.join(self.root, entry['file'])).st_atime)
+        except FileNotFoundError:
+            return entry['last_access']
+
+    def _register(self, key, path, kind):
+        """Registra um objeto no manifesto e aplica o orçamento de disco"""
+        with self._locked():
+            manifest = dict(self._load_manifest())
+            now = time.time()
+            manifest[key] = {
+                'file': os.path.relpath(path, self.root),
+                'size': os.path.getsize(path),
+                'kind': kind,
+                'created': now,
+                'last_access': now
+            }
+            self._evict(manifest, keep=key)
+            self._save_manifest(manifest)
+        return path
+
+    def put_file(self, key, source_path, kind=None):
+        """Copia um arquivo para o cache de forma atômica e retorna o caminho armazenado"""
+        suffix = os.path.splitext(source_path)[1]
+        path = self._object_path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self._register(key, path, kind or key.split('-')[0])
+
+    def put_bytes(self, key, data, suffix='', kind=None):
+        """Armazena bytes no cache de forma atômica"""
+        path = self._object_path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._atomic_write(path, data)
+        return self._register(key, path, kind or key.split('-')[0])
+
+    def get_bytes(self, key, max_age=None):
+        path = self.get_path(key, max_age)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put_json(self, key, value, kind=None):
+        return self.put_bytes(key, json.dumps(value).encode('utf-8'), '.json', kind)
+
+    def get_json(self, key, max_age=None):
+        data = self.get_bytes(key, max_age)
+        return json.loads(data.decode('utf-8')) if data is not None else None
+
+    def put_text(self, key, text, kind=None):
+        return self.put_bytes(key, text.encode('utf-8'), '.txt', kind)
+
+    def get_text(self, key, max_age=None):
+        data = self.get_bytes(key, max_age)
+        return data.decode('utf-8') if data is not None else None
+
+    def _evict(self, manifest, keep=None):
+        """Remove os artefatos menos usados recentemente até caber no orçamento"""
+        total = sum(entry['size'] for entry in manifest.values())
+        if total <= self.max_bytes:
+            return
+
+        by_access = sorted(manifest.items(), key=lambda item: self._last_access(item[1]))
+        for key, entry in by_access:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.root, entry['file']))
+            except FileNotFoundError:
+                pass
+            total -= entry['size']
+            del manifest[key]
+            print(f"Cache: removido {key} ({entry['size']} bytes)")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Retorna o cache de artefatos compartilhado do processo"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArtifactCache()
+        return _default_cache
@@ -0,0 +1,339 @@
+import io
+import os
+import json
+import math
+import ffmpeg
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import db_to_float
+from .instrumentation import run_ffmpeg
+
+# Quantidade de frames processados por vez ao acumular a energia do sinal
+ENERGY_CHUNK_FRAMES = 1 << 20
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _pcm_paths(path, temp_dir):
+    """Caminhos do PCM bruto e do seu cabeçalho para um arquivo de mídia"""
+    raw_path = os.path.join(temp_dir, os.path.basename(path) + ".pcm")
+    return raw_path, raw_path + ".json"
+
+
+def _source_signature(path):
+    """Identifica a versão do arquivo de origem (tamanho e data de modificação)"""
+    stat = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def find_cut_points_in_levels(levels, ranges, window_ms=100, search_ms=500):
+    """Move início e fim de cada range para o ponto mais silencioso de um envelope de níveis"""
+    levels = np.abs(np.asarray(levels, dtype=np.float64))
+    n = len(levels)
+
+    start_ms = np.array([int(start * 1000) for start, _ in ranges], dtype=np.int64)
+    end_ms = np.array([int(end * 1000) for _, end in ranges], dtype=np.int64)
+    if n == 0 or len(ranges) == 0:
+        return [(s / 1000, e / 1000) for s, e in zip(start_ms.tolist(), end_ms.tolist())]
+
+    steps = search_ms // window_ms
+    offsets = np.arange(-steps, steps)
+
+    def best_points(centers, current_ms, lower_bound, upper_bound):
+        # Matriz (ranges x candidatos) com o nível de cada janela candidata
+        candidates = centers[:, None] + offsets[None, :]
+        valid = (candidates >= lower_bound[:, None]) & (candidates < upper_bound[:, None])
+        values = np.where(valid, levels[np.clip(candidates, 0, n - 1)], np.inf)
+        best = values.argmin(axis=1)
+        rows = np.arange(len(centers))
+        found = values[rows, best] < np.inf
+        return np.where(found, candidates[rows, best] * window_ms, current_ms)
+
+    start_idx = start_ms // window_ms
+    adjust_start = start_idx > 0
+    new_start = best_points(start_idx, start_ms, np.maximum(0, start_idx - steps), np.full(len(ranges), n))
+    start_ms = np.where(adjust_start, new_start, start_ms)
+
+    end_idx = end_ms // window_ms
+    adjust_end = end_idx < n
+    new_end = best_points(end_idx, end_ms, np.maximum(0, end_idx - steps), np.minimum(n, end_idx + steps))
+    end_ms = np.where(adjust_end, new_end, end_ms)
+
+    return [(s / 1000, e / 1000) for s, e in zip(start_ms.tolist(), end_ms.tolist())]
+
+
+def encode_silence_sidecar(nonsilent_ranges, dbfs_levels, duration_ms):
+    """Serializa ranges não silenciosos e o envelope em dBFS em um .npz compacto"""
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        nonsilent=np.asarray(nonsilent_ranges, dtype=np.int64).reshape(-1, 2),
+        dbfs=np.asarray(dbfs_levels, dtype=np.float64),
+        duration_ms=np.int64(duration_ms)
+    )
+    return buffer.getvalue()
+
+
+def decode_silence_sidecar(data):
+    """Lê o sidecar gerado por encode_silence_sidecar"""
+    with np.load(io.BytesIO(data)) as sidecar:
+        return {
+            'nonsilent': [[int(start), int(end)] for start, end in sidecar['nonsilent']],
+            'dbfs': sidecar['dbfs'],
+            'duration_ms': int(sidecar['duration_ms'])
+        }
+
+
+class AudioAnalysis:
+    """Áudio decodificado uma única vez em PCM, compartilhado pelas análises e extrações"""
+
+    def __init__(self, samples, frame_rate, channels, sample_width=2, raw_path=None):
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.raw_path = raw_path
+        self._energy = None
+
+    @classmethod
+    def from_segment(cls, audio_segment):
+        """Cria a análise a partir de um AudioSegment do pydub (sem nova decodificação)"""
+        samples = np.frombuffer(audio_segment.raw_data, dtype=SAMPLE_DTYPES[audio_segment.sample_width])
+        return cls(samples, audio_segment.frame_rate, audio_segment.channels, audio_segment.sample_width)
+
+    @classmethod
+    def load_cached(cls, path, temp_dir="temp"):
+        """Abre o PCM já decodificado de um arquivo, se ainda corresponder à origem"""
+        raw_path, header_path = _pcm_paths(path, temp_dir)
+        if not os.path.exists(raw_path) or not os.path.exists(header_path):
+            return None
+
+        with open(header_path, 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('signature') != _source_signature(path):
+            return None
+
+        dtype = SAMPLE_DTYPES[header['sample_width']]
+        if os.path.getsize(raw_path) == 0:
+            samples = np.zeros(0, dtype=dtype)
+        else:
+            samples = np.memmap(raw_path, dtype=dtype, mode='r')
+        return cls(samples, header['frame_rate'], header['channels'], header['sample_width'], raw_path)
+
+    @classmethod
+    def from_file(cls, path, temp_dir="temp"):
+        """Decodifica o áudio de um arquivo para PCM (memory-mapped) ou reutiliza o existente"""
+        cached = cls.load_cached(path, temp_dir)
+        if cached is not None:
+            print(f"Usando áudio decodificado existente: {cached.raw_path}")
+            return cached
+
+        # Mantém taxa e canais originais para que o RMS seja igual ao do pydub
+        info = ffmpeg.probe(path, select_streams='a:0')
+        if not info.get('streams'):
+            raise ValueError(f"Nenhum stream de áudio encontrado em {path}")
+        stream = info['streams'][0]
+        frame_rate = int(stream['sample_rate'])
+        channels = int(stream['channels'])
+
+        tmp_path = cls.pcm_output_path(path, temp_dir)
+        print(f"Decodificando áudio de {path}...")
+        run_ffmpeg(
+            ffmpeg
+            .input(path)
+            .output(tmp_path, map='0:a:0', **cls.pcm_output_args(frame_rate, channels))
+        )
+        return cls.register_pcm(path, temp_dir, tmp_path, frame_rate, channels)
+
+    @staticmethod
+    def pcm_output_path(path, temp_dir="temp"):
+        """Caminho temporário onde o ffmpeg deve gravar o PCM de um arquivo"""
+        os.makedirs(temp_dir, exist_ok=True)
+        return _pcm_paths(path, temp_dir)[0] + ".tmp"
+
+    @staticmethod
+    def pcm_output_args(frame_rate, channels):
+        """Parâmetros de saída do ffmpeg para o PCM bruto lido pela análise"""
+        return {'f': 's16le', 'acodec': 'pcm_s16le', 'ac': channels, 'ar': frame_rate}
+
+    @classmethod
+    def register_pcm(cls, path, temp_dir, tmp_path, frame_rate, channels):
+        """Publica um PCM decodificado de path (com cabeçalho) e o abre memory-mapped"""
+        raw_path, header_path = _pcm_paths(path, temp_dir)
+        os.replace(tmp_path, raw_path)
+
+        with open(header_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'signature': _source_signature(path),
+                'frame_rate': frame_rate,
+                'channels': channels,
+                'sample_width': 2
+            }, f)
+
+        return cls.load_cached(path, temp_dir)
+
+    def __len__(self):
+        """Duração em milissegundos (mesmo arredondamento do pydub)"""
+        return round(1000 * (self.frame_count / self.frame_rate))
+
+    @property
+    def frame_count(self):
+        return len(self.samples) // self.channels
+
+    @property
+    def max_possible_amplitude(self):
+        return (2 ** (self.sample_width * 8)) / 2
+
+    def mono(self):
+        """Retorna o áudio em mono (float32 normalizado entre -1 e 1)"""
+        frames = self.samples[:self.frame_count * self.channels].reshape(-1, self.channels)
+        return (frames.mean(axis=1, dtype=np.float32) / self.max_possible_amplitude).astype(np.float32)
+
+    def to_segment(self):
+        """Converte para AudioSegment (usado pelo motor de referência do pydub)"""
+        return AudioSegment(
+            data=np.asarray(self.samples).tobytes(),
+            sample_width=self.sample_width,
+            frame_rate=self.frame_rate,
+            channels=self.channels
+        )
+
+    def _ms_energy(self):
+        """Energia acumulada em cada milissegundo, com a mesma conversão ms -> frame do pydub"""
+        if self._energy is not None:
+            return self._energy
+
+        seg_len = len(self)
+        frames_per_ms = self.frame_rate / 1000.0
+        ms_positions = (np.arange(seg_len + 1, dtype=np.int64) * frames_per_ms).astype(np.int64)
+
+        n_frames = self.frame_count
+        frames = self.samples[:n_frames * self.channels].reshape(-1, self.channels)
+        positions = np.minimum(ms_positions, n_frames)
+        accum_dtype = np.float64 if self.sample_width > 2 else np.int64
+        energy_at = np.zeros(len(positions), dtype=accum_dtype)
+
+        # Processa em blocos para não alocar um array int64 do tamanho do arquivo inteiro
+        total = 0
+        for chunk_start in range(0, n_frames, ENERGY_CHUNK_FRAMES):
+            block = np.asarray(frames[chunk_start:chunk_start + ENERGY_CHUNK_FRAMES]).astype(accum_dtype)
+            chunk_energy = np.cumsum((block * block).sum(axis=1))
+            chunk_end = chunk_start + len(block)
+
+            lo = np.searchsorted(positions, chunk_start, side='right')
+            hi = np.searchsorted(positions, chunk_end, side='right')
+            energy_at[lo:hi] = total + chunk_energy[positions[lo:hi] - chunk_start - 1]
+            total += chunk_energy[-1]
+
+        self._energy = (ms_positions, energy_at)
+        return self._energy
+
+    def window_rms(self, window_starts, window_ends):
+        """Calcula o RMS (igual ao audioop.rms) de janelas em ms"""
+        seg_len = len(self)
+        ms_positions, energy_at = self._ms_energy()
+
+        window_starts = np.minimum(window_starts, seg_len)
+        window_ends = np.minimum(window_ends, seg_len)
+        energy = energy_at[window_ends] - energy_at[window_starts]
+
+        # O pydub completa com silêncio frames que faltam no fim, então eles contam no divisor
+        count = (ms_positions[window_ends] - ms_positions[window_starts]) * self.channels
+        rms = np.zeros(len(window_starts), dtype=np.float64)
+        valid = count > 0
+        rms[valid] = np.floor(np.sqrt(energy[valid] / count[valid]))
+        return rms
+
+    def dbfs_envelope(self, window_ms=100):
+        """Nível em dBFS de cada janela consecutiva de window_ms"""
+        starts = np.arange(0, len(self), window_ms, dtype=np.int64)
+        rms = self.window_rms(starts, starts + window_ms)
+
+        # math.log mantém o arredondamento idêntico ao dBFS do pydub
+        levels = np.full(len(rms), -np.inf)
+        audible = rms > 0
+        levels[audible] = [20 * math.log(value / self.max_possible_amplitude, 10) for value in rms[audible]]
+        return levels
+
+    @staticmethod
+    def moving_average(levels, window_size=5):
+        """Média móvel da janela [i - window_size, i + window_size) de cada posição"""
+        levels = np.asarray(levels, dtype=np.float64)
+        n = len(levels)
+        index = np.arange(n)
+        starts = np.maximum(0, index - window_size)
+        ends = np.minimum(n, index + window_size)
+
+        # Soma na mesma ordem que sum() para obter exatamente os mesmos valores
+        totals = np.zeros(n)
+        for offset in range(2 * window_size):
+            position = starts + offset
+            valid = position < ends
+            totals[valid] += levels[position[valid]]
+        return totals / np.maximum(ends - starts, 1)
+
+    def levels(self, window_ms=100):
+        """Envelope de níveis suavizado usado na busca dos pontos de corte"""
+        return self.moving_average(self.dbfs_envelope(window_ms))
+
+    def detect_nonsilent(self, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+        """Equivalente vetorizado de pydub.silence.detect_nonsilent"""
+        seg_len = len(self)
+
+        silent_ranges = []
+        if seg_len >= min_silence_len:
+            thresh = db_to_float(silence_thresh) * self.max_possible_amplitude
+
+            last_slice_start = seg_len - min_silence_len
+            slice_starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+            if last_slice_start % seek_step:
+                slice_starts = np.append(slice_starts, last_slice_start)
+
+            rms = self.window_rms(slice_starts, slice_starts + min_silence_len)
+            silence_starts = slice_starts[rms <= thresh]
+
+            if len(silence_starts):
+                # Agrupa janelas silenciosas consecutivas ou sobrepostas em ranges
+                prev = silence_starts[:-1]
+                curr = silence_starts[1:]
+                breaks = np.nonzero((curr != prev + seek_step) & (curr > prev + min_silence_len))[0]
+                range_starts = np.concatenate([silence_starts[:1], curr[breaks]])
+                range_ends = np.concatenate([prev[breaks], silence_starts[-1:]]) + min_silence_len
+                silent_ranges = [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+        if not silent_ranges:
+            return [[0, seg_len]]
+
+        if silent_ranges[0][0] == 0 and silent_ranges[0][1] == seg_len:
+            return []
+
+        prev_end = 0
+        nonsilent_ranges = []
+        for start, end in silent_ranges:
+            nonsilent_ranges.append([prev_end, start])
+            prev_end = end
+
+        if end != seg_len:
+            nonsilent_ranges.append([prev_end, seg_len])
+
+        if nonsilent_ranges[0] == [0, 0]:
+            nonsilent_ranges.pop(0)
+
+        return nonsilent_ranges
+
+    def find_cut_points(self, ranges, levels=None, window_ms=100, search_ms=500):
+        """Move início e fim de cada range para o ponto mais silencioso da vizinhança"""
+        if levels is None:
+            levels = self.levels(window_ms)
+        return find_cut_points_in_levels(levels, ranges, window_ms, search_ms)
+
+    def export_audio(self, output_path, acodec='libmp3lame', **output_args):
+        """Codifica o PCM já decodificado em um arquivo de áudio (sem decodificar a origem de novo)"""
+        run_ffmpeg(self.input().output(output_path, acodec=acodec, **output_args))
+        return output_path
+
+    def input(self):
+        """Entrada do ffmpeg que lê o PCM em disco"""
+        if self.raw_path is None:
+            raise ValueError("Exportação requer um PCM em disco (use AudioAnalysis.from_file)")
+        return ffmpeg.input(self.raw_path, f='s16le', ar=self.frame_rate, ac=self.channels)
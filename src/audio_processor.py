@@ -1,73 +1,115 @@
+import os
 from pydub import AudioSegment
 from pydub.silence import detect_nonsilent
+from .audio_analysis import (
+    AudioAnalysis, find_cut_points_in_levels,
+    encode_silence_sidecar, decode_silence_sidecar
+)
+from .artifact_cache import get_cache, make_key, file_hash
+from .instrumentation import instrumented, span
 
-def analyze_audio_levels(audio_segment, window_ms=100):
+# Motor de detecção de silêncio: 'numpy' (vetorizado) ou 'pydub' (referência)
+SILENCE_ENGINE = os.getenv('SILENCE_ENGINE', 'numpy')
+
+# Parâmetros refinados para detecção de silêncio
+MIN_SILENCE_LEN = 300    # Reduzido para 400ms para ser mais agressivo
+SILENCE_THRESH = -32     # Threshold ainda mais sensível
+SEEK_STEP = 1            # Máxima precisão na busca
+
+# Janela (ms) do envelope de níveis usado na busca dos pontos de corte
+LEVELS_WINDOW_MS = 100
+
+# Versão do formato do sidecar de silêncio (invalida o cache quando muda)
+SILENCE_SIDECAR_VERSION = 1
+
+def _as_analysis(audio):
+    """Aceita um AudioSegment ou AudioAnalysis e retorna a análise vetorizada"""
+    if isinstance(audio, AudioAnalysis):
+        return audio
+    return AudioAnalysis.from_segment(audio)
+
+def analyze_audio_levels(audio, window_ms=100):
     """Analisa os níveis de áudio para identificar pontos ideais de corte"""
-    chunks = [audio_segment[i:i+window_ms] for i in range(0, len(audio_segment), window_ms)]
-    levels = [chunk.dBFS for chunk in chunks]
-    
-    # Calcula médias móveis para suavizar a detecção
-    window_size = 5
-    moving_avg = []
-    for i in range(len(levels)):
-        start = max(0, i - window_size)
-        end = min(len(levels), i + window_size)
-        moving_avg.append(sum(levels[start:end]) / (end - start))
-    
-    return moving_avg
+    return _as_analysis(audio).levels(window_ms).tolist()
 
-def find_optimal_cut_points(audio_segment, ranges):
+@instrumented()
+def find_optimal_cut_points(audio, ranges):
     """Encontra os pontos ideais de corte baseado em análise de áudio"""
-    levels = analyze_audio_levels(audio_segment)
-    optimal_ranges = []
-    
-    for start, end in ranges:
-        start_ms = int(start * 1000)
-        end_ms = int(end * 1000)
-        
-        # Analisa uma janela antes e depois do ponto de corte
-        window_size = 500  # 500ms
-        
-        # Ajusta o ponto de início
-        start_idx = start_ms // 100  # Converte para índice (100ms janelas)
-        if start_idx > 0:
-            best_start = start_ms
-            min_level = float('inf')
-            for i in range(max(0, start_idx - window_size//100), start_idx + window_size//100):
-                if i < len(levels) and abs(levels[i]) < min_level:
-                    min_level = abs(levels[i])
-                    best_start = i * 100
-            start_ms = best_start
-        
-        # Ajusta o ponto final
-        end_idx = end_ms // 100
-        if end_idx < len(levels):
-            best_end = end_ms
-            min_level = float('inf')
-            for i in range(end_idx - window_size//100, min(len(levels), end_idx + window_size//100)):
-                if abs(levels[i]) < min_level:
-                    min_level = abs(levels[i])
-                    best_end = i * 100
-            end_ms = best_end
-        
-        optimal_ranges.append((start_ms/1000, end_ms/1000))
+    return _as_analysis(audio).find_cut_points(ranges)
+
+def detect_nonsilent_numpy(audio, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """Versão vetorizada de pydub.silence.detect_nonsilent com resultados idênticos"""
+    return _as_analysis(audio).detect_nonsilent(min_silence_len, silence_thresh, seek_step)
+
+def silence_key(path):
+    """Chave do sidecar de silêncio: conteúdo do arquivo e parâmetros que exigem decodificação"""
+    return make_key(
+        'silence', file_hash(path),
+        min_silence_len=MIN_SILENCE_LEN, silence_thresh=SILENCE_THRESH, seek_step=SEEK_STEP,
+        window_ms=LEVELS_WINDOW_MS, version=SILENCE_SIDECAR_VERSION
+    )
+
+def _detect_nonsilent(audio, engine):
+    """Executa o detector escolhido e retorna também o envelope em dBFS"""
+    if engine == 'numpy':
+        analysis = _as_analysis(audio)
+        non_silent_ranges = analysis.detect_nonsilent(MIN_SILENCE_LEN, SILENCE_THRESH, SEEK_STEP)
+    elif engine == 'pydub':
+        if isinstance(audio, AudioAnalysis):
+            audio = audio.to_segment()
+        analysis = AudioAnalysis.from_segment(audio)
+        non_silent_ranges = detect_nonsilent(
+            audio,
+            min_silence_len=MIN_SILENCE_LEN,
+            silence_thresh=SILENCE_THRESH,
+            seek_step=SEEK_STEP
+        )
+    else:
+        raise ValueError(f"Motor de detecção de silêncio desconhecido: {engine}")
     
-    return optimal_ranges
+    return non_silent_ranges, analysis.dbfs_envelope(LEVELS_WINDOW_MS), len(analysis)
 
-def detect_silence(path):
+@instrumented()
+def detect_silence(path, engine=None, temp_dir="temp"):
     """Detecta e analisa silêncios no áudio para determinar pontos de corte ideais"""
-    audio = AudioSegment.from_file(path)
+    engine = engine or SILENCE_ENGINE
     
-    # Parâmetros refinados para detecção de silêncio
-    non_silent_ranges = detect_nonsilent(
-        audio,
-        min_silence_len=300,     # Reduzido para 400ms para ser mais agressivo
-        silence_thresh=-32,      # Threshold ainda mais sensível
-        seek_step=1             # Máxima precisão na busca
-    )
+    # Se o conteúdo já foi analisado, o sidecar evita decodificar o áudio de novo
+    cache = get_cache()
+    key = silence_key(path)
+    sidecar_data = cache.get_bytes(key)
+    if sidecar_data is not None:
+        print(f"Usando silêncios detectados anteriormente para {path}")
+        sidecar = decode_silence_sidecar(sidecar_data)
+        return refine_nonsilent_ranges(
+            sidecar['nonsilent'], sidecar['duration_ms'],
+            AudioAnalysis.moving_average(sidecar['dbfs'])
+        )
     
+    if engine == 'numpy':
+        # Decodifica uma única vez; o PCM fica em temp/ para a extração da transcrição
+        audio = AudioAnalysis.from_file(path, temp_dir)
+    else:
+        audio = AudioSegment.from_file(path)
+    
+    non_silent_ranges, dbfs_levels, duration_ms = _detect_nonsilent(audio, engine)
+    cache.put_bytes(key, encode_silence_sidecar(non_silent_ranges, dbfs_levels, duration_ms), '.npz')
+    
+    return refine_nonsilent_ranges(
+        non_silent_ranges, duration_ms, AudioAnalysis.moving_average(dbfs_levels)
+    )
+
+def detect_silence_in_audio(audio, engine=None):
+    """Detecta silêncios em um áudio já decodificado (AudioSegment ou AudioAnalysis)"""
+    non_silent_ranges, dbfs_levels, duration_ms = _detect_nonsilent(audio, engine or SILENCE_ENGINE)
+    return refine_nonsilent_ranges(
+        non_silent_ranges, duration_ms, AudioAnalysis.moving_average(dbfs_levels)
+    )
+
+def refine_nonsilent_ranges(non_silent_ranges, duration_ms, levels):
+    """Aplica margens, junta segmentos próximos e ajusta os cortes pelos níveis de áudio"""
     if not non_silent_ranges:
-        return [(0, len(audio) / 1000)]
+        return [(0, duration_ms / 1000)]
     
     # Remove silêncios longos no início e fim
     first_non_silent = non_silent_ranges[0]
@@ -79,9 +121,9 @@ def detect_silence(path):
         non_silent_ranges[0] = (0, first_non_silent[1])
     
     # Se tiver mais de 600ms de silêncio no fim, remove
-    if len(audio) - last_non_silent[1] > 600:
-        print(f"Removendo {len(audio) - last_non_silent[1]}ms de silêncio final")
-        non_silent_ranges[-1] = (last_non_silent[0], len(audio))
+    if duration_ms - last_non_silent[1] > 600:
+        print(f"Removendo {duration_ms - last_non_silent[1]}ms de silêncio final")
+        non_silent_ranges[-1] = (last_non_silent[0], duration_ms)
     
     # Adiciona margens dinâmicas baseadas no contexto
     ranges = []
@@ -100,7 +142,7 @@ def detect_silence(path):
             end_margin += 100    # Reduzido para 100ms
         
         start = max(0, start - start_margin)
-        end = min(len(audio), end + end_margin)
+        end = min(duration_ms, end + end_margin)
         ranges.append((start / 1000, end / 1000))
     
     # Combina segmentos próximos com threshold adaptativo
@@ -119,6 +161,7 @@ def detect_silence(path):
             merged_ranges.append((start, end))
     
     # Encontra pontos ideais de corte baseado em análise de áudio
-    optimal_ranges = find_optimal_cut_points(audio, merged_ranges)
+    with span('find_optimal_cut_points'):
+        optimal_ranges = find_cut_points_in_levels(levels, merged_ranges, LEVELS_WINDOW_MS)
     
     return optimal_ranges
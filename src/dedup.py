@@ -0,0 +1,157 @@
+import os
+import re
+import zlib
+import unicodedata
+import numpy as np
+from .instrumentation import instrumented
+
+# Shingles de palavras e assinatura MinHash (BANDS x ROWS permutações) para o LSH; com 40x3,
+# pares com Jaccard 0,4 viram candidatos com ~93% de chance, e pares acima de 0,8 quase sempre
+SHINGLE_SIZE = 3
+LSH_BANDS = 40
+LSH_ROWS = 3
+MINHASH_SEED = 1
+
+# Similaridade de Jaccard entre shingles: acima de DUPLICATE é repetição certa, entre
+# AMBIGUOUS e DUPLICATE o par vai para o GPT decidir
+DUPLICATE_THRESHOLD = float(os.getenv('DEDUP_DUPLICATE_THRESHOLD', 0.8))
+AMBIGUOUS_THRESHOLD = float(os.getenv('DEDUP_AMBIGUOUS_THRESHOLD', 0.4))
+
+# Clips com até 10% mais palavras que o mais curto contam como "igualmente concisos"
+CONCISENESS_TOLERANCE = 0.1
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def tokenize(text):
+    """Palavras em minúsculas e sem acentos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r'\w+', text)
+
+
+def shingles(words, size=SHINGLE_SIZE):
+    """Conjunto de hashes (CRC32) das sequências de size palavras"""
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+
+def _permutations(count, seed=MINHASH_SEED):
+    """Coeficientes (a, b) das funções de hash universais que simulam as permutações"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=count, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=count, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(shingle_set, permutations):
+    """Assinatura MinHash: menor hash de cada permutação sobre os shingles"""
+    a, b = permutations
+    # Com x e a abaixo de 2^32, a * x + b < 2^64: o produto não dá a volta em uint64 e o
+    # módulo 2^61 - 1 é o do hash universal (a máscara garante x de 32 bits)
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) & _MAX_HASH
+    hashed = ((values[:, None] * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+    return hashed.min(axis=0)
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def candidate_pairs(signatures, bands=LSH_BANDS, rows=LSH_ROWS):
+    """Pares de clips que coincidem em pelo menos uma banda da assinatura (LSH)"""
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for clip_id, signature in signatures.items():
+            bucket = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(bucket, []).append(clip_id)
+        for members in buckets.values():
+            for i, first in enumerate(members):
+                for second in members[i + 1:]:
+                    pairs.add((first, second))
+    return pairs
+
+
+def _clusters(edges):
+    """Componentes conexos (union-find) dos pares informados"""
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for first, second in edges:
+        parent[find(first)] = find(second)
+
+    groups = {}
+    for node in parent:
+        groups.setdefault(find(node), []).append(node)
+    return [sorted(group) for group in groups.values()]
+
+
+def choose_clip_to_keep(cluster, word_counts):
+    """Mantém o clip mais conciso; entre os igualmente concisos, o que aparece primeiro"""
+    shortest = min(word_counts[clip_id] for clip_id in cluster)
+    limit = shortest * (1 + CONCISENESS_TOLERANCE)
+    return min(clip_id for clip_id in cluster if word_counts[clip_id] <= limit)
+
+
+@instrumented()
+def find_duplicate_clusters(clips_info, duplicate_threshold=None, ambiguous_threshold=None):
+    """Detecta clips repetidos localmente (MinHash-LSH) e separa os casos ambíguos para o GPT"""
+    duplicate_threshold = DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    ambiguous_threshold = AMBIGUOUS_THRESHOLD if ambiguous_threshold is None else ambiguous_threshold
+
+    permutations = _permutations(LSH_BANDS * LSH_ROWS)
+    shingle_sets = {}
+    word_counts = {}
+    signatures = {}
+    for clip in clips_info:
+        words = tokenize(clip.get('transcript') or '')
+        if not words:
+            continue
+        shingle_sets[clip['id']] = shingles(words)
+        word_counts[clip['id']] = len(words)
+        signatures[clip['id']] = minhash_signature(shingle_sets[clip['id']], permutations)
+
+    # Só os pares candidatos do LSH têm a similaridade calculada
+    duplicate_edges = []
+    ambiguous_edges = []
+    for first, second in candidate_pairs(signatures):
+        similarity = jaccard(shingle_sets[first], shingle_sets[second])
+        if similarity >= duplicate_threshold:
+            duplicate_edges.append((first, second))
+        elif similarity >= ambiguous_threshold:
+            ambiguous_edges.append((first, second))
+
+    duplicates = _clusters(duplicate_edges)
+    remove = set()
+    for cluster in duplicates:
+        keep = choose_clip_to_keep(cluster, word_counts)
+        remove.update(clip_id for clip_id in cluster if clip_id != keep)
+
+    # Clips já removidos não precisam ser avaliados de novo
+    ambiguous = [
+        cluster for cluster in _clusters(
+            (first, second) for first, second in ambiguous_edges
+            if first not in remove and second not in remove
+        )
+        if len(cluster) > 1
+    ]
+
+    return {
+        'remove': sorted(remove),
+        'duplicates': duplicates,
+        'ambiguous': ambiguous
+    }
@@ -0,0 +1,75 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+import openai
+from .artifact_cache import ArtifactCache, get_cache, make_key
+from .prompt_budget import count_message_tokens, prompt_budget
+from .instrumentation import span
+
+# Cache persistente das respostas do GPT: validade e orçamento de disco próprios
+GPT_CACHE_ENABLED = os.getenv('GPT_CACHE', '1').lower() not in ('0', 'false', 'no')
+GPT_CACHE_TTL = int(os.getenv('GPT_CACHE_TTL', 7 * 24 * 3600))
+GPT_CACHE_MAX_BYTES = int(os.getenv('GPT_CACHE_MAX_BYTES', 64 * 1024 ** 2))
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_gpt_cache():
+    """Cache das respostas do GPT, dentro do diretório do cache de artefatos"""
+    root = os.path.join(get_cache().root, 'gpt')
+    with _caches_lock:
+        if root not in _caches:
+            _caches[root] = ArtifactCache(root, GPT_CACHE_MAX_BYTES)
+        return _caches[root]
+
+
+def normalize_transcripts(transcripts):
+    """Normaliza as transcrições (Unicode e espaços) para que diferenças irrelevantes não mudem a chave"""
+    if not isinstance(transcripts, str):
+        transcripts = "\n".join(transcripts)
+    text = unicodedata.normalize('NFC', transcripts)
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def response_key(prompt_name, prompt_version, transcripts, model, temperature, **params):
+    """Chave de uma resposta: modelo, versão do template, temperatura e transcrições normalizadas"""
+    transcripts_hash = hashlib.sha256(normalize_transcripts(transcripts).encode('utf-8')).hexdigest()
+    return make_key(
+        'gpt', transcripts_hash, prompt=prompt_name, version=prompt_version,
+        model=model, temperature=temperature, **params
+    )
+
+
+def cached_chat_completion(prompt_name, prompt_version, transcripts, use_cache=None, cache_params=None,
+                           **request):
+    """Chama o ChatCompletion e retorna o texto, reaproveitando respostas de chamadas idênticas"""
+    # use_cache=False ignora o cache na leitura, mas grava a resposta nova (renova a entrada)
+    use_cache = GPT_CACHE_ENABLED if use_cache is None else use_cache
+    cache = get_gpt_cache()
+    key = response_key(
+        prompt_name, prompt_version, transcripts, request['model'], request.get('temperature'),
+        max_tokens=request.get('max_tokens'), **(cache_params or {})
+    )
+
+    if use_cache:
+        content = cache.get_text(key, max_age=GPT_CACHE_TTL)
+        if content is not None:
+            print(f"Usando resposta do GPT em cache ({prompt_name})")
+            return content
+
+    # Informa quanto do orçamento de tokens o prompt usa (também registrado no span da chamada)
+    prompt_tokens = count_message_tokens(request['messages'], request['model'])
+    budget = prompt_budget(request['model'], request.get('max_tokens'))
+    print(f"Prompt {prompt_name}: {prompt_tokens} de {budget} tokens ({prompt_tokens / budget:.0%} do orçamento)")
+    if prompt_tokens > budget:
+        print(f"Aviso: o prompt {prompt_name} passa do orçamento de tokens")
+
+    with span('gpt_request', prompt=prompt_name, prompt_tokens=prompt_tokens, token_budget=budget):
+        response = openai.ChatCompletion.create(**request)
+    content = response.choices[0].message['content']
+    cache.put_text(key, content)
+    return content
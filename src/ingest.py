@@ -0,0 +1,159 @@
+import os
+import ffmpeg
+from .audio_analysis import AudioAnalysis
+from .audio_processor import silence_key
+from .artifact_cache import get_cache, make_key, file_hash, materialize
+from .instrumentation import instrumented, run_ffmpeg
+
+# Mezzanine: cópia normalizada em MP4 para entradas em outros formatos
+MEZZANINE_FORMAT = {'vcodec': 'libx264', 'acodec': 'aac'}
+
+# Entradas já em H.264/AAC (ex.: .mov do celular) só trocam de container, sem re-encode
+MEZZANINE_REMUX_FORMAT = {'c': 'copy'}
+REMUX_VIDEO_CODECS = {'h264'}
+REMUX_AUDIO_CODECS = {'aac'}
+
+# Proxy: cópia leve (resolução reduzida, preset rápido, só keyframes) usada na análise e nas
+# prévias; o arquivo original só é lido na renderização final (conform)
+PROXY_MODE = os.getenv('PROXY_MODE', '0').lower() in ('1', 'true', 'yes')
+PROXY_HEIGHT = int(os.getenv('PROXY_HEIGHT', 360))
+PROXY_FORMAT = {'vcodec': 'libx264', 'preset': 'ultrafast', 'g': 1, 'crf': 28, 'pix_fmt': 'yuv420p', 'acodec': 'aac'}
+PROXY_SUFFIX = '.proxy.mp4'
+
+# Áudio enviado à transcrição: mono 16 kHz em Opus, otimizado para fala
+SPEECH_AUDIO_FORMAT = {'acodec': 'libopus', 'ac': 1, 'ar': 16000, 'audio_bitrate': '24k', 'application': 'voip'}
+SPEECH_AUDIO_EXTENSION = '.ogg'
+
+
+def mezzanine_key(content_hash, mode='transcode'):
+    """Chave do cache do MP4 normalizado (ou do proxy) a partir do hash da entrada"""
+    if mode == 'proxy':
+        return make_key('proxy', content_hash, height=PROXY_HEIGHT, **PROXY_FORMAT)
+    return make_key('mp4', content_hash, **(MEZZANINE_REMUX_FORMAT if mode == 'remux' else MEZZANINE_FORMAT))
+
+
+def speech_audio_key(content_hash):
+    """Chave do cache do áudio de fala a partir do hash do clip"""
+    return make_key('audio', content_hash, **SPEECH_AUDIO_FORMAT)
+
+
+def speech_audio_path(video_path, temp_dir="temp"):
+    return os.path.join(temp_dir, os.path.basename(video_path) + SPEECH_AUDIO_EXTENSION)
+
+
+def _probe_source(path):
+    """Formato do primeiro áudio (taxa, canais ou None), presença de vídeo e se os codecs permitem remux"""
+    streams = ffmpeg.probe(path)['streams']
+    video = next((s for s in streams if s['codec_type'] == 'video'), None)
+    audio = next((s for s in streams if s['codec_type'] == 'audio'), None)
+
+    audio_format = (int(audio['sample_rate']), int(audio['channels'])) if audio else None
+    remux = (
+        video is not None and video['codec_name'] in REMUX_VIDEO_CODECS and
+        (audio is None or audio['codec_name'] in REMUX_AUDIO_CODECS)
+    )
+    return audio_format, video is not None, remux
+
+
+def _mezzanine_output(source, path, mode, has_audio):
+    """Saída de vídeo do passe de ingestão: re-encode, remux ou proxy"""
+    if mode == 'transcode':
+        return ffmpeg.output(source, path, **MEZZANINE_FORMAT)
+
+    if mode == 'proxy':
+        # Reduz só a altura (sem ampliar) e mantém fps e timestamps da origem para o conform
+        video = source['v:0'].filter('scale', -2, f'min({PROXY_HEIGHT},ih)')
+        streams = [video, source['a:0']] if has_audio else [video]
+        return ffmpeg.output(*streams, path, **PROXY_FORMAT)
+
+    streams = [source['v:0'], source['a:0']] if has_audio else [source['v:0']]
+    return ffmpeg.output(*streams, path, **MEZZANINE_REMUX_FORMAT)
+
+
+def build_ingest_pass(source_path, mezzanine_path=None, pcm_path=None, speech_path=None,
+                      audio_format=None, mode='transcode'):
+    """Monta um único comando ffmpeg com todas as saídas pedidas (a entrada é decodificada uma vez)"""
+    source = ffmpeg.input(source_path)
+    outputs = []
+    if mezzanine_path:
+        outputs.append(_mezzanine_output(source, mezzanine_path, mode, audio_format is not None))
+    if pcm_path:
+        frame_rate, channels = audio_format
+        outputs.append(ffmpeg.output(source['a:0'], pcm_path, **AudioAnalysis.pcm_output_args(frame_rate, channels)))
+    if speech_path:
+        outputs.append(ffmpeg.output(source['a:0'], speech_path, **SPEECH_AUDIO_FORMAT))
+    return ffmpeg.merge_outputs(*outputs) if outputs else None
+
+
+def proxy_path(filepath, temp_dir="temp"):
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(temp_dir, name + PROXY_SUFFIX)
+
+
+@instrumented()
+def ingest_clip(filepath, temp_dir="temp", proxy=None):
+    """Prepara um clip em um único passe do ffmpeg: MP4 normalizado (ou proxy), PCM da análise e áudio de fala"""
+    # Retorna (caminho usado na análise, caminho de qualidade total usado na renderização final)
+    proxy = PROXY_MODE if proxy is None else proxy
+    cache = get_cache()
+    os.makedirs(temp_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(filepath))
+
+    audio_format, has_video, remux = _probe_source(filepath)
+    if proxy and has_video:
+        mode = 'proxy'
+        output_path = proxy_path(filepath, temp_dir)
+    elif ext.lower() != '.mp4':
+        mode = 'remux' if remux else 'transcode'
+        output_path = os.path.join(temp_dir, f"{name}.mp4")
+    else:
+        mode = None
+        output_path = filepath
+    # No modo proxy a renderização final lê o arquivo original
+    source_path = filepath if mode == 'proxy' else output_path
+
+    mezzanine_path = None
+    if mode:
+        input_key = mezzanine_key(file_hash(filepath), mode)
+        cached_path = cache.get_path(input_key)
+        if cached_path:
+            print(f"Usando arquivo convertido existente: {output_path}")
+            materialize(cached_path, output_path)
+        else:
+            mezzanine_path = output_path
+
+    # Sem mezzanine novo, os artefatos de áudio podem já estar no cache (chave: hash do clip)
+    needs_pcm = needs_speech = audio_format is not None
+    if audio_format is not None and mezzanine_path is None:
+        content_hash = file_hash(output_path)
+        needs_pcm = (
+            cache.get_path(silence_key(output_path)) is None and
+            AudioAnalysis.load_cached(output_path, temp_dir) is None
+        )
+        needs_speech = cache.get_path(speech_audio_key(content_hash)) is None
+
+    pcm_path = AudioAnalysis.pcm_output_path(output_path, temp_dir) if needs_pcm else None
+    speech_path = speech_audio_path(output_path, temp_dir) if needs_speech else None
+    ingest_pass = build_ingest_pass(filepath, mezzanine_path, pcm_path, speech_path, audio_format, mode)
+    if ingest_pass is None:
+        return output_path, source_path
+
+    labels = {'remux': " (remux, sem re-encode)", 'proxy': " (gerando proxy)"}
+    print(f"Processando {filepath} em um único passe{labels.get(mode, '') if mezzanine_path else ''}...")
+    run_ffmpeg(ingest_pass)
+
+    # O PCM e o áudio de fala são indexados pelo clip que segue no pipeline (o mezzanine, se houver)
+    if mezzanine_path:
+        cache.put_file(input_key, mezzanine_path)
+    if pcm_path:
+        AudioAnalysis.register_pcm(output_path, temp_dir, pcm_path, *audio_format)
+    if speech_path:
+        cache.put_file(speech_audio_key(file_hash(output_path)), speech_path)
+    return output_path, source_path
+
+
+def conform_clips_info(clips_info):
+    """Aponta cada clip para a mídia de qualidade total antes da renderização final"""
+    # O proxy mantém a taxa de quadros e começa em zero como a origem, então os tempos
+    # definidos sobre ele valem para o original (o renderizador limita o fim à duração real)
+    return [dict(clip, path=clip.get('source', clip['path'])) for clip in clips_info]
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+import ffmpeg
+
+try:
+    import resource
+except ImportError:  # Windows: sem CPU de subprocessos nem pico de memória
+    resource = None
+
+# Bytes por bloco em ru_inblock/ru_oublock no Linux
+RUSAGE_BLOCK_SIZE = 512
+
+# Intervalo (s) entre as leituras do RSS do processo enquanto há spans abertos
+RSS_SAMPLE_INTERVAL = float(os.getenv('RSS_SAMPLE_INTERVAL', 0.05))
+
+# Prefixo das métricas exportadas no formato Prometheus
+METRICS_PREFIX = 'ia_editor'
+
+# Gravador de spans ativo (por job ou execução do main.py) e span atual, por contexto
+_current_recorder = contextvars.ContextVar('span_recorder', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Uso dos subprocessos de cada span aberto no contexto atual (do mais externo ao atual)
+_span_usage = contextvars.ContextVar('span_usage', default=())
+_usage_lock = threading.Lock()
+
+
+def _read_thread_io():
+    """Lê os bytes lidos/escritos em disco pela thread atual (/proc/thread-self/io, apenas Linux)"""
+    try:
+        with open(f'/proc/self/task/{threading.get_native_id()}/io', 'r') as f:
+            values = dict(line.split(': ') for line in f.read().splitlines())
+        return int(values['read_bytes']), int(values['write_bytes'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _add_child_usage(usage):
+    """Soma o uso de um subprocesso finalizado aos spans abertos no contexto atual"""
+    with _usage_lock:
+        for totals in _span_usage.get():
+            totals['cpu_seconds'] += usage.ru_utime + usage.ru_stime
+            totals['read_bytes'] += usage.ru_inblock * RUSAGE_BLOCK_SIZE
+            totals['write_bytes'] += usage.ru_oublock * RUSAGE_BLOCK_SIZE
+            # ru_maxrss vem em KB no Linux
+            totals['peak_rss_bytes'] = max(totals['peak_rss_bytes'], usage.ru_maxrss * 1024)
+
+
+def _current_rss():
+    """RSS atual do processo em bytes (/proc/self/statm, apenas Linux)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _RSSSampler:
+    """Lê o RSS do processo periodicamente e guarda o maior valor em cada span aberto"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._spans = {}
+        self._thread = None
+
+    def start(self, totals):
+        rss = _current_rss()
+        with _usage_lock:
+            totals['process_peak_rss_bytes'] = rss
+            self._spans[id(totals)] = totals
+            # A thread só existe enquanto há spans abertos (e é recriada depois de um fork)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, totals):
+        rss = _current_rss()
+        with _usage_lock:
+            self._spans.pop(id(totals), None)
+            totals['process_peak_rss_bytes'] = max(totals['process_peak_rss_bytes'], rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = _current_rss()
+            with _usage_lock:
+                if not self._spans:
+                    self._thread = None
+                    return
+                for totals in self._spans.values():
+                    totals['process_peak_rss_bytes'] = max(totals['process_peak_rss_bytes'], rss)
+
+
+_rss_sampler = _RSSSampler()
+
+
+def _read_pipe(pipe, chunks):
+    chunks.append(pipe.read())
+    pipe.close()
+
+
+def run_ffmpeg(stream):
+    """Executa um comando do ffmpeg-python (como .run(quiet=True)) e atribui ao span atual a CPU,
+    o disco e o pico de RSS do próprio subprocesso"""
+    process = stream.run_async(pipe_stdout=True, pipe_stderr=True, overwrite_output=True)
+    if not hasattr(os, 'wait4'):
+        out, err = process.communicate()
+    else:
+        # As saídas são lidas sem o communicate(), que recolheria o processo antes do wait4
+        out_chunks, err_chunks = [], []
+        readers = [
+            threading.Thread(target=_read_pipe, args=(process.stdout, out_chunks)),
+            threading.Thread(target=_read_pipe, args=(process.stderr, err_chunks))
+        ]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        _add_child_usage(usage)
+        out, err = out_chunks[0], err_chunks[0]
+    if process.returncode:
+        raise ffmpeg.Error('ffmpeg', out, err)
+    return out, err
+
+
+def _peak_rss():
+    """Maior RSS atingido pelo processo e pelos subprocessos, em bytes"""
+    if resource is None:
+        return 0
+    # ru_maxrss vem em KB no Linux
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ) * 1024
+
+
+class SpanRecorder:
+    """Acumula os spans de um job ou de uma execução do pipeline"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span_data):
+        with self._lock:
+            self.spans.append(span_data)
+
+    def extend(self, spans):
+        with self._lock:
+            self.spans.extend(spans)
+
+    def summary(self):
+        """Totais por etapa (soma de chamadas, tempo, CPU e bytes)"""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span_data in spans:
+            stage = stages.setdefault(span_data['name'], {
+                'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'read_bytes': 0, 'write_bytes': 0, 'peak_rss_bytes': 0
+            })
+            stage['calls'] += 1
+            stage['wall_seconds'] += span_data['wall_seconds']
+            stage['cpu_seconds'] += span_data['cpu_seconds']
+            stage['read_bytes'] += span_data['read_bytes']
+            stage['write_bytes'] += span_data['write_bytes']
+            stage['peak_rss_bytes'] = max(stage['peak_rss_bytes'], span_data['peak_rss_bytes'])
+        return stages
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {'spans': spans, 'summary': self.summary()}
+
+    def export_json(self, path):
+        """Grava os spans e o resumo por etapa em um arquivo JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def print_summary(self):
+        print(f"\n{'Etapa':<30} {'Chamadas':>8} {'Tempo (s)':>10} {'CPU (s)':>10} {'Pico RSS (MB)':>14}")
+        for name, stage in sorted(self.summary().items(), key=lambda item: -item[1]['wall_seconds']):
+            print(f"{name:<30} {stage['calls']:>8} {stage['wall_seconds']:>10.2f} "
+                  f"{stage['cpu_seconds']:>10.2f} {stage['peak_rss_bytes'] / 1024 ** 2:>14.1f}")
+
+
+class _Metrics:
+    """Totais do processo por etapa, exportados no endpoint /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, span_data):
+        with self._lock:
+            stage = self._stages.setdefault(span_data['name'], {
+                'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                'read_bytes': 0, 'write_bytes': 0
+            })
+            stage['calls'] += 1
+            stage['errors'] += 0 if span_data['ok'] else 1
+            stage['wall_seconds'] += span_data['wall_seconds']
+            stage['cpu_seconds'] += span_data['cpu_seconds']
+            stage['read_bytes'] += span_data['read_bytes']
+            stage['write_bytes'] += span_data['write_bytes']
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stage) for name, stage in self._stages.items()}
+
+
+metrics = _Metrics()
+
+
+@contextmanager
+def recording(recorder=None):
+    """Ativa um gravador de spans no contexto atual (thread ou job)"""
+    recorder = recorder or SpanRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Mede tempo, CPU, pico de RSS e bytes de disco de uma etapa.
+
+    Só entra no span o que a etapa executou: a CPU e o disco da thread atual e os subprocessos
+    iniciados por run_ffmpeg no mesmo contexto. Outros jobs e threads rodando ao mesmo tempo
+    não são contados. A memória da própria etapa não pode ser separada por thread, então o pico
+    de RSS do processo é o maior valor lido enquanto o span estava aberto.
+    """
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    children = {'cpu_seconds': 0.0, 'read_bytes': 0, 'write_bytes': 0, 'peak_rss_bytes': 0}
+    usage_token = _span_usage.set(_span_usage.get() + (children,))
+    _rss_sampler.start(children)
+    start_wall = time.time()
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    start_read, start_write = _read_thread_io()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        _current_span.reset(token)
+        _span_usage.reset(usage_token)
+        _rss_sampler.stop(children)
+        read_bytes, write_bytes = _read_thread_io()
+        with _usage_lock:
+            children = dict(children)
+        span_data = {
+            'name': name,
+            'parent': parent,
+            'start': start_wall,
+            'wall_seconds': time.perf_counter() - start,
+            'cpu_seconds': (time.thread_time() - start_cpu) + children['cpu_seconds'],
+            'peak_rss_bytes': max(children['process_peak_rss_bytes'], children['peak_rss_bytes']),
+            'process_peak_rss_bytes': children['process_peak_rss_bytes'],
+            'subprocess_peak_rss_bytes': children['peak_rss_bytes'],
+            'read_bytes': read_bytes - start_read + children['read_bytes'],
+            'write_bytes': write_bytes - start_write + children['write_bytes'],
+            'ok': ok,
+            'pid': os.getpid()
+        }
+        if attributes:
+            span_data['attributes'] = attributes
+
+        metrics.observe(span_data)
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.add(span_data)
+
+
+def instrumented(name=None):
+    """Decorator que executa a função dentro de um span"""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @wraps(function)
+        def wrapped(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def call_with_spans(function, *args, **kwargs):
+    """Executa function com um gravador próprio e devolve (resultado, spans); usado em subprocessos"""
+    with recording() as recorder:
+        result = function(*args, **kwargs)
+    return result, recorder.spans
+
+
+def record_spans(spans):
+    """Adiciona ao gravador atual spans medidos em outro processo"""
+    for span_data in spans:
+        metrics.observe(span_data)
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.extend(spans)
+
+
+def render_prometheus(extra_gauges=None):
+    """Gera o texto do endpoint /metrics no formato de exposição do Prometheus"""
+    lines = []
+    series = [
+        ('stage_calls_total', 'calls', 'counter', 'Execuções de cada etapa do pipeline'),
+        ('stage_errors_total', 'errors', 'counter', 'Execuções de cada etapa que terminaram com erro'),
+        ('stage_wall_seconds_total', 'wall_seconds', 'counter', 'Tempo de relógio gasto em cada etapa'),
+        ('stage_cpu_seconds_total', 'cpu_seconds', 'counter', 'CPU gasta em cada etapa, incluindo subprocessos'),
+        ('stage_read_bytes_total', 'read_bytes', 'counter', 'Bytes lidos do disco em cada etapa'),
+        ('stage_write_bytes_total', 'write_bytes', 'counter', 'Bytes escritos no disco em cada etapa'),
+    ]
+    stages = metrics.snapshot()
+    for metric, field, metric_type, description in series:
+        full_name = f"{METRICS_PREFIX}_{metric}"
+        lines.append(f"# HELP {full_name} {description}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for stage_name, stage in sorted(stages.items()):
+            lines.append(f'{full_name}{{stage="{stage_name}"}} {stage[field]}')
+
+    gauges = {'peak_rss_bytes': ('Maior RSS do processo e subprocessos', _peak_rss())}
+    gauges.update(extra_gauges or {})
+    for metric, (description, value) in gauges.items():
+        full_name = f"{METRICS_PREFIX}_{metric}"
+        lines.append(f"# HELP {full_name} {description}")
+        lines.append(f"# TYPE {full_name} gauge")
+        lines.append(f"{full_name} {value}")
+
+    return "\n".join(lines) + "\n"
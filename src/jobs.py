@@ -0,0 +1,175 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import traceback
+
+# Configuração da fila de processamento
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 8))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 3600))
+
+
+class JobCancelled(Exception):
+    """Levantada em um checkpoint quando o job foi cancelado"""
+
+
+class QueueFull(Exception):
+    """A fila de jobs atingiu o limite configurado"""
+
+
+class Job:
+    """Um processamento enfileirado, com estado e progresso consultáveis"""
+
+    def __init__(self, function, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.stage = 'Na fila'
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Dados extras do chamador (ex.: área de trabalho do job)
+        self.metadata = {}
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def update(self, stage, progress=None):
+        """Atualiza etapa e progresso; funciona como checkpoint de cancelamento"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.stage = stage
+        if progress is not None:
+            self.progress = progress
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobQueue:
+    """Fila limitada de jobs executados por um pool local de threads"""
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, retention=JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self.max_queued = max_queued
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        for index in range(max(1, workers)):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, function, *args, **kwargs):
+        """Enfileira function(job, *args, **kwargs); levanta QueueFull se não houver espaço"""
+        self._prune()
+        job = Job(function, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Jobs ainda disponíveis: na fila, em execução ou finalizados dentro da retenção"""
+        self._prune()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancela um job na fila imediatamente, ou sinaliza o cancelamento de um em execução"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel_event.set()
+        if job.status == 'queued':
+            self._finish(job, 'cancelled')
+        else:
+            job.stage = 'Cancelando...'
+        return job
+
+    def pending(self):
+        """Número de jobs aguardando na fila"""
+        return self._queue.qsize()
+
+    def full(self):
+        return self._queue.full()
+
+    def running(self):
+        """Número de jobs em execução"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == 'running')
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if status == 'completed':
+            job.progress = 100
+            job.stage = 'Concluído'
+        elif status == 'cancelled':
+            job.stage = 'Cancelado'
+        else:
+            job.stage = 'Erro'
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job.cancel_requested:
+                    continue
+                job.status = 'running'
+                job.started_at = time.time()
+                try:
+                    result = job._function(job, *job._args, **job._kwargs)
+                    self._finish(job, 'completed', result=result)
+                except JobCancelled:
+                    self._finish(job, 'cancelled')
+                except Exception as e:
+                    traceback.print_exc()
+                    self._finish(job, 'failed', error=str(e))
+            finally:
+                job._args = job._kwargs = None
+                self._queue.task_done()
+
+    def _prune(self):
+        """Descarta jobs finalizados há mais tempo que o período de retenção"""
+        limit = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+from .instrumentation import instrumented
+
+# Whisper local (faster-whisper, sobre CTranslate2): modelo e quantização
+LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'small')
+LOCAL_WHISPER_COMPUTE_TYPE = os.getenv('LOCAL_WHISPER_COMPUTE_TYPE', 'int8')
+
+# Pool de workers: cada um usa THREADS_PER_WORKER núcleos (0 = núcleos / threads por worker)
+LOCAL_WHISPER_WORKERS = int(os.getenv('LOCAL_WHISPER_WORKERS', 0))
+LOCAL_WHISPER_THREADS_PER_WORKER = int(os.getenv('LOCAL_WHISPER_THREADS_PER_WORKER', 4))
+
+# O Whisper processa janelas de 30s (áudios curtos são completados com silêncio), então trechos
+# curtos de vários clips são agrupados na mesma janela, separados por uma pausa
+SAMPLE_RATE = 16000
+PACK_SECONDS = 30.0
+PACK_GAP_SECONDS = 1.0
+
+# Quantos áudios cada worker junta por lote e quanto espera por mais áudios antes de processar
+LOCAL_WHISPER_BATCH_SIZE = int(os.getenv('LOCAL_WHISPER_BATCH_SIZE', 8))
+LOCAL_WHISPER_BATCH_WAIT = float(os.getenv('LOCAL_WHISPER_BATCH_WAIT', 0.3))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def worker_count():
+    """Workers do pool local, dimensionado pelos núcleos disponíveis"""
+    if LOCAL_WHISPER_WORKERS > 0:
+        return LOCAL_WHISPER_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, LOCAL_WHISPER_THREADS_PER_WORKER))
+
+
+def max_pending():
+    """Transcrições simultâneas que mantêm todos os workers com lotes cheios"""
+    return worker_count() * LOCAL_WHISPER_BATCH_SIZE
+
+
+def _split_packed(segments, offsets, lengths):
+    """Devolve a fala do áudio agrupado a cada áudio de origem, com os tempos ajustados.
+
+    O Whisper pode gerar um segmento que atravessa a pausa entre dois áudios, então a divisão é
+    feita palavra a palavra: cada segmento vira um segmento por áudio com as palavras dele.
+    """
+    results = [[] for _ in offsets]
+    starts = np.array(offsets)
+    ends = starts + np.array(lengths)
+    for segment in segments:
+        pieces = {}
+        for word in segment.words or []:
+            middle = (word.start + word.end) / 2
+            # Palavras na pausa ficam com o áudio mais próximo
+            distance = np.maximum(starts - middle, 0) + np.maximum(middle - ends, 0)
+            pieces.setdefault(int(np.argmin(distance)), []).append(word)
+        for index, words in sorted(pieces.items()):
+            start = min(max(words[0].start - offsets[index], 0.0), lengths[index])
+            end = min(max(words[-1].end - offsets[index], start), lengths[index])
+            text = ''.join(word.word for word in words)
+            results[index].append({'start': start, 'end': end, 'text': text})
+    return results
+
+
+def _response(segments, language):
+    """Resposta no mesmo formato do verbose_json da API"""
+    return {
+        'text': ''.join(segment['text'] for segment in segments).strip(),
+        'language': language,
+        'segments': [dict(segment, id=index) for index, segment in enumerate(segments)]
+    }
+
+
+class LocalWhisper:
+    """Pool de workers sobre um modelo faster-whisper, agrupando trechos curtos de vários clips"""
+
+    def __init__(self, model_size=None, workers=None):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("Transcrição local requer o pacote faster-whisper (pip install faster-whisper)") from e
+
+        self.workers = workers or worker_count()
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        print(f"Carregando Whisper local ({model_size or LOCAL_WHISPER_MODEL}, {self.workers} workers "
+              f"x {threads} threads)...")
+        # num_workers permite que os workers usem o mesmo modelo em paralelo
+        self.model = WhisperModel(
+            model_size or LOCAL_WHISPER_MODEL, device='cpu', compute_type=LOCAL_WHISPER_COMPUTE_TYPE,
+            cpu_threads=threads, num_workers=self.workers
+        )
+        self.requests = queue.Queue()
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, audio, language):
+        """Enfileira um áudio (float32, 16 kHz) e retorna o Future com a resposta"""
+        future = Future()
+        self.requests.put((audio, language, future))
+        return future
+
+    def _next_batch(self, carry):
+        """Junta áudios do mesmo idioma que cabem em uma janela, esperando um pouco por mais"""
+        batch = [carry] if carry else [self.requests.get()]
+        total = len(batch[0][0]) / SAMPLE_RATE
+        while len(batch) < LOCAL_WHISPER_BATCH_SIZE and total < PACK_SECONDS:
+            try:
+                item = self.requests.get(timeout=LOCAL_WHISPER_BATCH_WAIT)
+            except queue.Empty:
+                break
+            seconds = len(item[0]) / SAMPLE_RATE
+            if item[1] != batch[0][1] or total + PACK_GAP_SECONDS + seconds > PACK_SECONDS:
+                return batch, item
+            batch.append(item)
+            total += PACK_GAP_SECONDS + seconds
+        return batch, None
+
+    def _worker(self):
+        carry = None
+        while True:
+            batch, carry = self._next_batch(carry)
+            try:
+                self._transcribe_batch(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _transcribe_batch(self, batch):
+        """Transcreve os áudios do lote em uma única passada, separados por pausas"""
+        gap = np.zeros(int(PACK_GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        pieces, offsets, lengths = [], [], []
+        position = 0.0
+        for audio, _, _ in batch:
+            if pieces:
+                pieces.append(gap)
+                position += PACK_GAP_SECONDS
+            offsets.append(position)
+            lengths.append(len(audio) / SAMPLE_RATE)
+            pieces.append(audio)
+            position += len(audio) / SAMPLE_RATE
+
+        language = batch[0][1]
+        # Sem condicionar no texto anterior, um clip não influencia a transcrição do seguinte; os
+        # tempos das palavras permitem separar a fala de cada áudio exatamente nas pausas
+        segments, _ = self.model.transcribe(
+            np.concatenate(pieces), language=language, condition_on_previous_text=False,
+            word_timestamps=True
+        )
+        for (_, _, future), packed in zip(batch, _split_packed(list(segments), offsets, lengths)):
+            future.set_result(_response(packed, language))
+
+
+def get_local_whisper():
+    """Instância única do Whisper local (o modelo é carregado na primeira transcrição)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LocalWhisper()
+        return _engine
+
+
+@instrumented('local_whisper_transcribe')
+def transcribe_file(audio_path, language="pt"):
+    """Transcreve um arquivo com o Whisper local, no mesmo formato de resposta da API"""
+    engine = get_local_whisper()
+    from faster_whisper import decode_audio
+
+    audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    return engine.submit(audio, language).result()
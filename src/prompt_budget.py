@@ -0,0 +1,192 @@
+import os
+import re
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # sem tiktoken: estimativa pelo número de caracteres
+    tiktoken = None
+
+# Janela de contexto dos modelos (tokens do prompt + tokens da resposta)
+MODEL_CONTEXT_TOKENS = {'gpt-4': 8192}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Orçamento de tokens do prompt por chamada (0 = todo o contexto que sobra depois da resposta)
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 0))
+
+# Sem o tiktoken, 1 token a cada 3 caracteres (estimativa conservadora para português)
+CHARS_PER_TOKEN = 3.0
+
+# Tokens que cada mensagem do chat gasta além do conteúdo (papel e separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Compactação: cada clip fica com no máximo MAX_CLIP_TOKENS; se nem MIN_CLIP_TOKENS por clip
+# couber no orçamento, o lote é dividido em partes
+MAX_CLIP_TOKENS = int(os.getenv('PROMPT_MAX_CLIP_TOKENS', 600))
+MIN_CLIP_TOKENS = 60
+
+# Frases repetidas entre clips só são removidas a partir deste tamanho (evita "ok", "então")
+MIN_DEDUPE_WORDS = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, model='gpt-4'):
+    """Tokens de um texto: exato com o tiktoken instalado, estimado sem ele"""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages, model='gpt-4'):
+    """Tokens do prompt de uma chamada ao ChatCompletion"""
+    return sum(count_tokens(message['content'], model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def prompt_budget(model='gpt-4', max_tokens=None):
+    """Tokens disponíveis para o prompt: o contexto do modelo menos a resposta, limitado por PROMPT_TOKEN_BUDGET"""
+    available = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) - (max_tokens or 0)
+    return min(PROMPT_TOKEN_BUDGET, available) if PROMPT_TOKEN_BUDGET > 0 else available
+
+
+def render_entries(entries):
+    """Texto do prompt a partir das entradas (cabeçalho, corpo) de cada clip"""
+    return "\n".join(f"{header}\n{body}\n" if body else f"{header}\n" for header, body in entries)
+
+
+def _entry_tokens(entry, model):
+    return count_tokens(render_entries([entry]), model) + 1
+
+
+def _normalize_sentence(sentence):
+    return re.sub(r'[^\w\s]', '', sentence.lower()).split()
+
+
+def dedupe_entries(entries):
+    """Remove frases que já apareceram em clips anteriores (o GPT só precisa lê-las uma vez)"""
+    seen = {}
+    result = []
+    for header, body in entries:
+        kept = []
+        repeated_from = set()
+        for sentence in re.split(r'(?<=[.!?])\s+', body or ''):
+            words = _normalize_sentence(sentence)
+            if len(words) >= MIN_DEDUPE_WORDS:
+                key = ' '.join(words)
+                if key in seen:
+                    repeated_from.add(seen[key])
+                    continue
+                seen[key] = header.rstrip(':')
+            kept.append(sentence)
+        body = ' '.join(kept).strip()
+        if repeated_from:
+            body = f"{body} [trechos repetidos de: {', '.join(sorted(repeated_from))}]".strip()
+        result.append((header, body))
+    return result
+
+
+def _truncate(parts, separator, max_tokens, model, marker):
+    """Mantém o começo e o fim das partes (palavras ou linhas) dentro de max_tokens"""
+    text = separator.join(parts)
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+
+    keep = int(len(parts) * max_tokens / tokens)
+    while keep > 0:
+        head = math.ceil(keep * 2 / 3)
+        tail = keep - head
+        omitted = marker.format(count=len(parts) - keep)
+        text = separator.join(parts[:head] + [omitted] + (parts[-tail:] if tail else []))
+        if count_tokens(text, model) <= max_tokens:
+            return text
+        keep = int(keep * 0.8)
+    return marker.format(count=len(parts))
+
+
+def truncate_words(text, max_tokens, model='gpt-4'):
+    return _truncate(text.split(), ' ', max_tokens, model, '[... {count} palavras omitidas ...]')
+
+
+def truncate_lines(text, max_tokens, model='gpt-4'):
+    return _truncate(text.splitlines(), '\n', max_tokens, model, '  [... {count} linhas omitidas ...]')
+
+
+def _water_level(sizes, available):
+    """Maior limite por clip que faz o total caber em available (clips menores ficam inteiros)"""
+    remaining = available
+    ordered = sorted(sizes)
+    for index, size in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        if size > share:
+            return share
+        remaining -= size
+    return ordered[-1] if ordered else 0
+
+
+def compact_entries(entries, max_tokens, model='gpt-4', dedupe=True, by_lines=False):
+    """Compacta as entradas para caberem em max_tokens, ou None se nem o mínimo por clip couber"""
+    if dedupe:
+        entries = dedupe_entries(entries)
+    truncate = truncate_lines if by_lines else truncate_words
+
+    # Primeiro aplica o limite fixo por clip, depois divide o orçamento entre os clips longos
+    limit = MAX_CLIP_TOKENS
+    for _ in range(3):
+        compacted = []
+        for header, body in entries:
+            header_tokens = _entry_tokens((header, ''), model)
+            if body and _entry_tokens((header, body), model) > limit:
+                body = truncate(body, max(1, limit - header_tokens), model)
+            compacted.append((header, body))
+        entries = compacted
+
+        sizes = [_entry_tokens(entry, model) for entry in entries]
+        if sum(sizes) <= max_tokens:
+            return entries
+        limit = _water_level(sizes, max_tokens)
+        if limit < MIN_CLIP_TOKENS:
+            return None
+    return entries if sum(_entry_tokens(entry, model) for entry in entries) <= max_tokens else None
+
+
+def chunk_entries(entries, max_tokens, model='gpt-4', groups=None, by_lines=False, max_entries=None):
+    """Divide as entradas em partes que cabem em max_tokens, sem separar os grupos quando possível"""
+    truncate = truncate_lines if by_lines else truncate_words
+    limit = max(MIN_CLIP_TOKENS, min(MAX_CLIP_TOKENS, max_tokens))
+    entries = [
+        (header, truncate(body, limit, model) if body else body)
+        for header, body in entries
+    ]
+    groups = groups or [list(range(len(entries)))]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for group in groups:
+        group_entries = [entries[index] for index in group]
+        group_tokens = sum(_entry_tokens(entry, model) for entry in group_entries)
+        if current and (current_tokens + group_tokens > max_tokens
+                        or (max_entries and len(current) + len(group_entries) > max_entries)):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        # Grupos maiores que o orçamento são divididos entre partes consecutivas
+        for entry in group_entries:
+            tokens = _entry_tokens(entry, model)
+            if current and (current_tokens + tokens > max_tokens or (max_entries and len(current) >= max_entries)):
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(entry)
+            current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,548 @@
+import os
+import shutil
+import tempfile
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import ffmpeg
+from .artifact_cache import get_cache, make_key, file_hash, materialize
+from .instrumentation import run_ffmpeg
+
+# Backend padrão de renderização ('ffmpeg' ou 'moviepy')
+DEFAULT_RENDER_BACKEND = os.getenv('RENDER_BACKEND', 'ffmpeg')
+
+# Distância máxima (s) entre o início pedido e o keyframe anterior para cortar sem re-encode.
+# Acima de 0, o clip passa a começar no keyframe e inclui até essa duração de trecho que a
+# edição tinha cortado; o padrão 0 só copia clips cujo corte já cai em um keyframe
+KEYFRAME_TOLERANCE = float(os.getenv('KEYFRAME_TOLERANCE', 0))
+
+# Duração do trecho encodado para conferir, antes da renderização, se o re-encode reproduz os
+# headers do codec dos clips copiados
+EXTRADATA_CHECK_SECONDS = 0.5
+
+# Parâmetros que precisam coincidir entre as entradas para permitir stream copy
+VIDEO_COPY_KEYS = ('codec_name', 'profile', 'width', 'height', 'pix_fmt', 'r_frame_rate')
+AUDIO_COPY_KEYS = ('codec_name', 'sample_rate', 'channels')
+
+# Codecs que podem ser copiados direto para o MP4 final
+COPY_VIDEO_CODECS = ('h264',)
+COPY_AUDIO_CODECS = ('aac',)
+
+# O moov atom vai para o início do MP4 final: a reprodução começa antes do download terminar
+FASTSTART_MOVFLAGS = '+faststart'
+
+# Parâmetros do re-encode quando as entradas não são compatíveis entre si
+ENCODE_FPS = 30
+ENCODE_SAMPLE_RATE = 44100
+
+# Renderização em paralelo: encodes simultâneos (0 = todos os núcleos) e duração máxima de cada
+# parte, para que um clip longo também seja dividido entre os núcleos
+RENDER_JOBS = int(os.getenv('RENDER_JOBS', 0))
+RENDER_SEGMENT_SECONDS = float(os.getenv('RENDER_SEGMENT_SECONDS', 30))
+
+# Timescale fixo das partes encodadas em paralelo: o concat por cópia exige que coincidam
+ENCODE_TIMESCALE = 15360
+
+# Parâmetros de saída das partes encodadas (também entram na chave do cache de segmentos)
+SEGMENT_FORMAT = {
+    'vcodec': 'libx264', 'pix_fmt': 'yuv420p', 'flags': '+cgop',
+    'acodec': 'aac', 'ar': ENCODE_SAMPLE_RATE, 'ac': 2, 'video_track_timescale': ENCODE_TIMESCALE
+}
+
+# Cache de segmentos encodados: ao reordenar ou ajustar cortes, só as partes novas são encodadas
+RENDER_SEGMENT_CACHE = os.getenv('RENDER_SEGMENT_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+# Partes menores que isso são unidas à vizinha ao alinhar a divisão na grade
+MIN_PART_SECONDS = 1.0
+
+# Prévia: resolução reduzida, preset mais rápido e bitrate baixo, só para conferir os cortes
+PREVIEW_HEIGHT = int(os.getenv('PREVIEW_HEIGHT', 360))
+PREVIEW_FORMAT = {
+    'vcodec': 'libx264', 'preset': 'ultrafast', 'crf': 30, 'maxrate': '800k', 'bufsize': '1600k',
+    'pix_fmt': 'yuv420p', 'acodec': 'aac', 'audio_bitrate': '64k',
+    # Keyframe a cada segundo e MP4 fragmentado: cada fragmento pode ser reproduzido assim que é gravado
+    'g': ENCODE_FPS, 'movflags': 'frag_keyframe+empty_moov+default_base_moof'
+}
+
+
+def probe_media(path):
+    """Obtém duração e parâmetros de codec de um arquivo de mídia"""
+    # O hash do extradata (SPS/PPS) identifica os headers do codec de cada arquivo
+    info = ffmpeg.probe(path, show_data_hash='md5')
+    video = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
+    audio = next((s for s in info['streams'] if s['codec_type'] == 'audio'), None)
+
+    return {
+        'duration': float(info['format'].get('duration', 0)),
+        'start_time': float(info['format'].get('start_time', 0) or 0),
+        'video': {key: video.get(key) for key in VIDEO_COPY_KEYS} if video else None,
+        'audio': {key: audio.get(key) for key in AUDIO_COPY_KEYS} if audio else None,
+        'time_base': video.get('time_base') if video else None,
+        'extradata': video.get('extradata_hash') if video else None
+    }
+
+
+def probe_keyframes(path, start_time=0.0):
+    """Lista os instantes (em segundos, relativos ao início do arquivo) dos keyframes de vídeo"""
+    info = ffmpeg.probe(
+        path,
+        select_streams='v:0',
+        skip_frame='nokey',
+        show_entries='frame=pts_time,best_effort_timestamp_time'
+    )
+
+    keyframes = []
+    for frame in info.get('frames', []):
+        timestamp = frame.get('pts_time', frame.get('best_effort_timestamp_time'))
+        if timestamp not in (None, 'N/A'):
+            keyframes.append(float(timestamp) - start_time)
+    return sorted(keyframes)
+
+
+def _keyframe_before(keyframes, position):
+    """Retorna o último keyframe anterior (ou igual) à posição informada"""
+    candidates = [kf for kf in keyframes if kf <= position + 1e-3]
+    return candidates[-1] if candidates else None
+
+
+def _is_copy_compatible(media):
+    """Verifica se os codecs do arquivo podem ser copiados direto para o MP4"""
+    return (
+        media['video'] is not None and media['audio'] is not None and
+        media['video']['codec_name'] in COPY_VIDEO_CODECS and
+        media['audio']['codec_name'] in COPY_AUDIO_CODECS
+    )
+
+
+def build_render_plan(clips_order, clips_info, clips_timing, keyframe_tolerance=KEYFRAME_TOLERANCE,
+                      allow_copy=True):
+    """Monta o plano de cortes a partir da ordem e dos tempos definidos pela IA"""
+    probes = {}
+    keyframes = {}
+    segments = []
+    # Depois da remoção de repetições, a posição na lista não é mais o id do clip
+    clips_by_id = {clip.get('id', index): clip for index, clip in enumerate(clips_info)}
+
+    for clip_number in clips_order:
+        if clip_number not in clips_timing or clip_number not in clips_by_id:
+            continue
+
+        clip_info = clips_by_id[clip_number]
+        path = clip_info['path']
+        if not os.path.exists(path):
+            continue
+
+        try:
+            if path not in probes:
+                probes[path] = probe_media(path)
+        except ffmpeg.Error as e:
+            print(f"Erro ao analisar clip {clip_number}: {e.stderr.decode(errors='ignore')}")
+            continue
+
+        media = probes[path]
+        start_time, end_time = clips_timing[clip_number]
+        end_time = min(end_time, media['duration'])
+        if start_time >= end_time:
+            print(f"Erro ao processar clip {clip_number}: intervalo {start_time}-{end_time} inválido")
+            continue
+
+        segments.append({
+            'clip': clip_number,
+            'path': path,
+            'start': start_time,
+            'end': end_time,
+            'mode': 'encode'
+        })
+
+    # A referência é o primeiro segmento: os demais precisam ter os mesmos parâmetros
+    reference = probes[segments[0]['path']] if segments else None
+    if (not allow_copy or reference is None or not _is_copy_compatible(reference)
+            or reference['extradata'] is None):
+        return {'segments': segments, 'reference': reference, 'probes': probes}
+
+    for segment in segments:
+        media = probes[segment['path']]
+        if media['video'] != reference['video'] or media['audio'] != reference['audio']:
+            continue
+        # O MP4 final guarda só os headers (SPS/PPS) do primeiro arquivo do concat
+        if media['extradata'] != reference['extradata']:
+            continue
+
+        if segment['path'] not in keyframes:
+            try:
+                keyframes[segment['path']] = probe_keyframes(segment['path'], media['start_time'])
+            except ffmpeg.Error:
+                keyframes[segment['path']] = []
+
+        # Corta no keyframe anterior se ele estiver perto o suficiente do início pedido
+        keyframe = _keyframe_before(keyframes[segment['path']], segment['start'])
+        if keyframe is not None and segment['start'] - keyframe <= keyframe_tolerance:
+            segment['start'] = keyframe
+            segment['mode'] = 'copy'
+
+    return {'segments': segments, 'reference': reference, 'probes': probes}
+
+
+def _segment_streams(segment, media, width, height, fps, sample_rate, channel_layout):
+    """Cria os streams de vídeo e áudio normalizados de um segmento"""
+    duration = segment['end'] - segment['start']
+    source = ffmpeg.input(segment['path'], ss=segment['start'], t=duration)
+
+    video = (
+        source.video
+        .filter('scale', width, height, force_original_aspect_ratio='decrease')
+        .filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2')
+        .filter('setsar', 1)
+        .filter('fps', fps=fps)
+    )
+
+    # Arquivos sem áudio recebem silêncio para manter o concat alinhado
+    if media['audio'] is not None:
+        audio = source.audio
+    else:
+        audio = ffmpeg.input(
+            f'anullsrc=channel_layout={channel_layout}:sample_rate={sample_rate}',
+            f='lavfi', t=duration
+        ).audio
+    audio = audio.filter('aformat', sample_rates=sample_rate, channel_layouts=channel_layout)
+
+    return video, audio
+
+
+def _even(value):
+    """Arredonda dimensões para um número par (exigência do yuv420p)"""
+    return int(value) - int(value) % 2
+
+
+def _output_size(plan, max_height=None):
+    """Resolução do vídeo renderizado: a do primeiro clip com vídeo, limitada a max_height"""
+    first_video = next((media['video'] for media in plan['probes'].values() if media['video']), None)
+    if first_video is None:
+        raise ValueError("Nenhum stream de vídeo encontrado nos clips")
+
+    width, height = _even(first_video['width']), _even(first_video['height'])
+    if max_height and height > max_height:
+        width, height = _even(width * max_height / height), _even(max_height)
+    return width, height
+
+
+def _render_filtergraph(plan, output_file, max_height=None, output_args=None):
+    """Renderiza toda a timeline em um único re-encode com filtergraph"""
+    width, height = _output_size(plan, max_height)
+    streams = []
+    for segment in plan['segments']:
+        media = plan['probes'][segment['path']]
+        streams.extend(_segment_streams(
+            segment, media, width, height, ENCODE_FPS, ENCODE_SAMPLE_RATE, 'stereo'
+        ))
+
+    output_args = output_args or {
+        'vcodec': 'libx264', 'acodec': 'aac', 'pix_fmt': 'yuv420p', 'movflags': FASTSTART_MOVFLAGS
+    }
+    joined = ffmpeg.concat(*streams, v=1, a=1).node
+    run_ffmpeg(
+        ffmpeg
+        .output(joined[0], joined[1], output_file, **output_args)
+    )
+
+
+def _render_jobs(jobs=None):
+    """Número de encodes simultâneos (0 = todos os núcleos)"""
+    jobs = RENDER_JOBS if jobs is None else jobs
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def _encoder_threads(jobs):
+    """Threads do libx264 por encode, dividindo os núcleos entre os encodes simultâneos"""
+    return max(1, (os.cpu_count() or 1) // jobs)
+
+
+def _encode_matching_segment(segment, media, reference, output_path, threads=0):
+    """Re-encoda um segmento com os mesmos parâmetros da referência para o concat por cópia"""
+    video_params = reference['video']
+    audio_params = reference['audio']
+    channel_layout = 'mono' if int(audio_params['channels']) == 1 else 'stereo'
+
+    video, audio = _segment_streams(
+        segment, media,
+        video_params['width'], video_params['height'],
+        video_params['r_frame_rate'],
+        audio_params['sample_rate'], channel_layout
+    )
+
+    output_args = {
+        'vcodec': 'libx264',
+        'pix_fmt': video_params['pix_fmt'],
+        # GOP fechado: o segmento não referencia quadros fora dele e pode ser concatenado por cópia
+        'flags': '+cgop',
+        'threads': threads,
+        'acodec': 'aac',
+        'ar': audio_params['sample_rate'],
+        'ac': audio_params['channels']
+    }
+    if video_params.get('profile'):
+        output_args['profile:v'] = video_params['profile'].lower().replace('constrained ', '')
+    if reference.get('time_base'):
+        output_args['video_track_timescale'] = reference['time_base'].split('/')[-1]
+
+    run_ffmpeg(ffmpeg.output(video, audio, output_path, **output_args))
+    return output_path
+
+
+def _escape_concat_path(path):
+    """Escapa um caminho para o arquivo de lista do concat demuxer"""
+    return os.path.abspath(path).replace("'", "'\\''")
+
+
+def _split_segment(segment, max_seconds=None):
+    """Divide um segmento em partes de até max_seconds, que podem ser encodadas em paralelo"""
+    max_seconds = RENDER_SEGMENT_SECONDS if max_seconds is None else max_seconds
+    start, end = segment['start'], segment['end']
+    if max_seconds <= 0 or end - start <= max_seconds:
+        return [segment]
+
+    # Os cortes internos ficam em múltiplos de max_seconds do arquivo de origem: mudar o início
+    # ou o fim de um clip altera só as partes das pontas, e as demais continuam no cache
+    boundaries = [start]
+    point = (int(start // max_seconds) + 1) * max_seconds
+    while point < end - MIN_PART_SECONDS:
+        if point - boundaries[-1] >= MIN_PART_SECONDS:
+            boundaries.append(point)
+        point += max_seconds
+    boundaries.append(end)
+    return [dict(segment, start=a, end=b) for a, b in zip(boundaries, boundaries[1:])]
+
+
+def segment_key(segment, **settings):
+    """Chave do cache de um segmento encodado: conteúdo da origem, intervalo e parâmetros"""
+    return make_key(
+        'segment', file_hash(segment['path']),
+        start=round(segment['start'], 3), end=round(segment['end'], 3), **settings
+    )
+
+
+def _encode_normalized_segment(segment, media, width, height, output_path, threads=0):
+    """Encoda uma parte da timeline com parâmetros fixos, para o concat por cópia"""
+    video, audio = _segment_streams(
+        segment, media, width, height, ENCODE_FPS, ENCODE_SAMPLE_RATE, 'stereo'
+    )
+    run_ffmpeg(
+        ffmpeg
+        .output(video, audio, output_path, threads=threads, **SEGMENT_FORMAT)
+    )
+    return output_path
+
+
+def _encode_and_store(encode, key, output_path):
+    """Executa o encode e guarda o segmento no cache"""
+    encode()
+    get_cache().put_file(key, output_path, kind='segment')
+    return output_path
+
+
+def _encode_or_reuse(tasks, encode, key, output_path):
+    """Reaproveita o segmento do cache (True) ou agenda o encode em tasks (False)"""
+    if key is not None:
+        cached_path = get_cache().get_path(key)
+        if cached_path:
+            materialize(cached_path, output_path)
+            return True
+        encode = partial(_encode_and_store, encode, key, output_path)
+    tasks.append(encode)
+    return False
+
+
+def _run_encodes(tasks, jobs):
+    """Executa os encodes simultaneamente; cada um é um processo ffmpeg, as threads só aguardam"""
+    if jobs <= 1 or len(tasks) <= 1:
+        return [task() for task in tasks]
+    with ThreadPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        # Cada encode roda no contexto de quem chamou, para o ffmpeg contar no span da renderização
+        futures = [executor.submit(contextvars.copy_context().run, task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def _concat_copy(lines, output_file, work_dir):
+    """Junta os arquivos da lista com o concat demuxer, sem re-encode"""
+    list_path = os.path.join(work_dir, 'concat.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+    run_ffmpeg(
+        ffmpeg
+        .input(list_path, f='concat', safe=0)
+        .output(output_file, c='copy', map='0', avoid_negative_ts='make_zero',
+                movflags=FASTSTART_MOVFLAGS)
+    )
+
+
+def _video_extradata(path):
+    """Hash do extradata (SPS/PPS) do stream de vídeo de um arquivo"""
+    info = ffmpeg.probe(path, select_streams='v:0', show_data_hash='md5')
+    streams = info.get('streams') or [{}]
+    return streams[0].get('extradata_hash')
+
+
+def _encoder_matches_reference(plan, work_dir):
+    """Encoda um trecho curto com os parâmetros da referência e compara os headers do codec"""
+    reference = plan['reference']
+    segment = next(segment for segment in plan['segments'] if segment['mode'] == 'encode')
+    media = plan['probes'][segment['path']]
+
+    # O resultado depende só dos parâmetros de saída e da origem, então fica no cache
+    cache = get_cache()
+    key = make_key(
+        'extradata-check', reference['extradata'], video=reference['video'], audio=reference['audio'],
+        time_base=reference['time_base'], source=media['video']
+    )
+    cached = cache.get_json(key)
+    if cached is not None:
+        return cached['match']
+
+    sample = dict(segment, end=min(segment['end'], segment['start'] + EXTRADATA_CHECK_SECONDS))
+    sample_path = os.path.join(work_dir, 'extradata_check.mp4')
+    _encode_matching_segment(sample, media, reference, sample_path)
+    match = _video_extradata(sample_path) == reference['extradata']
+    os.remove(sample_path)
+    cache.put_json(key, {'match': match})
+    return match
+
+
+def _render_concat(plan, output_file, work_dir, jobs=1):
+    """Concatena a timeline por stream copy, re-encodando apenas os segmentos necessários.
+
+    Retorna False, sem gerar o arquivo, se os segmentos re-encodados não tiverem os mesmos
+    headers do codec que os copiados: o MP4 manteria só os do primeiro arquivo e os demais
+    trechos seriam decodificados errado.
+    """
+    lines = []
+    tasks = []
+    encoded = []
+    reused = 0
+    threads = _encoder_threads(jobs)
+    for index, segment in enumerate(plan['segments']):
+        if segment['mode'] == 'copy':
+            # inpoint/outpoint usam os timestamps do arquivo, que podem não começar em zero
+            offset = plan['probes'][segment['path']]['start_time']
+            lines.append(f"file '{_escape_concat_path(segment['path'])}'")
+            lines.append(f"inpoint {segment['start'] + offset:.6f}")
+            lines.append(f"outpoint {segment['end'] + offset:.6f}")
+        else:
+            media = plan['probes'][segment['path']]
+            encoded_path = os.path.join(work_dir, f"segment_{index:04d}.mp4")
+            encode = partial(_encode_matching_segment, segment, media, plan['reference'], encoded_path, threads)
+            key = segment_key(
+                segment, mode='matching', video=plan['reference']['video'],
+                audio=plan['reference']['audio'], time_base=plan['reference']['time_base']
+            ) if RENDER_SEGMENT_CACHE else None
+            if _encode_or_reuse(tasks, encode, key, encoded_path):
+                reused += 1
+            else:
+                print(f"Re-encodando clip {segment['clip']} ({segment['start']:.2f}-{segment['end']:.2f}s)")
+            encoded.append(encoded_path)
+            lines.append(f"file '{_escape_concat_path(encoded_path)}'")
+
+    if reused:
+        print(f"{reused} segmentos re-encodados reaproveitados do cache")
+
+    # O primeiro encode já mostra se o libx264 gerou os mesmos headers da origem
+    if tasks:
+        tasks[0]()
+    extradata = plan['reference']['extradata']
+    if encoded and (extradata is None or _video_extradata(encoded[0]) != extradata):
+        print("Headers do codec dos segmentos re-encodados diferem dos clips originais")
+        return False
+    _run_encodes(tasks[1:], jobs)
+    if any(_video_extradata(path) != extradata for path in encoded[1:]):
+        print("Headers do codec dos segmentos re-encodados diferem dos clips originais")
+        return False
+    _concat_copy(lines, output_file, work_dir)
+    return True
+
+
+def _render_segmented(plan, output_file, work_dir, jobs):
+    """Encoda as partes da timeline em paralelo (GOP fechado) e junta por stream copy"""
+    width, height = _output_size(plan)
+    parts = [part for segment in plan['segments'] for part in _split_segment(segment)]
+    threads = _encoder_threads(jobs)
+
+    tasks = []
+    lines = []
+    for index, part in enumerate(parts):
+        media = plan['probes'][part['path']]
+        part_path = os.path.join(work_dir, f"part_{index:04d}.mp4")
+        encode = partial(_encode_normalized_segment, part, media, width, height, part_path, threads)
+        key = segment_key(
+            part, mode='normalized', width=width, height=height, fps=ENCODE_FPS, **SEGMENT_FORMAT
+        ) if RENDER_SEGMENT_CACHE else None
+        _encode_or_reuse(tasks, encode, key, part_path)
+        lines.append(f"file '{_escape_concat_path(part_path)}'")
+
+    # Só as partes que mudaram desde a última renderização são encodadas
+    print(f"{len(parts) - len(tasks)} de {len(parts)} partes reaproveitadas do cache")
+    if tasks:
+        print(f"Encodando {len(tasks)} partes com {min(jobs, len(tasks))} processos ffmpeg simultâneos...")
+    _run_encodes(tasks, jobs)
+    _concat_copy(lines, output_file, work_dir)
+
+
+def render_with_ffmpeg(clips_order, clips_info, clips_timing, output_file, temp_dir="temp",
+                       jobs=None, stream_copy=True):
+    """Renderiza o vídeo final com ffmpeg, usando stream copy e segmentos em cache sempre que possível"""
+    jobs = _render_jobs(jobs)
+    plan = build_render_plan(clips_order, clips_info, clips_timing, allow_copy=stream_copy)
+    segments = plan['segments']
+    if not segments:
+        raise ValueError("Nenhum clip válido para montar o vídeo")
+
+    copied = sum(1 for segment in segments if segment['mode'] == 'copy')
+    print(f"Plano de renderização: {copied} segmentos por cópia, {len(segments) - copied} re-encodados")
+
+    os.makedirs(temp_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='render_', dir=temp_dir)
+    try:
+        # Sem os mesmos headers, o concat por cópia seria descartado depois de encodar os segmentos
+        if copied and copied < len(segments) and not _encoder_matches_reference(plan, work_dir):
+            print("O re-encode não reproduz os headers do codec dos clips; a timeline será re-encodada")
+            copied = 0
+        if copied:
+            print("\nMontando vídeo final por stream copy...")
+            if not _render_concat(plan, output_file, work_dir, jobs):
+                print("\nRenderizando vídeo final em partes...")
+                _render_segmented(plan, output_file, work_dir, jobs)
+        elif jobs > 1 or RENDER_SEGMENT_CACHE:
+            print("\nRenderizando vídeo final em partes...")
+            _render_segmented(plan, output_file, work_dir, jobs)
+        else:
+            print("\nRenderizando vídeo final em passe único...")
+            _render_filtergraph(plan, output_file)
+    except ffmpeg.Error as e:
+        print(f"Erro do ffmpeg:\n{e.stderr.decode(errors='ignore') if e.stderr else e}")
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    total_duration = sum(segment['end'] - segment['start'] for segment in segments)
+    print(f"\nVídeo final criado com sucesso: {output_file}")
+    print(f"Duração total: {total_duration:.2f} segundos")
+    return output_file
+
+
+def render_preview(clips_order, clips_info, clips_timing, output_file):
+    """Renderiza uma prévia rápida em MP4 fragmentado, que pode ser reproduzida durante a gravação"""
+    plan = build_render_plan(clips_order, clips_info, clips_timing, allow_copy=False)
+    segments = plan['segments']
+    if not segments:
+        raise ValueError("Nenhum clip válido para montar o vídeo")
+
+    print(f"\nRenderizando prévia ({len(segments)} segmentos, até {PREVIEW_HEIGHT}p)...")
+    try:
+        _render_filtergraph(plan, output_file, PREVIEW_HEIGHT, PREVIEW_FORMAT)
+    except ffmpeg.Error as e:
+        print(f"Erro do ffmpeg:\n{e.stderr.decode(errors='ignore') if e.stderr else e}")
+        raise
+
+    total_duration = sum(segment['end'] - segment['start'] for segment in segments)
+    print(f"\nPrévia criada com sucesso: {output_file}")
+    print(f"Duração total: {total_duration:.2f} segundos")
+    return output_file
@@ -0,0 +1,102 @@
+import io
+import numpy as np
+
+# Segmentos do Whisper em formato colunar: início e fim (segundos) e deslocamentos de cada
+# trecho no texto concatenado; o sidecar .npz fica no cache ao lado da transcrição
+SEGMENTS_SUFFIX = '.npz'
+
+# Palavras de cada segmento mostradas no prompt de edição (o conteúdo completo já foi
+# resumido na análise de estrutura)
+SEGMENT_PROMPT_WORDS = 12
+
+
+def segments_from_response(response):
+    """Converte os segmentos de uma resposta verbose_json do Whisper para o formato colunar"""
+    items = response.get('segments') or []
+    texts = [item.get('text', '').strip() for item in items]
+    offsets = np.zeros(len(texts) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(text) for text in texts])
+    return {
+        'start': np.array([item['start'] for item in items], dtype=np.float32),
+        'end': np.array([item['end'] for item in items], dtype=np.float32),
+        'offsets': offsets,
+        'text': ''.join(texts)
+    }
+
+
+def remap_times(times, ranges):
+    """Converte tempos do áudio com os trechos concatenados para os tempos originais do clip"""
+    starts = np.array([start for start, _ in ranges], dtype=np.float64)
+    ends = np.array([end for _, end in ranges], dtype=np.float64)
+    offsets = np.concatenate(([0.0], np.cumsum(ends - starts)))
+    index = np.clip(np.searchsorted(offsets, times, side='right') - 1, 0, len(ranges) - 1)
+    return np.minimum(starts[index] + (times - offsets[index]), ends[index])
+
+
+def concat_segments(parts):
+    """Junta os segmentos de várias partes, com os tempos de cada uma levados ao clip original"""
+    starts, ends, offsets, texts = [], [], [np.zeros(1, dtype=np.int32)], []
+    text_length = 0
+    for segments, ranges in parts:
+        start, end = segments['start'].astype(np.float64), segments['end'].astype(np.float64)
+        if ranges:
+            start, end = remap_times(start, ranges), remap_times(end, ranges)
+        starts.append(start.astype(np.float32))
+        ends.append(end.astype(np.float32))
+        offsets.append(segments['offsets'][1:] + text_length)
+        texts.append(segments['text'])
+        text_length += len(segments['text'])
+    return {
+        'start': np.concatenate(starts) if starts else np.zeros(0, dtype=np.float32),
+        'end': np.concatenate(ends) if ends else np.zeros(0, dtype=np.float32),
+        'offsets': np.concatenate(offsets).astype(np.int32),
+        'text': ''.join(texts)
+    }
+
+
+def segments_to_bytes(segments):
+    buffer = io.BytesIO()
+    np.savez(
+        buffer, start=segments['start'], end=segments['end'], offsets=segments['offsets'],
+        text=np.frombuffer(segments['text'].encode('utf-8'), dtype=np.uint8)
+    )
+    return buffer.getvalue()
+
+
+def segments_from_bytes(data):
+    with np.load(io.BytesIO(data)) as arrays:
+        return {
+            'start': arrays['start'],
+            'end': arrays['end'],
+            'offsets': arrays['offsets'],
+            'text': arrays['text'].tobytes().decode('utf-8')
+        }
+
+
+def segment_count(segments):
+    return len(segments['start']) if segments else 0
+
+
+def segment_text(segments, index):
+    """Texto de um segmento, recortado do texto concatenado"""
+    offsets = segments['offsets']
+    return segments['text'][offsets[index]:offsets[index + 1]]
+
+
+def prompt_excerpt(text, words=SEGMENT_PROMPT_WORDS):
+    """Começo do texto de um segmento, suficiente para o GPT identificá-lo"""
+    parts = text.split()
+    return ' '.join(parts[:words]) + (' ...' if len(parts) > words else '')
+
+
+def segment_range_times(segments, first, last):
+    """Tempos (início do primeiro, fim do último) de um intervalo de segmentos"""
+    count = segment_count(segments)
+    if not count:
+        raise ValueError("clip sem segmentos")
+    first = max(0, first)
+    last = min(last, count - 1)
+    if first > last:
+        raise ValueError(f"Intervalo de segmentos {first}-{last} inválido")
+    # Os tempos ficam em float32 no sidecar; milissegundos bastam para o corte
+    return round(float(segments['start'][first]), 3), round(float(segments['end'][last]), 3)
@@ -0,0 +1,128 @@
+import os
+import ffmpeg
+from .ingest import SPEECH_AUDIO_FORMAT, SPEECH_AUDIO_EXTENSION
+from .video_processor import convert_to_audio
+from .audio_analysis import AudioAnalysis
+from .artifact_cache import get_cache, make_key, file_hash, materialize
+from .instrumentation import instrumented, run_ffmpeg
+
+# Áudio enviado ao Whisper: 'nonsilent' (só os trechos com fala) ou 'full' (o clip inteiro)
+SPEECH_EXTRACTION = os.getenv('SPEECH_EXTRACTION', 'nonsilent')
+
+# Limite de upload da API de transcrição; as partes são planejadas com folga sobre ele
+WHISPER_MAX_UPLOAD_BYTES = int(os.getenv('WHISPER_MAX_UPLOAD_BYTES', 25 * 1024 ** 2))
+UPLOAD_SAFETY = 0.9
+
+# Bytes por segundo do Opus de fala (24 kbps) mais o overhead do contêiner Ogg
+SPEECH_BYTES_PER_SECOND = 24000 / 8 * 1.05
+
+
+def plan_parts(ranges, max_seconds):
+    """Agrupa os trechos em partes de até max_seconds, dividindo trechos maiores que isso"""
+    parts = []
+    current = []
+    current_seconds = 0.0
+    for start, end in ranges:
+        while end - start > 0:
+            room = max_seconds - current_seconds
+            if room <= 0:
+                parts.append(current)
+                current, current_seconds = [], 0.0
+                continue
+            # Prefere não cortar um trecho no meio: começa uma parte nova se ele couber inteiro nela
+            if end - start > room and current and end - start <= max_seconds:
+                parts.append(current)
+                current, current_seconds = [], 0.0
+                continue
+            piece_end = min(end, start + room)
+            current.append((start, piece_end))
+            current_seconds += piece_end - start
+            start = piece_end
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _lossless_audio(clip, temp_dir="temp"):
+    """Áudio de onde os trechos são cortados: o PCM da detecção de silêncio ou o próprio clip.
+
+    O áudio de fala já codificado não serve: cortá-lo exigiria decodificar o Opus e codificar
+    de novo, perdendo qualidade duas vezes.
+    """
+    analysis = AudioAnalysis.load_cached(clip['path'], temp_dir)
+    if analysis is not None and analysis.raw_path is not None:
+        return analysis.input().audio
+    return ffmpeg.input(clip['path'])['a:0']
+
+
+def _encode_ranges(audio, ranges, output_path):
+    """Codifica só os trechos informados, concatenados, no formato de fala"""
+    pieces = [
+        audio.filter('atrim', start=start, end=end).filter('asetpts', 'PTS-STARTPTS')
+        for start, end in ranges
+    ]
+    joined = ffmpeg.concat(*pieces, v=0, a=1) if len(pieces) > 1 else pieces[0]
+    run_ffmpeg(ffmpeg.output(joined, output_path, **SPEECH_AUDIO_FORMAT))
+    return output_path
+
+
+def speech_part_key(content_hash, ranges):
+    # cut_from: as partes são cortadas do áudio sem perdas, não do Opus de fala já codificado
+    return make_key('speech', content_hash, ranges=[[round(start, 3), round(end, 3)] for start, end in ranges],
+                    cut_from='lossless', **SPEECH_AUDIO_FORMAT)
+
+
+def speech_source(clip, mode=None):
+    """Descreve o áudio de fala enviado ao Whisper (o modo e os trechos, que vêm da detecção de silêncio)"""
+    mode = mode or SPEECH_EXTRACTION
+    ranges = clip.get('ranges') if mode == 'nonsilent' else None
+    if not ranges:
+        return {'extraction': 'full'}
+    return {'extraction': mode, 'ranges': [[round(start, 3), round(end, 3)] for start, end in ranges]}
+
+
+def _media_duration(path):
+    return float(ffmpeg.probe(path)['format']['duration'])
+
+
+@instrumented()
+def extract_speech_parts(clip, temp_dir="temp", mode=None, max_bytes=None):
+    """Áudio de fala de um clip para o Whisper: lista de (arquivo, trechos do clip que ele contém)"""
+    mode = mode or SPEECH_EXTRACTION
+    max_bytes = WHISPER_MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+
+    ranges = clip.get('ranges') if mode == 'nonsilent' else None
+    if not ranges:
+        # O áudio de fala do clip inteiro normalmente já vem da ingestão
+        full_audio = convert_to_audio(clip['path'], temp_dir)
+        if os.path.getsize(full_audio) <= max_bytes:
+            return [(full_audio, None)]
+        ranges = [(0.0, _media_duration(full_audio))]
+
+    audio = None
+    cache = get_cache()
+    content_hash = file_hash(clip['path'])
+    max_seconds = max_bytes * UPLOAD_SAFETY / SPEECH_BYTES_PER_SECOND
+    while True:
+        parts = []
+        for index, part_ranges in enumerate(plan_parts(ranges, max_seconds)):
+            key = speech_part_key(content_hash, part_ranges)
+            output_path = os.path.join(
+                temp_dir, f"{os.path.basename(clip['path'])}.speech{index}{SPEECH_AUDIO_EXTENSION}"
+            )
+            cached_path = cache.get_path(key)
+            if cached_path:
+                materialize(cached_path, output_path)
+            else:
+                if audio is None:
+                    audio = _lossless_audio(clip, temp_dir)
+                _encode_ranges(audio, part_ranges, output_path)
+                cache.put_file(key, output_path)
+            parts.append((output_path, part_ranges))
+
+        # A taxa do Opus é variável: se alguma parte passou do limite, planeja partes menores
+        if all(os.path.getsize(path) <= max_bytes for path, _ in parts):
+            return parts
+        max_seconds = max_seconds / 2
+        if max_seconds < 1:
+            raise ValueError(f"Não foi possível dividir o áudio de {clip['path']} abaixo de {max_bytes} bytes")
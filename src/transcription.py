@@ -1,69 +1,185 @@
 import os
-import openai
-from .video_processor import convert_to_audio
+import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from .speech_audio import extract_speech_parts, speech_source
+from .whisper_client import transcribe_file, map_concurrently, WHISPER_MODEL, TRANSCRIBE_CONCURRENCY
+from . import local_whisper
+from .artifact_cache import get_cache, make_key, file_hash
+from .instrumentation import instrumented
+from .gpt_cache import cached_chat_completion
+from .dedup import find_duplicate_clusters
+from .prompt_budget import (
+    prompt_budget, count_message_tokens, compact_entries, chunk_entries, render_entries
+)
+from .segments import (
+    SEGMENTS_SUFFIX, segments_from_response, segments_to_bytes, segments_from_bytes,
+    concat_segments, segment_count, segment_text, prompt_excerpt
+)
 from typing import List, Dict
 
-def extract_transcripts(clips_info):
-    """Extrai transcrições dos clips usando OpenAI Whisper"""
-    openai.api_key = os.getenv('OPENAI_API_KEY')
-    transcripts = []
-    
-    for clip in clips_info:
-        # Verifica se já existe transcrição salva
-        transcript_path = os.path.join('temp', f"{os.path.basename(clip['path'])}.transcript.txt")
+TRANSCRIPT_LANGUAGE = "pt"
+
+# Backend de transcrição: 'openai' (API do Whisper) ou 'local' (faster-whisper na CPU)
+TRANSCRIBER = os.getenv('TRANSCRIBER', 'openai')
+
+# Detecção de repetições: 'hybrid' (local, com o GPT só para os casos ambíguos), 'local' ou 'gpt'
+DEDUP_MODE = os.getenv('DEDUP_MODE', 'hybrid')
+
+# Versão do prompt de similaridade: mudar o texto do prompt exige incrementar (invalida o cache)
+SIMILARITY_PROMPT_VERSION = 1
+
+def _transcriber_model(transcriber):
+    """Modelo usado pelo backend (entra nas chaves do cache)"""
+    if transcriber == 'openai':
+        return WHISPER_MODEL
+    if transcriber == 'local':
+        return f"local-{local_whisper.LOCAL_WHISPER_MODEL}-{local_whisper.LOCAL_WHISPER_COMPUTE_TYPE}"
+    raise ValueError(f"Backend de transcrição desconhecido: {transcriber}")
+
+def _transcribe_audio(audio_path, api_key=None, transcriber=None):
+    """Transcreve um arquivo com o backend escolhido; a resposta tem o formato do verbose_json"""
+    if (transcriber or TRANSCRIBER) == 'local':
+        return local_whisper.transcribe_file(audio_path, language=TRANSCRIPT_LANGUAGE)
+    return transcribe_file(audio_path, language=TRANSCRIPT_LANGUAGE, api_key=api_key)
+
+def _transcript_key(clip, transcriber=None):
+    """Chave do cache de transcrição: conteúdo do clip, áudio enviado, modelo e idioma"""
+    return make_key('transcript', file_hash(clip['path']), model=_transcriber_model(transcriber or TRANSCRIBER),
+                    language=TRANSCRIPT_LANGUAGE, **speech_source(clip))
+
+def _segments_key(clip, transcriber=None):
+    """Chave do sidecar com os segmentos (tempos) da transcrição"""
+    # Os tempos são remapeados a partir dos trechos enviados: outros trechos, outros segmentos
+    return make_key('segments', file_hash(clip['path']), model=_transcriber_model(transcriber or TRANSCRIBER),
+                    language=TRANSCRIPT_LANGUAGE, **speech_source(clip))
+
+def _transcribe_clip(clip, api_key=None, temp_dir="temp", transcriber=None):
+    """Extrai o áudio de um clip e o transcreve (executado em paralelo)"""
+    try:
+        # Extrair o áudio de fala (só os trechos sem silêncio, em partes abaixo do limite de upload)
+        parts = extract_speech_parts(clip, temp_dir)
         
-        if os.path.exists(transcript_path):
-            print(f"Usando transcrição existente para clip {clip['id']}")
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                transcript_text = f.read()
-                clip['transcript'] = transcript_text
-                transcripts.append(f"Clip {clip['id']}:\n{transcript_text}\n")
-            continue
-            
-        try:
-            # Extrair áudio do vídeo
-            audio_path = convert_to_audio(clip['path'], 'temp')
-            
-            # Transcrever áudio usando Whisper
-            print(f"Transcrevendo clip {clip['id']}...")
-            with open(audio_path, "rb") as audio_file:
-                transcript = openai.Audio.transcribe(
-                    "whisper-1",
-                    audio_file,
-                    language="pt"
-                )
-                transcript_text = transcript['text']
-                
-                # Salva a transcrição para uso futuro
-                with open(transcript_path, 'w', encoding='utf-8') as f:
-                    f.write(transcript_text)
-                
-                clip['transcript'] = transcript_text
-                transcripts.append(f"Clip {clip['id']}:\n{transcript_text}\n")
-        except Exception as e:
-            print(f"Erro ao transcrever clip {clip['id']}: {str(e)}")
-            clip['transcript'] = ""
-            transcripts.append(f"Clip {clip['id']}: [Sem transcrição]\n")
+        # Transcrever áudio usando Whisper (verbose_json, com os tempos de cada segmento)
+        print(f"Transcrevendo clip {clip['id']}...")
+        texts = []
+        part_segments = []
+        for audio_path, ranges in parts:
+            transcript = _transcribe_audio(audio_path, api_key, transcriber)
+            texts.append(transcript['text'].strip())
+            # Os tempos do Whisper são do áudio compactado; os trechos levam de volta ao clip
+            part_segments.append((segments_from_response(transcript), ranges))
+        transcript_text = ' '.join(text for text in texts if text)
+        segments = concat_segments(part_segments)
+        
+        # Salva a transcrição e os segmentos para uso futuro
+        cache = get_cache()
+        cache.put_bytes(_segments_key(clip, transcriber), segments_to_bytes(segments), SEGMENTS_SUFFIX)
+        cache.put_text(_transcript_key(clip, transcriber), transcript_text)
+        
+        return {'text': transcript_text, 'segments': segments}
+    except Exception as e:
+        print(f"Erro ao transcrever clip {clip['id']}: {str(e)}")
+        return None
+
+def _load_transcript(clip, api_key=None, temp_dir="temp", transcriber=None):
+    """Usa a transcrição salva para o conteúdo do clip ou transcreve o clip"""
+    cache = get_cache()
+    transcript_text = cache.get_text(_transcript_key(clip, transcriber))
+    segments_data = cache.get_bytes(_segments_key(clip, transcriber))
     
-    return "\n".join(transcripts)
+    # Transcrições antigas, sem o sidecar de segmentos, são refeitas
+    if transcript_text is not None and segments_data is not None:
+        print(f"Usando transcrição existente para clip {clip['id']}")
+        return {'text': transcript_text, 'segments': segments_from_bytes(segments_data)}
+    return _transcribe_clip(clip, api_key, temp_dir, transcriber)
 
-def find_similar_content_with_gpt(clips_info: List[Dict]) -> List[int]:
-    """
-    Usa GPT para identificar clips com conteúdo similar/repetido
-    Retorna lista de IDs dos clips que devem ser removidos
-    """
-    # Prepara o texto para análise
-    clips_text = []
+def _store_transcript(clip, transcript):
+    """Guarda a transcrição e os segmentos no clip, marcando as que falharam"""
+    clip['transcript'] = transcript['text'] if transcript else ""
+    clip['segments'] = transcript['segments'] if transcript else None
+    clip['transcript_failed'] = transcript is None
+
+def transcript_entries(clips_info):
+    """Entradas (cabeçalho, transcrição) de cada clip, usadas nos prompts"""
+    entries = []
     for clip in clips_info:
-        if clip.get('transcript'):
-            clips_text.append(f"Clip {clip['id']}: {clip['transcript']}")
+        if clip.get('transcript_failed'):
+            entries.append((f"Clip {clip['id']}: [Sem transcrição]", ''))
+        else:
+            entries.append((f"Clip {clip['id']}:", clip['transcript']))
+    return entries
+
+def format_transcripts(clips_info):
+    """Texto com as transcrições de todos os clips, usado nos prompts"""
+    return render_entries(transcript_entries(clips_info))
+
+def segment_entries(clips_info):
+    """Entradas com os segmentos de cada clip, identificados por clip.segmento, para o prompt de edição"""
+    entries = []
+    for clip in clips_info:
+        segments = clip.get('segments')
+        if clip.get('transcript_failed'):
+            entries.append((f"Clip {clip['id']}: [Sem transcrição]", ''))
+        elif not segment_count(segments):
+            entries.append((f"Clip {clip['id']}: [Sem segmentos]", prompt_excerpt(clip.get('transcript', ''))))
+        else:
+            entries.append((f"Clip {clip['id']}:", "\n".join(
+                f"  {clip['id']}.{index}: {prompt_excerpt(segment_text(segments, index))}"
+                for index in range(segment_count(segments))
+            )))
+    return entries
+
+def format_segments(clips_info):
+    """Segmentos de cada clip, identificados por clip.segmento, usados no prompt de edição"""
+    return render_entries(segment_entries(clips_info))
+
+def _default_concurrency(transcriber):
+    """Transcrições simultâneas: limite da API ou o suficiente para encher os lotes do backend local"""
+    if (transcriber or TRANSCRIBER) == 'local':
+        return local_whisper.max_pending()
+    return TRANSCRIBE_CONCURRENCY
+
+def transcribe_stream(clips, concurrency=None, api_key=None, temp_dir="temp", transcriber=None):
+    """Transcreve cada clip assim que ele sai da ingestão; retorna os clips quando a última transcrição termina"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    _transcriber_model(transcriber or TRANSCRIBER)  # valida o backend antes da ingestão
+    concurrency = _default_concurrency(transcriber) if concurrency is None else concurrency
     
-    if not clips_text:
-        return []
+    # A ingestão (CPU) continua no gerador enquanto as transcrições (rede) rodam nas threads
+    clips_info = []
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for clip in clips:
+            clips_info.append(clip)
+            context = contextvars.copy_context()
+            futures.append(executor.submit(context.run, _load_transcript, clip, api_key, temp_dir, transcriber))
         
-    system_message = {
-        "role": "system",
-        "content": """Você é um especialista em análise de texto e sua tarefa é identificar conteúdo similar ou repetido entre diferentes clips de vídeo.
+        # Barreira: as etapas de IA só começam com todas as transcrições prontas
+        for clip, future in zip(clips_info, futures):
+            _store_transcript(clip, future.result())
+    
+    return clips_info
+
+def extract_transcripts(clips_info, concurrency=None, api_key=None, temp_dir="temp", transcriber=None):
+    """Extrai transcrições dos clips usando o Whisper (API da OpenAI ou local)"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    
+    # Clips que já passaram pelo transcribe_stream não são transcritos de novo
+    pending = [clip for clip in clips_info if 'transcript' not in clip]
+    if pending:
+        concurrency = _default_concurrency(transcriber) if concurrency is None else concurrency
+        results = map_concurrently(
+            lambda clip: _load_transcript(clip, api_key, temp_dir, transcriber), pending, concurrency
+        )
+        for clip, transcript in zip(pending, results):
+            _store_transcript(clip, transcript)
+    
+    return format_transcripts(clips_info)
+
+SIMILARITY_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """Você é um especialista em análise de texto e sua tarefa é identificar conteúdo similar ou repetido entre diferentes clips de vídeo.
 
 Regras para identificação:
 1. Identifique clips que transmitem a mesma informação, mesmo que com palavras diferentes
@@ -76,26 +192,38 @@ Regras para identificação:
 Formato da resposta deve ser EXATAMENTE:
 CLIPS_TO_REMOVE: [lista de números dos clips a remover]
 REASON: [breve explicação do motivo]"""
-    }
-    
+}
+
+SIMILARITY_INSTRUCTION = "Analise os seguintes clips e identifique quais contêm conteúdo repetido:\n\n"
+
+# Tokens reservados para a resposta da análise de similaridade
+SIMILARITY_MAX_TOKENS = 500
+
+def _find_similar_in_entries(entries, api_key=None, use_cache=None):
+    """Uma chamada ao GPT sobre um lote de clips; retorna os IDs a remover"""
+    clips_text = render_entries(entries)
     user_message = {
         "role": "user",
-        "content": "Analise os seguintes clips e identifique quais contêm conteúdo repetido:\n\n" + "\n".join(clips_text)
+        "content": SIMILARITY_INSTRUCTION + clips_text
     }
     
     try:
-        response = openai.ChatCompletion.create(
+        content = cached_chat_completion(
+            'similarity', SIMILARITY_PROMPT_VERSION, clips_text, use_cache=use_cache,
+            api_key=api_key or os.getenv('OPENAI_API_KEY'),
             model="gpt-4",
-            messages=[system_message, user_message],
+            messages=[SIMILARITY_SYSTEM_MESSAGE, user_message],
             temperature=0.3,
-            max_tokens=500
+            max_tokens=SIMILARITY_MAX_TOKENS
         )
         
-        content = response.choices[0].message['content']
-        
-        # Extrai os clips a serem removidos da resposta
+        # Extrai os clips a serem removidos da resposta (apenas IDs dos clips enviados)
         clips_line = next(line for line in content.split('\n') if line.startswith('CLIPS_TO_REMOVE:'))
-        clips_to_remove = eval(clips_line.split(':', 1)[1].strip())
+        sent_ids = {int(re.match(r'Clip (\d+)', header).group(1)) for header, _ in entries}
+        clips_to_remove = [
+            int(clip_id) for clip_id in re.findall(r'\d+', clips_line.split(':', 1)[1])
+            if int(clip_id) in sent_ids
+        ]
         
         # Extrai a razão para logging
         reason_line = next(line for line in content.split('\n') if line.startswith('REASON:'))
@@ -111,9 +239,65 @@ REASON: [breve explicação do motivo]"""
         print(f"Erro ao analisar similaridade com GPT: {str(e)}")
         return []
 
-def remove_duplicate_content(clips_info: List[Dict]) -> List[Dict]:
+@instrumented()
+def find_similar_content_with_gpt(clips_info: List[Dict], api_key: str = None,
+                                  use_cache: bool = None, groups: List[List[int]] = None) -> List[int]:
     """
-    Remove clips com conteúdo similar/repetido usando GPT para análise
+    Usa GPT para identificar clips com conteúdo similar/repetido
+    Retorna lista de IDs dos clips que devem ser removidos
     """
-    clips_to_remove = find_similar_content_with_gpt(clips_info)
+    # Prepara o texto para análise
+    clips = [clip for clip in clips_info if clip.get('transcript')]
+    if not clips:
+        return []
+    entries = [(f"Clip {clip['id']}:", clip['transcript']) for clip in clips]
+    
+    # Sem deduplicação de frases aqui: as repetições são justamente o que o GPT precisa ver
+    available = prompt_budget('gpt-4', SIMILARITY_MAX_TOKENS) - count_message_tokens(
+        [SIMILARITY_SYSTEM_MESSAGE, {"content": SIMILARITY_INSTRUCTION}]
+    )
+    compacted = compact_entries(entries, available, dedupe=False)
+    if compacted is not None:
+        return _find_similar_in_entries(compacted, api_key, use_cache)
+    
+    # Lote grande demais: uma chamada por parte, mantendo juntos os clips de um mesmo grupo
+    positions = {clip['id']: index for index, clip in enumerate(clips)}
+    if groups:
+        grouped = [[positions[clip_id] for clip_id in group if clip_id in positions] for group in groups]
+        listed = {index for group in grouped for index in group}
+        grouped += [[index] for index in range(len(clips)) if index not in listed]
+    else:
+        grouped = None
+    chunks = chunk_entries(entries, available, groups=grouped)
+    print(f"Analisando similaridade em {len(chunks)} partes...")
+    
+    clips_to_remove = []
+    for chunk in chunks:
+        clips_to_remove.extend(_find_similar_in_entries(chunk, api_key, use_cache))
+    return clips_to_remove
+
+def remove_duplicate_content(clips_info: List[Dict], api_key: str = None, use_cache: bool = None,
+                             mode: str = None) -> List[Dict]:
+    """
+    Remove clips com conteúdo similar/repetido (detecção local, com GPT só para casos ambíguos)
+    """
+    mode = mode or DEDUP_MODE
+    if mode == 'gpt':
+        clips_to_remove = set(find_similar_content_with_gpt(clips_info, api_key, use_cache))
+        return [clip for clip in clips_info if clip['id'] not in clips_to_remove]
+    
+    result = find_duplicate_clusters(clips_info)
+    clips_to_remove = set(result['remove'])
+    if result['remove']:
+        print(f"Clips repetidos (detecção local): {result['remove']}")
+    
+    # Só os grupos ambíguos vão para o GPT, em uma única chamada
+    if mode == 'hybrid' and result['ambiguous']:
+        ambiguous_ids = {clip_id for cluster in result['ambiguous'] for clip_id in cluster}
+        print(f"Enviando {len(ambiguous_ids)} clips ambíguos para análise com GPT...")
+        ambiguous_clips = [clip for clip in clips_info if clip['id'] in ambiguous_ids]
+        clips_to_remove.update(find_similar_content_with_gpt(
+            ambiguous_clips, api_key, use_cache, groups=result['ambiguous']
+        ))
+    
     return [clip for clip in clips_info if clip['id'] not in clips_to_remove]
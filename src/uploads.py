@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import weakref
+from contextlib import contextmanager
+from .workspace import Workspace, WORKSPACES_DIR
+
+# Tamanho padrão de cada parte de um upload em partes (bytes)
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+
+# Tamanho máximo aceito para um arquivo enviado em partes
+UPLOAD_MAX_FILE_SIZE = int(os.getenv('UPLOAD_MAX_FILE_SIZE', 4 * 1024 ** 3))
+
+# Uploads em partes abertos ao mesmo tempo (cada um reserva o tamanho do arquivo em disco)
+UPLOAD_MAX_OPEN = int(os.getenv('UPLOAD_MAX_OPEN', 8))
+
+# Bloco de leitura do corpo da requisição: a memória usada não depende do tamanho da parte
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_state_lock = threading.Lock()
+_start_lock = threading.Lock()
+_upload_locks = weakref.WeakValueDictionary()
+
+
+class _UploadLock:
+    """Lock de um upload: exclusivo (with) para finalizar, enfileirar e cancelar; compartilhado
+    (shared) para gravar partes, que podem chegar em paralelo entre si, mas não durante a finalização"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._writers = 0
+        self._exclusive = False
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive)
+            self._writers += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._writers -= 1
+                self._condition.notify_all()
+
+    def __enter__(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive and self._writers == 0)
+            self._exclusive = True
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._exclusive = False
+            self._condition.notify_all()
+
+
+def upload_lock(upload_id):
+    """Lock de um upload (veja _UploadLock)"""
+    with _state_lock:
+        lock = _upload_locks.get(upload_id)
+        if lock is None:
+            lock = _upload_locks[upload_id] = _UploadLock()
+        return lock
+
+
+class UploadError(Exception):
+    """Erro de validação de um upload em partes"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChunkedUpload:
+    """Upload retomável em partes, gravado direto na área de trabalho do job"""
+
+    STATE_FILE = 'upload.json'
+    PART_FILE = 'upload.part'
+
+    def __init__(self, workspace, filename, size, chunk_size, sha256=None,
+                 received=None, completed=False, job_id=None):
+        self.workspace = workspace
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.sha256 = sha256
+        self.received = set(received or [])
+        self.completed = completed
+        self.job_id = job_id
+
+    @property
+    def id(self):
+        return self.workspace.id
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    @property
+    def part_path(self):
+        return os.path.join(self.workspace.root, self.PART_FILE)
+
+    @property
+    def updated_at(self):
+        """Data da última parte recebida (o estado é regravado a cada parte)"""
+        try:
+            return os.path.getmtime(os.path.join(self.workspace.root, self.STATE_FILE))
+        except FileNotFoundError:
+            return 0.0
+
+    @property
+    def final_path(self):
+        return os.path.join(self.workspace.clips_dir, self.filename)
+
+    def chunk_length(self, index):
+        """Tamanho esperado da parte (a última pode ser menor)"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def missing_chunks(self):
+        return [index for index in range(self.chunk_count) if index not in self.received]
+
+    @classmethod
+    def start(cls, filename, size, chunk_size=None, sha256=None, base_dir=WORKSPACES_DIR):
+        """Abre um upload: cria a área de trabalho e reserva o arquivo parcial"""
+        chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        if not filename:
+            raise UploadError('Nome de arquivo inválido')
+        if size <= 0 or chunk_size <= 0:
+            raise UploadError('Tamanho de arquivo inválido')
+        if size > UPLOAD_MAX_FILE_SIZE:
+            raise UploadError('Arquivo maior que o limite permitido', 413)
+
+        # A contagem e a criação ficam no mesmo lock para o limite valer com requisições simultâneas
+        with _start_lock:
+            if len(cls.open_uploads(base_dir)) >= UPLOAD_MAX_OPEN:
+                raise UploadError('Muitos uploads em andamento, tente novamente mais tarde', 429)
+            upload = cls(Workspace.create(base_dir), filename, size, chunk_size, sha256)
+            with open(upload.part_path, 'wb') as f:
+                f.truncate(size)
+            upload._save()
+        return upload
+
+    @classmethod
+    def open_uploads(cls, base_dir=WORKSPACES_DIR):
+        """Uploads ainda não finalizados"""
+        try:
+            names = os.listdir(base_dir)
+        except FileNotFoundError:
+            return []
+        uploads = (cls.load(name, base_dir) for name in names)
+        return [upload for upload in uploads if upload is not None and not upload.completed]
+
+    @classmethod
+    def load(cls, upload_id, base_dir=WORKSPACES_DIR):
+        """Carrega o estado de um upload, ou None se ele não existir"""
+        if not _UPLOAD_ID_PATTERN.match(upload_id):
+            return None
+        workspace = Workspace(os.path.join(base_dir, upload_id))
+        try:
+            with open(os.path.join(workspace.root, cls.STATE_FILE), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(workspace, **state)
+
+    def _save(self):
+        """Grava o estado de forma atômica (também renova a data da área de trabalho)"""
+        state = {
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'sha256': self.sha256,
+            'received': sorted(self.received),
+            'completed': self.completed,
+            'job_id': self.job_id
+        }
+        state_path = os.path.join(self.workspace.root, self.STATE_FILE)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _update_state(self, chunk=None, **changes):
+        """Recarrega o estado do disco e aplica as mudanças (partes podem chegar em paralelo)"""
+        with _state_lock:
+            current = ChunkedUpload.load(self.id, os.path.dirname(self.workspace.root))
+            if current is not None:
+                self.received |= current.received
+                self.completed = self.completed or current.completed
+                self.job_id = self.job_id or current.job_id
+            if chunk is not None:
+                self.received.add(chunk)
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self._save()
+
+    def set_job(self, job_id):
+        """Registra o job criado para o upload (completar de novo retorna o mesmo job)"""
+        self._update_state(job_id=job_id)
+
+    def write_chunk(self, index, stream, checksum, content_length=None):
+        """Grava uma parte lendo o stream em blocos e confere o SHA-256 informado"""
+        if self.completed:
+            raise UploadError('Upload já finalizado', 409)
+        if not 0 <= index < self.chunk_count:
+            raise UploadError('Índice de parte inválido')
+        if not checksum:
+            raise UploadError('Checksum SHA-256 da parte não informado')
+
+        expected_length = self.chunk_length(index)
+        if content_length is not None and content_length != expected_length:
+            raise UploadError(f'Tamanho da parte incorreto: esperado {expected_length} bytes')
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(self.part_path, 'r+b') as f:
+            f.seek(index * self.chunk_size)
+            while written < expected_length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, expected_length - written))
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                written += len(block)
+
+        if written != expected_length:
+            raise UploadError(f'Parte incompleta: recebidos {written} de {expected_length} bytes')
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError('Checksum da parte não confere', 422)
+
+        self._update_state(chunk=index)
+
+    def complete(self):
+        """Finaliza o upload e move o arquivo para os clips da área de trabalho"""
+        if self.completed:
+            return self.final_path
+
+        missing = self.missing_chunks()
+        if missing:
+            raise UploadError(f'Faltam {len(missing)} partes', 409)
+
+        if self.sha256:
+            digest = hashlib.sha256()
+            with open(self.part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            if digest.hexdigest() != self.sha256.lower():
+                raise UploadError('Checksum do arquivo não confere', 422)
+
+        os.replace(self.part_path, self.final_path)
+        self._update_state(completed=True)
+        return self.final_path
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunk_count': self.chunk_count,
+            'missing_chunks': self.missing_chunks(),
+            'completed': self.completed,
+            'job_id': self.job_id
+        }
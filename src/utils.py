@@ -1,13 +1,20 @@
 import os
 import glob
 import mimetypes
-from .video_processor import convert_to_mp4
+from concurrent.futures import ProcessPoolExecutor
+from .ingest import ingest_clip
 from .audio_processor import detect_silence
+from .instrumentation import instrumented, call_with_spans, record_spans
 
-def setup_folders():
+# Número padrão de processos usados na ingestão dos clips (0 = todos os núcleos)
+DEFAULT_INGEST_JOBS = int(os.getenv('INGEST_JOBS', 1))
+
+CLIP_EXTENSIONS = ['*.mp4', '*.mkv', '*.avi', '*.mov', '*.mp3', '*.wav']
+
+def setup_folders(clips_dir="clips", temp_dir="temp"):
     """Cria as pastas necessárias para o projeto"""
-    os.makedirs("temp", exist_ok=True)
-    os.makedirs("clips", exist_ok=True)
+    os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(clips_dir, exist_ok=True)
 
 def is_video_file(filepath):
     """Verifica se o arquivo é um vídeo"""
@@ -19,53 +26,92 @@ def is_audio_file(filepath):
     mime, _ = mimetypes.guess_type(filepath)
     return mime and mime.startswith('audio')
 
-def get_clips_info():
-    """Obtém informações sobre todos os clips disponíveis"""
-    clips_info = []
-    extensions = ['*.mp4', '*.mkv', '*.avi', '*.mov', '*.mp3', '*.wav']
+def list_clip_files(clips_dir="clips"):
+    """Lista os arquivos de entrada na ordem usada para numerar os clips"""
+    filepaths = []
+    for ext in CLIP_EXTENSIONS:
+        filepaths.extend(glob.glob(os.path.join(clips_dir, ext)))
+    return filepaths
+
+def _iter_ingested(filepaths, jobs, temp_dir="temp", proxy=None):
+    """Processa os arquivos (em paralelo se jobs > 1), entregando o resultado ou a exceção de cada um na ordem de entrada"""
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(filepaths))
     
-    for ext in extensions:
-        for filepath in glob.glob(os.path.join("clips", ext)):
-            processed_path, ranges = process_file(filepath)
-            if not processed_path:
-                continue
-            
-            # Usa o primeiro range ou valores padrão se não houver ranges
-            if ranges and len(ranges) > 0:
-                start, end = ranges[0]
-            else:
-                # Se não houver ranges, usa o vídeo inteiro
-                video = VideoFileClip(processed_path)
-                start, end = 0, video.duration
-                video.close()
-            
-            duration = end - start
-            
-            clips_info.append({
-                'path': processed_path,
-                'start': start,
-                'end': end,
-                'duration': duration,
-                'original': filepath,
-                'id': len(clips_info)
-            })
+    if jobs <= 1:
+        for filepath in filepaths:
+            try:
+                yield process_file(filepath, temp_dir, proxy)
+            except Exception as e:
+                yield e
+        return
     
-    return clips_info
+    print(f"Processando {len(filepaths)} arquivos com {jobs} processos...")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Os spans medidos nos subprocessos voltam junto com o resultado
+        futures = [executor.submit(call_with_spans, process_file, filepath, temp_dir, proxy) for filepath in filepaths]
+        for future in futures:
+            try:
+                result, spans = future.result()
+                record_spans(spans)
+                yield result
+            except Exception as e:
+                yield e
 
-def process_file(filepath):
-    """Processa um arquivo, convertendo para MP4 se necessário e detectando silêncios"""
-    filename = os.path.basename(filepath)
-    name, ext = os.path.splitext(filename)
-    output_path = os.path.join("temp", f"{name}.mp4")
+def iter_clips_info(jobs=None, errors=None, clips_dir="clips", temp_dir="temp", proxy=None):
+    """Gera as informações de cada clip assim que sua ingestão termina"""
+    jobs = DEFAULT_INGEST_JOBS if jobs is None else jobs
+    filepaths = list_clip_files(clips_dir)
+    clip_id = 0
     
-    # Converte para MP4 se necessário
-    if ext.lower() != '.mp4':
-        output_path = convert_to_mp4(filepath, output_path)
-    else:
-        output_path = filepath
+    # Os resultados saem na ordem de entrada, então os ids são estáveis mesmo em paralelo
+    for filepath, result in zip(filepaths, _iter_ingested(filepaths, jobs, temp_dir, proxy)):
+        if isinstance(result, Exception):
+            print(f"✗ Erro ao processar {filepath}: {str(result)}")
+            if errors is not None:
+                errors.append({'file': filepath, 'error': str(result)})
+            continue
+        
+        processed_path, ranges, source_path = result
+        if not processed_path:
+            continue
+        
+        # Usa o primeiro range ou valores padrão se não houver ranges
+        if ranges and len(ranges) > 0:
+            start, end = ranges[0]
+        else:
+            # Se não houver ranges, usa o vídeo inteiro
+            video = VideoFileClip(processed_path)
+            start, end = 0, video.duration
+            video.close()
+        
+        duration = end - start
+        
+        yield {
+            'path': processed_path,
+            'start': start,
+            'end': end,
+            'duration': duration,
+            'ranges': list(ranges) if ranges else [(start, end)],
+            'original': filepath,
+            'source': source_path,
+            'id': clip_id
+        }
+        clip_id += 1
+
+def get_clips_info(jobs=None, errors=None, clips_dir="clips", temp_dir="temp", proxy=None):
+    """Obtém informações sobre todos os clips disponíveis"""
+    return list(iter_clips_info(jobs, errors, clips_dir, temp_dir, proxy))
+
+@instrumented()
+def process_file(filepath, temp_dir="temp", proxy=None):
+    """Processa um arquivo, convertendo para MP4 (ou proxy) se necessário e detectando silêncios"""
+    # Um único passe do ffmpeg gera o MP4 (ou proxy), o PCM da análise e o áudio de fala
+    output_path, source_path = ingest_clip(filepath, temp_dir, proxy)
     
-    # Detecta e remove silêncios
-    ranges = detect_silence(output_path)
+    # Detecta e remove silêncios (lendo o PCM gerado na ingestão)
+    ranges = detect_silence(output_path, temp_dir=temp_dir)
     
-    # Retorna o caminho do arquivo e os ranges detectados
-    return output_path, ranges
+    # Retorna o caminho analisado, os ranges detectados e a mídia usada na renderização final
+    return output_path, ranges, source_path
@@ -1,64 +1,104 @@
 import os
-from moviepy.editor import VideoFileClip, concatenate_videoclips
 import ffmpeg
+from .renderer import DEFAULT_RENDER_BACKEND, FASTSTART_MOVFLAGS, render_with_ffmpeg, render_preview
+from .audio_analysis import AudioAnalysis
+from .artifact_cache import get_cache, file_hash, materialize
+from .instrumentation import instrumented, run_ffmpeg
+from .ingest import (
+    MEZZANINE_FORMAT, SPEECH_AUDIO_FORMAT,
+    mezzanine_key, speech_audio_key, speech_audio_path, conform_clips_info
+)
 
+@instrumented()
 def convert_to_mp4(input_path, output_path):
     """Converte vídeo para formato MP4"""
-    # Se o arquivo já existe, retorna o caminho
-    if os.path.exists(output_path):
+    # Reutiliza a conversão em cache se o mesmo conteúdo já foi convertido
+    cache = get_cache()
+    key = mezzanine_key(file_hash(input_path))
+    cached_path = cache.get_path(key)
+    if cached_path:
         print(f"Usando arquivo convertido existente: {output_path}")
-        return output_path
+        return materialize(cached_path, output_path)
         
     print(f"Convertendo {input_path} para MP4...")
-    (
+    run_ffmpeg(
         ffmpeg
         .input(input_path)
-        .output(output_path, vcodec='libx264', acodec='aac')
-        .run(overwrite_output=True, quiet=True)
+        .output(output_path, **MEZZANINE_FORMAT)
     )
+    cache.put_file(key, output_path)
     return output_path
 
 def create_video_from_audio(audio_path, output_path):
     """Cria um vídeo a partir de um arquivo de áudio"""
-    (
+    run_ffmpeg(
         ffmpeg
         .input('default_image.jpg', loop=1, framerate=1)
         .input(audio_path)
         .output(output_path, vcodec='libx264', t=ffmpeg.probe(audio_path)['format']['duration'])
-        .run(overwrite_output=True, quiet=True)
     )
     return output_path
 
+@instrumented()
 def convert_to_audio(video_path, temp_dir):
-    """Extrai o áudio de um vídeo"""
-    audio_path = os.path.join(temp_dir, os.path.basename(video_path) + ".mp3")
+    """Extrai o áudio de fala (mono 16 kHz) de um vídeo para a transcrição"""
+    audio_path = speech_audio_path(video_path, temp_dir)
     
-    # Se o arquivo de áudio já existe, retorna o caminho
-    if os.path.exists(audio_path):
+    # Se o áudio desse conteúdo já foi extraído (normalmente na ingestão), reutiliza do cache
+    cache = get_cache()
+    key = speech_audio_key(file_hash(video_path))
+    cached_path = cache.get_path(key)
+    if cached_path:
         print(f"Usando arquivo de áudio existente: {audio_path}")
-        return audio_path
-        
-    print(f"Extraindo áudio de {video_path}...")
-    if not os.path.exists(audio_path):
-        (
+        return materialize(cached_path, audio_path)
+    
+    # Reaproveita o PCM decodificado na detecção de silêncio, se existir
+    analysis = AudioAnalysis.load_cached(video_path, temp_dir)
+    if analysis is not None:
+        print(f"Codificando áudio de {video_path} a partir do PCM existente...")
+        analysis.export_audio(audio_path, **SPEECH_AUDIO_FORMAT)
+    else:
+        print(f"Extraindo áudio de {video_path}...")
+        run_ffmpeg(
             ffmpeg
             .input(video_path)
-            .output(audio_path, acodec='libmp3lame')
-            .run(overwrite_output=True, quiet=True)
+            .output(audio_path, map='0:a:0', **SPEECH_AUDIO_FORMAT)
         )
+    cache.put_file(key, audio_path)
     return audio_path
 
-def create_final_video(clips_order, clips_info, clips_timing):
+@instrumented()
+def create_final_video(clips_order, clips_info, clips_timing, output_file="video_final.mp4",
+                       backend=None, temp_dir="temp", preview=False, render_jobs=None):
     """Cria o vídeo final apenas com cortes simples"""
+    # A prévia usa os clips analisados (proxies, se houver) e sempre o ffmpeg
+    if preview:
+        return render_preview(clips_order, clips_info, clips_timing, output_file)
+
+    backend = backend or DEFAULT_RENDER_BACKEND
+    # Com proxies, os cortes definidos na análise são aplicados aos arquivos originais
+    clips_info = conform_clips_info(clips_info)
+    if backend == 'ffmpeg':
+        return render_with_ffmpeg(clips_order, clips_info, clips_timing, output_file, temp_dir, render_jobs)
+    if backend != 'moviepy':
+        raise ValueError(f"Backend de renderização desconhecido: {backend}")
+    return _create_final_video_moviepy(clips_order, clips_info, clips_timing, output_file, temp_dir)
+
+def _create_final_video_moviepy(clips_order, clips_info, clips_timing, output_file, temp_dir="temp"):
+    """Cria o vídeo final com moviepy (decodifica e re-encoda todos os frames)"""
+    from moviepy.editor import VideoFileClip, concatenate_videoclips
+
     print("\nAplicando cortes...")
     final_clips = []
+    # Depois da remoção de repetições, a posição na lista não é mais o id do clip
+    clips_by_id = {clip.get('id', index): clip for index, clip in enumerate(clips_info)}
     
     try:
         for idx, clip_number in enumerate(clips_order):
-            if clip_number not in clips_timing:
+            if clip_number not in clips_timing or clip_number not in clips_by_id:
                 continue
                 
-            clip_info = clips_info[clip_number]
+            clip_info = clips_by_id[clip_number]
             start_time, end_time = clips_timing[clip_number]
             
             if not os.path.exists(clip_info['path']):
@@ -85,16 +125,15 @@ def create_final_video(clips_order, clips_info, clips_timing):
         print("\nMontando vídeo final...")
         final_video = concatenate_videoclips(final_clips)
         
-        output_file = "video_final.mp4"
-        
         print(f"\nRenderizando vídeo final...")
         final_video.write_videofile(
             output_file,
             codec='libx264',
             audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
+            temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
             remove_temp=True,
-            fps=30
+            fps=30,
+            ffmpeg_params=['-movflags', FASTSTART_MOVFLAGS]
         )
         
         for clip in final_clips:
@@ -103,6 +142,7 @@ def create_final_video(clips_order, clips_info, clips_timing):
         
         print(f"\nVídeo final criado com sucesso: {output_file}")
         print(f"Duração total: {final_video.duration:.2f} segundos")
+        return output_file
         
     except Exception as e:
         for clip in final_clips:
@@ -0,0 +1,109 @@
+import os
+import time
+import random
+import requests
+import openai
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from .instrumentation import instrumented
+
+WHISPER_MODEL = 'whisper-1'
+
+# verbose_json traz, além do texto, os segmentos com início e fim em segundos
+WHISPER_RESPONSE_FORMAT = 'verbose_json'
+
+# Limites das chamadas à API de transcrição
+TRANSCRIBE_CONCURRENCY = int(os.getenv('TRANSCRIBE_CONCURRENCY', 4))
+TRANSCRIBE_TIMEOUT = float(os.getenv('TRANSCRIBE_TIMEOUT', 120))
+TRANSCRIBE_MAX_RETRIES = int(os.getenv('TRANSCRIBE_MAX_RETRIES', 5))
+
+# Backoff exponencial: base * 2^tentativa, limitado a MAX_BACKOFF segundos
+BACKOFF_BASE = 1.0
+MAX_BACKOFF = 60.0
+
+# Respostas que indicam erro temporário (rate limit ou falha do servidor)
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TranscriptionError(Exception):
+    """Erro ao transcrever um arquivo de áudio"""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _retry_after(response):
+    """Lê o header Retry-After (em segundos), se presente"""
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _request_transcription(audio_path, language, api_key, api_base, timeout, model, response_format):
+    """Faz uma única requisição de transcrição para a API"""
+    # OPENAI_API_BASE é lido a cada chamada: permite apontar para um servidor local de testes
+    api_base = api_base or os.getenv('OPENAI_API_BASE') or openai.api_base
+    url = f"{api_base.rstrip('/')}/audio/transcriptions"
+    with open(audio_path, 'rb') as audio_file:
+        try:
+            response = requests.post(
+                url,
+                headers={'Authorization': f"Bearer {api_key or openai.api_key or os.getenv('OPENAI_API_KEY', '')}"},
+                files={'file': (os.path.basename(audio_path), audio_file, 'application/octet-stream')},
+                data={
+                    'model': model,
+                    'language': language,
+                    'response_format': response_format,
+                    'timestamp_granularities[]': 'segment'
+                },
+                timeout=timeout
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise TranscriptionError(f"Falha de conexão: {str(e)}") from e
+
+    if response.status_code != 200:
+        raise TranscriptionError(
+            f"HTTP {response.status_code}: {response.text[:200]}",
+            status_code=response.status_code,
+            retry_after=_retry_after(response)
+        )
+    return response.json()
+
+
+@instrumented('whisper_transcribe')
+def transcribe_file(audio_path, language="pt", api_key=None, api_base=None,
+                    timeout=None, max_retries=None, model=WHISPER_MODEL,
+                    response_format=WHISPER_RESPONSE_FORMAT):
+    """Transcreve um arquivo com retry e backoff exponencial em erros 429/5xx e timeouts"""
+    timeout = TRANSCRIBE_TIMEOUT if timeout is None else timeout
+    max_retries = TRANSCRIBE_MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(max_retries + 1):
+        try:
+            return _request_transcription(audio_path, language, api_key, api_base, timeout, model, response_format)
+        except TranscriptionError as e:
+            retryable = e.status_code is None or e.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt == max_retries:
+                raise
+
+            # Respeita o Retry-After da API; senão usa backoff exponencial com jitter
+            delay = e.retry_after if e.retry_after is not None else BACKOFF_BASE * (2 ** attempt)
+            delay = min(MAX_BACKOFF, delay) + random.uniform(0, BACKOFF_BASE / 2)
+            print(f"Erro temporário ao transcrever {os.path.basename(audio_path)} ({str(e)}), "
+                  f"nova tentativa em {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def map_concurrently(function, items, concurrency=None):
+    """Executa function sobre os itens com concorrência limitada, mantendo a ordem dos resultados"""
+    concurrency = TRANSCRIBE_CONCURRENCY if concurrency is None else concurrency
+    concurrency = max(1, min(concurrency, len(items)))
+
+    # Cada item roda com uma cópia do contexto de quem chamou (mantém o gravador de spans do job)
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda context, item: context.run(function, item), contexts, items))
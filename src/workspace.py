@@ -0,0 +1,64 @@
+import os
+import time
+import uuid
+import shutil
+from .utils import setup_folders
+
+# Diretório base onde cada job recebe sua própria área de trabalho
+WORKSPACES_DIR = os.getenv('WORKSPACES_DIR', 'workspaces')
+
+
+class Workspace:
+    """Área de trabalho isolada de um job: clips de entrada, temporários e vídeo final"""
+
+    def __init__(self, root):
+        self.root = root
+        self.clips_dir = os.path.join(root, 'clips')
+        self.temp_dir = os.path.join(root, 'temp')
+        self.output_path = os.path.join(root, 'video_final.mp4')
+        self.preview_path = os.path.join(root, 'video_preview.mp4')
+        self.profile_path = os.path.join(root, 'profile.json')
+
+    @classmethod
+    def create(cls, base_dir=WORKSPACES_DIR, name=None):
+        """Cria uma nova área de trabalho com as pastas do projeto"""
+        workspace = cls(os.path.join(base_dir, name or uuid.uuid4().hex))
+        setup_folders(workspace.clips_dir, workspace.temp_dir)
+        return workspace
+
+    @property
+    def id(self):
+        return os.path.basename(self.root)
+
+    def clear_intermediates(self):
+        """Remove entradas e temporários, mantendo apenas o vídeo final"""
+        shutil.rmtree(self.clips_dir, ignore_errors=True)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def remove(self):
+        """Remove a área de trabalho inteira"""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def cleanup_stale_workspaces(max_age, base_dir=WORKSPACES_DIR, in_use=()):
+    """Remove áreas de trabalho sem modificações há mais de max_age segundos, exceto as em uso.
+
+    Gravações dentro de clips/ e temp/ não mudam a data da pasta principal, então jobs e
+    uploads em andamento precisam ser informados em in_use (ids das áreas de trabalho).
+    """
+    if not os.path.isdir(base_dir):
+        return 0
+
+    limit = time.time() - max_age
+    removed = 0
+    for name in os.listdir(base_dir):
+        if name in in_use:
+            continue
+        path = os.path.join(base_dir, name)
+        try:
+            if os.path.isdir(path) and os.path.getmtime(path) < limit:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
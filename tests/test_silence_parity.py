@@ -0,0 +1,110 @@
+"""Paridade da detecção de silêncio vetorizada com o pydub e com a implementação original"""
+import numpy as np
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+from pydub.silence import detect_nonsilent
+
+import baseline_audio_processor as baseline
+from src.audio_processor import (
+    detect_nonsilent_numpy, analyze_audio_levels, find_optimal_cut_points, detect_silence_in_audio,
+    MIN_SILENCE_LEN, SILENCE_THRESH, SEEK_STEP
+)
+
+PARAMS = {'min_silence_len': MIN_SILENCE_LEN, 'silence_thresh': SILENCE_THRESH, 'seek_step': SEEK_STEP}
+
+
+def synthetic_speech(seconds, frame_rate=44100, channels=1, sample_width=2, seed=0):
+    """Rajadas de tom modulado ('fala') separadas por pausas, sobre um ruído abaixo do threshold"""
+    rng = np.random.default_rng(seed)
+    total_frames = int(seconds * frame_rate)
+    max_amp = 2 ** (sample_width * 8 - 1) - 1
+    signal = rng.normal(0, max_amp * 0.002, size=(total_frames, channels))
+
+    position = 0
+    while position < total_frames:
+        end = min(position + int(rng.uniform(0.4, 4.0) * frame_rate), total_frames)
+        t = np.arange(end - position) / frame_rate
+        envelope = 0.3 + 0.7 * np.abs(np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        tone = np.sin(2 * np.pi * rng.uniform(120, 300) * t) * envelope
+        signal[position:end] += (max_amp * rng.uniform(0.05, 0.5) * tone)[:, None]
+        position = end + int(rng.uniform(0.05, 1.5) * frame_rate)
+
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+    samples = np.clip(signal, -max_amp, max_amp).astype(dtype)
+    return AudioSegment(data=samples.tobytes(), sample_width=sample_width, frame_rate=frame_rate,
+                        channels=channels)
+
+
+CASES = {
+    'mono 44.1k': lambda: synthetic_speech(20),
+    'estéreo 48k': lambda: synthetic_speech(20, frame_rate=48000, channels=2, seed=1),
+    '8k': lambda: synthetic_speech(15, frame_rate=8000, seed=2),
+    '8 bits': lambda: synthetic_speech(10, sample_width=1, seed=4),
+    '32 bits': lambda: synthetic_speech(8, sample_width=4, seed=7),
+    'vazio': lambda: AudioSegment.empty().set_frame_rate(16000),
+    'todo silencioso': lambda: AudioSegment.silent(duration=2000, frame_rate=16000),
+    'mais curto que a janela': lambda: synthetic_speech(0.2, seed=5),
+    'sem silêncio': lambda: synthetic_speech(5, frame_rate=16000, seed=6) + 6,
+}
+
+
+@pytest.fixture(params=sorted(CASES), ids=sorted(CASES))
+def audio(request):
+    return CASES[request.param]()
+
+
+def test_detect_nonsilent_matches_pydub(audio):
+    assert detect_nonsilent_numpy(audio, **PARAMS) == detect_nonsilent(audio, **PARAMS)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'seek_step': 7},
+    {'min_silence_len': 50, 'silence_thresh': -45},
+    {'min_silence_len': 1000, 'silence_thresh': -16},
+])
+def test_detect_nonsilent_matches_pydub_with_other_params(overrides):
+    audio = synthetic_speech(12, frame_rate=22050, seed=3)
+    params = dict(PARAMS, **overrides)
+    assert detect_nonsilent_numpy(audio, **params) == detect_nonsilent(audio, **params)
+
+
+def test_levels_match_baseline(audio):
+    assert analyze_audio_levels(audio) == baseline.analyze_audio_levels(audio)
+
+
+def _ranges_within_baseline_domain(audio, ranges):
+    """Ranges cujo fim não leva a busca original a índices negativos (veja o teste abaixo)"""
+    levels = len(baseline.analyze_audio_levels(audio))
+    return [(start, end) for start, end in ranges
+            if int(end * 1000) // 100 >= 5 or int(end * 1000) // 100 >= levels]
+
+
+def test_cut_points_match_baseline(audio):
+    detected = [(start / 1000, end / 1000) for start, end in detect_nonsilent(audio, **PARAMS)]
+    # Além dos ranges detectados, cortes em pontos arbitrários (inclusive além do fim do áudio)
+    duration = len(audio) / 1000
+    extra = [(0.0, duration), (duration * 0.25, duration * 0.75), (duration * 0.5, duration + 1.0)]
+    ranges = _ranges_within_baseline_domain(audio, detected + extra)
+
+    assert find_optimal_cut_points(audio, ranges) == baseline.find_optimal_cut_points(audio, ranges)
+
+
+def test_cut_points_do_not_wrap_before_start():
+    """Desvio intencional: a busca original do fim usa índices negativos quando o range termina
+    antes de 500ms, lendo os níveis do fim do áudio e devolvendo um corte negativo"""
+    quiet = Sine(200).to_audio_segment(duration=3000, volume=-30)
+    audio = quiet + Sine(200).to_audio_segment(duration=500, volume=-3)
+    ranges = [(0.0, 0.3)]
+
+    assert baseline.find_optimal_cut_points(audio, ranges) == [(0.0, -0.1)]
+    assert find_optimal_cut_points(audio, ranges) == [(0.0, 0.0)]
+
+
+def test_detect_silence_matches_baseline(audio, tmp_path):
+    if len(audio) == 0:
+        pytest.skip('o pydub não lê um WAV vazio do disco')
+    path = tmp_path / 'audio.wav'
+    audio.export(path, format='wav')
+
+    assert detect_silence_in_audio(audio, engine='numpy') == baseline.detect_silence(str(path))
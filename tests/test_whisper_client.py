@@ -0,0 +1,125 @@
+"""Cliente do Whisper contra um servidor HTTP local no lugar da API"""
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from src import whisper_client
+from src.whisper_client import transcribe_file, TranscriptionError
+
+TRANSCRIPT = {'text': 'olá', 'language': 'pt', 'segments': [{'id': 0, 'start': 0.0, 'end': 1.0, 'text': 'olá'}]}
+
+
+class StubAPI:
+    """Servidor que responde cada requisição com a próxima resposta do roteiro"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.requests.append((time.monotonic(), self.path))
+                status, headers, delay = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                time.sleep(delay)
+                body = json.dumps(TRANSCRIPT if status == 200 else {'error': 'erro'}).encode()
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    servers = []
+
+    def start(*responses):
+        server = StubAPI(responses)
+        servers.append(server)
+        monkeypatch.setenv('OPENAI_API_BASE', server.url)
+        return server
+
+    # Backoff curto para o teste não esperar os segundos reais entre tentativas
+    monkeypatch.setattr(whisper_client, 'BACKOFF_BASE', 0.01)
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'clip.ogg'
+    path.write_bytes(b'\0' * 1024)
+    return str(path)
+
+
+def test_retries_429_after_retry_after(stub_api, audio_file):
+    api = stub_api((429, {'Retry-After': '1'}, 0), (200, {}, 0))
+
+    assert transcribe_file(audio_file, api_key='sk-test') == TRANSCRIPT
+    assert len(api.requests) == 2
+    assert all(path == '/v1/audio/transcriptions' for _, path in api.requests)
+    # O intervalo segue o Retry-After, não o backoff exponencial
+    assert api.requests[1][0] - api.requests[0][0] >= 1.0
+
+
+def test_retries_5xx_up_to_max_retries(stub_api, audio_file, monkeypatch):
+    monkeypatch.setattr(whisper_client, 'TRANSCRIBE_MAX_RETRIES', 3)
+    api = stub_api((503, {}, 0))
+
+    with pytest.raises(TranscriptionError) as error:
+        transcribe_file(audio_file, api_key='sk-test')
+    assert error.value.status_code == 503
+    assert len(api.requests) == 1 + 3
+
+
+def test_5xx_then_success(stub_api, audio_file):
+    api = stub_api((500, {}, 0), (502, {}, 0), (200, {}, 0))
+
+    assert transcribe_file(audio_file, api_key='sk-test') == TRANSCRIPT
+    assert len(api.requests) == 3
+
+
+def test_client_errors_are_not_retried(stub_api, audio_file):
+    api = stub_api((400, {}, 0))
+
+    with pytest.raises(TranscriptionError) as error:
+        transcribe_file(audio_file, api_key='sk-test')
+    assert error.value.status_code == 400
+    assert len(api.requests) == 1
+
+
+def test_hung_response_hits_timeout(stub_api, audio_file, monkeypatch):
+    monkeypatch.setattr(whisper_client, 'TRANSCRIBE_TIMEOUT', 0.3)
+    monkeypatch.setattr(whisper_client, 'TRANSCRIBE_MAX_RETRIES', 1)
+    api = stub_api((200, {}, 3))
+
+    start = time.monotonic()
+    with pytest.raises(TranscriptionError) as error:
+        transcribe_file(audio_file, api_key='sk-test')
+    # Cada tentativa desiste no timeout, sem esperar a resposta de 3s
+    assert time.monotonic() - start < 2.5
+    assert error.value.status_code is None
+    assert len(api.requests) == 2